@@ -55,6 +55,8 @@ SNAKEFILE_CHOICES = [
 ]
 
 RERUN_TRIGGERS = ["mtime", "params", "input", "software-env", "code"]
+# triggers that are not active by default
+OPTIONAL_RERUN_TRIGGERS = ["checksum"]
 
 
 def snakemake(
@@ -105,6 +107,7 @@ def snakemake(
     keepgoing=False,
     slurm=None,
     slurm_jobstep=None,
+    slurm_job_arrays=False,
     rerun_triggers=RERUN_TRIGGERS,
     cluster=None,
     cluster_config=None,
@@ -119,6 +122,7 @@ def snakemake(
     lock=True,
     unlock=False,
     cleanup_metadata=None,
+    migrate_metadata=False,
     conda_cleanup_envs=False,
     cleanup_shadow=False,
     cleanup_scripts=True,
@@ -129,6 +133,7 @@ def snakemake(
     list_input_changes=False,
     list_params_changes=False,
     list_untracked=False,
+    list_job_history=False,
     list_resources=False,
     summary=False,
     archive=None,
@@ -146,6 +151,7 @@ def snakemake(
     keep_target_files=False,
     allowed_rules=None,
     jobscript=None,
+    job_payloads=False,
     greediness=None,
     no_hooks=False,
     overwrite_shellcmd=None,
@@ -194,22 +200,40 @@ def snakemake(
     cluster_status=None,
     cluster_cancel=None,
     cluster_cancel_nargs=None,
+    cluster_status_nargs=1,
     cluster_sidecar=None,
+    cluster_submit_concurrency=1,
+    cluster_submit_retries=0,
+    worker_pool=None,
+    worker_pool_submit=None,
+    worker_pool_cores=1,
+    worker_pool_resources=None,
     export_cwl=None,
     show_failed_logs=False,
     keep_incomplete=False,
     keep_metadata=True,
+    metadata_backend="json",
+    job_history=False,
     messaging=None,
     edit_notebook=None,
     envvars=None,
     overwrite_groups=None,
     group_components=None,
     max_inventory_wait_time=20,
+    inventory_threads=8,
     execute_subworkflows=True,
     conda_not_block_search_path_envvars=False,
     scheduler_solver_path=None,
+    scheduler_ilp_window=1000,
+    max_temp_disk=None,
+    critical_path_priority=False,
+    dump_critical_path=None,
+    estimate_resources=False,
+    estimate_resources_margin=1.2,
     conda_base_path=None,
     local_groupid="local",
+    dag_cache=False,
+    compact_dag=False,
 ):
     """Run snakemake on a given snakefile.
 
@@ -248,6 +272,7 @@ def snakemake(
         nocolor (bool):             do not print colored output (default False)
         quiet (bool):               do not print any default job information (default False)
         keepgoing (bool):           keep going upon errors (default False)
+        slurm_job_arrays (bool):    submit ready jobs of the same rule with identical resources as SLURM job arrays (default False)
         cluster (str):              submission command of a cluster or batch system to use, e.g. qsub (default None)
         cluster_config (str,list):  configuration file for cluster options, or list thereof (default None)
         cluster_sync (str):         blocking cluster submission command (like SGE 'qsub -sync y')  (default None)
@@ -261,6 +286,7 @@ def snakemake(
         lock (bool):                lock the working directory when executing the workflow (default True)
         unlock (bool):              just unlock the working directory (default False)
         cleanup_metadata (list):    just cleanup metadata of given list of output files (default None)
+        migrate_metadata (bool):    just copy the metadata records of the JSON layout into the database of the selected metadata_backend (default False)
         drop_metadata (bool):       drop metadata file tracking information after job finishes (--report and --list_x_changes information will be incomplete) (default False)
         conda_cleanup_envs (bool):  just cleanup unused conda environments (default False)
         cleanup_shadow (bool):      just cleanup old shadow directories (default False)
@@ -272,6 +298,7 @@ def snakemake(
         list_input_changes (bool):  list output files with changed input files (default False)
         list_params_changes (bool): list output files with changed params (default False)
         list_untracked (bool):      list files in the workdir that are not used in the workflow (default False)
+        list_job_history (bool):    list percentiles of runtime, memory and I/O per rule over all jobs executed in the working directory (default False)
         summary (bool):             list summary of all output files and their status (default False)
         archive (str):              archive workflow into the given tarball
         delete_all_output (bool):    remove all files generated by the workflow (default False)
@@ -289,11 +316,12 @@ def snakemake(
         keep_target_files (bool):   do not adjust the paths of given target files relative to the working directory.
         allowed_rules (set):        restrict allowed rules to the given set. If None or empty, all rules are used.
         jobscript (str):            path to a custom shell script template for cluster jobs (default None)
+        job_payloads (bool):        let cluster jobs with a shell command execute a payload file written by the main process instead of parsing the Snakefile (default False)
         greediness (float):         set the greediness of scheduling. This value between 0 and 1 determines how careful jobs are selected for execution. The default value (0.5 if prioritytargets are used, 1.0 else) provides the best speed and still acceptable scheduling quality.
         overwrite_shellcmd (str):   a shell command that shall be executed instead of those given in the workflow. This is for debugging purposes only.
         updated_files(list):        a list that will be filled with the files that are updated or created during the workflow execution
         verbose (bool):             show additional debug output (default False)
-        max_jobs_per_second (int):  maximal number of cluster/drmaa jobs per second, None to impose no limit (default None)
+        max_jobs_per_second (int):  maximal number of cluster jobs submitted per second, None to impose no limit (default None)
         restart_times (int):        number of times to restart failing jobs (default 0)
         attempt (int):              initial value of Job.attempt. This is intended for internal use only (default 1).
         force_use_threads:          whether to force the use of threads over processes. helpful if shared memory is full or unavailable (default False)
@@ -331,7 +359,14 @@ def snakemake(
         cluster_status (str):       status command for cluster execution. If None, Snakemake will rely on flag files. Otherwise, it expects the command to return "success", "failure" or "running" when executing with a cluster jobid as a single argument.
         cluster_cancel (str):       command to cancel multiple job IDs (like SLURM 'scancel') (default None)
         cluster_cancel_nargs (int): maximal number of job ids to pass to cluster_cancel (default 1000)
+        cluster_status_nargs (int): maximal number of job ids to pass to cluster_status at once, if larger than 1 the status command has to print one line "<jobid> <status>" per job id (default 1)
         cluster_sidecar (str):      command that starts a sidecar process, see cluster documentation (default None)
+        cluster_submit_concurrency (int): number of submit commands that may run in parallel (default 1)
+        cluster_submit_retries (int): number of retries of a failing submit command, with exponential backoff (default 0)
+        worker_pool (int):          execute jobs on a pool of this many long-lived workers (default None)
+        worker_pool_submit (str):   command for submitting pool workers to a cluster, if None, workers are started locally (default None)
+        worker_pool_cores (int):    number of cores provided by each pool worker (default 1)
+        worker_pool_resources (dict): resources provided by each pool worker (default None)
         export_cwl (str):           Compile workflow to CWL and save to given file
         log_handler (function):     redirect snakemake output to this custom log handler, a function that takes a log message dictionary (see below) as its only argument (default None). The log message dictionary for the log handler has to following entries:
         keep_incomplete (bool):     keep incomplete output files of failed jobs
@@ -342,8 +377,19 @@ def snakemake(
         group_components (dict):    Number of connected components given groups shall span before being split up (1 by default if empty)
         conda_not_block_search_path_envvars (bool): Do not block search path envvars (R_LIBS, PYTHONPATH, ...) when using conda environments.
         scheduler_solver_path (str): Path to Snakemake environment (this can be used to e.g. overwrite the search path for the ILP solver used during scheduling).
+        scheduler_ilp_window (int): Maximum number of ready jobs (those with the highest reward) considered by the ILP scheduler, remaining jobs are selected greedily (None or 0 for no limit).
+        max_temp_disk (int):        Maximum disk space in MB that temporary output of running jobs and not yet consumed temporary output may occupy (default None, i.e. no limit).
+        critical_path_priority (bool): prefer ready jobs with the longest expected runtime of depending jobs, based on benchmark files and statistics (see stats) of previous runs (default False)
+        dump_critical_path (str):   write the critical path of the jobs to be executed as a TSV table to the given file (default None)
+        estimate_resources (bool):  estimate mem_mb and runtime of jobs whose rules do not define them from the jobs of the same rule in previous runs (default False)
+        estimate_resources_margin (float): factor by which estimated resources are increased (default 1.2)
         conda_base_path (str):      Path to conda base environment (this can be used to overwrite the search path for conda, mamba, and activate).
         local_groupid (str):        Local groupid to use as a placeholder for groupid-referrring input functions of local jobs (internal use only, default: local).
+        inventory_threads (int):    number of threads used for collecting modification times and sizes of files (default 8)
+        metadata_backend (str):     storage of metadata records: "json" (one file per output file) or "sqlite" (a single database under .snakemake) (default "json")
+        job_history (bool):         record runtime, memory and I/O of executed jobs in the job history of the working directory (default False)
+        dag_cache (bool):           persist the DAG of jobs under .snakemake/dag_cache and restore it in subsequent invocations with unchanged Snakefiles, config and targets (default False)
+        compact_dag (bool):         traverse the DAG via integer-indexed copies of its edges, which are rebuilt whenever the DAG changes (default False)
         log_handler (list):         redirect snakemake output to this list of custom log handlers, each a function that takes a log message dictionary (see below) as its only argument (default []). The log message dictionary for the log handler has to following entries:
 
             :level:
@@ -454,6 +500,7 @@ def snakemake(
     run_local = not (
         cluster
         or cluster_sync
+        or worker_pool
         or drmaa
         or kubernetes
         or tibanna
@@ -484,6 +531,7 @@ def snakemake(
         or cluster
         or cluster_sync
         or drmaa
+        or worker_pool
     )
 
     if not keep_logger:
@@ -525,10 +573,15 @@ def snakemake(
     snakefile = os.path.abspath(snakefile)
 
     cluster_mode = (
-        (cluster is not None) + (cluster_sync is not None) + (drmaa is not None)
+        (cluster is not None)
+        + (cluster_sync is not None)
+        + (drmaa is not None)
+        + (worker_pool is not None)
     )
     if cluster_mode > 1:
-        logger.error("Error: cluster and drmaa args are mutually exclusive")
+        logger.error(
+            "Error: cluster, drmaa and worker pool args are mutually exclusive"
+        )
         return False
 
     if debug and (cluster_mode or cores is not None and cores > 1):
@@ -586,6 +639,7 @@ def snakemake(
             snakefile=snakefile,
             rerun_triggers=rerun_triggers,
             jobscript=jobscript,
+            job_payloads=job_payloads,
             overwrite_shellcmd=overwrite_shellcmd,
             overwrite_config=overwrite_config,
             overwrite_workdir=workdir,
@@ -629,15 +683,25 @@ def snakemake(
             edit_notebook=edit_notebook,
             envvars=envvars,
             max_inventory_wait_time=max_inventory_wait_time,
+            inventory_threads=inventory_threads,
             conda_not_block_search_path_envvars=conda_not_block_search_path_envvars,
             execute_subworkflows=execute_subworkflows,
             scheduler_solver_path=scheduler_solver_path,
+            scheduler_ilp_window=scheduler_ilp_window,
+            max_temp_disk=max_temp_disk,
+            critical_path_priority=critical_path_priority,
+            estimate_resources=estimate_resources,
+            estimate_resources_margin=estimate_resources_margin,
             conda_base_path=conda_base_path,
             check_envvars=not lint,  # for linting, we do not need to check whether requested envvars exist
             all_temp=all_temp,
             local_groupid=local_groupid,
             keep_metadata=keep_metadata,
+            metadata_backend=metadata_backend,
+            job_history=job_history,
             latency_wait=latency_wait,
+            dag_cache=dag_cache,
+            compact_dag=compact_dag,
         )
         success = True
 
@@ -691,6 +755,7 @@ def snakemake(
                     lock=lock,
                     unlock=unlock,
                     cleanup_metadata=cleanup_metadata,
+                    migrate_metadata=migrate_metadata,
                     conda_cleanup_envs=conda_cleanup_envs,
                     cleanup_shadow=cleanup_shadow,
                     cleanup_scripts=cleanup_scripts,
@@ -745,12 +810,20 @@ def snakemake(
                     cluster_status=cluster_status,
                     cluster_cancel=cluster_cancel,
                     cluster_cancel_nargs=cluster_cancel_nargs,
+                    cluster_status_nargs=cluster_status_nargs,
                     cluster_sidecar=cluster_sidecar,
+                    cluster_submit_concurrency=cluster_submit_concurrency,
+                    cluster_submit_retries=cluster_submit_retries,
+                    worker_pool=worker_pool,
+                    worker_pool_submit=worker_pool_submit,
+                    worker_pool_cores=worker_pool_cores,
+                    worker_pool_resources=worker_pool_resources,
                     max_jobs_per_second=max_jobs_per_second,
                     max_status_checks_per_second=max_status_checks_per_second,
                     overwrite_groups=overwrite_groups,
                     group_components=group_components,
                     max_inventory_wait_time=max_inventory_wait_time,
+                    inventory_threads=inventory_threads,
                     conda_not_block_search_path_envvars=conda_not_block_search_path_envvars,
                     local_groupid=local_groupid,
                 )
@@ -778,6 +851,7 @@ def snakemake(
                     printdag=printdag,
                     slurm=slurm,
                     slurm_jobstep=slurm_jobstep,
+                    slurm_job_arrays=slurm_job_arrays,
                     cluster=cluster,
                     cluster_sync=cluster_sync,
                     jobname=jobname,
@@ -804,6 +878,7 @@ def snakemake(
                     immediate_submit=immediate_submit,
                     ignore_ambiguity=ignore_ambiguity,
                     stats=stats,
+                    dump_critical_path=dump_critical_path,
                     force_incomplete=force_incomplete,
                     ignore_incomplete=ignore_incomplete,
                     list_version_changes=list_version_changes,
@@ -811,6 +886,7 @@ def snakemake(
                     list_input_changes=list_input_changes,
                     list_params_changes=list_params_changes,
                     list_untracked=list_untracked,
+                    list_job_history=list_job_history,
                     list_conda_envs=list_conda_envs,
                     summary=summary,
                     archive=archive,
@@ -825,6 +901,7 @@ def snakemake(
                     nodeps=nodeps,
                     keep_target_files=keep_target_files,
                     cleanup_metadata=cleanup_metadata,
+                    migrate_metadata=migrate_metadata,
                     conda_cleanup_envs=conda_cleanup_envs,
                     cleanup_shadow=cleanup_shadow,
                     cleanup_scripts=cleanup_scripts,
@@ -838,7 +915,14 @@ def snakemake(
                     cluster_status=cluster_status,
                     cluster_cancel=cluster_cancel,
                     cluster_cancel_nargs=cluster_cancel_nargs,
+                    cluster_status_nargs=cluster_status_nargs,
                     cluster_sidecar=cluster_sidecar,
+                    cluster_submit_concurrency=cluster_submit_concurrency,
+                    cluster_submit_retries=cluster_submit_retries,
+                    worker_pool=worker_pool,
+                    worker_pool_submit=worker_pool_submit,
+                    worker_pool_cores=worker_pool_cores,
+                    worker_pool_resources=worker_pool_resources,
                     report=report,
                     report_stylesheet=report_stylesheet,
                     export_cwl=export_cwl,
@@ -1339,6 +1423,30 @@ def get_argument_parser(profile=None):
         ),
     )
 
+    group_exec.add_argument(
+        "--estimate-resources",
+        action="store_true",
+        help=(
+            "Estimate the mem_mb and runtime resources of jobs whose rules do "
+            "not define them (in the Snakefile or via --set-resources) from the "
+            "maximum RSS and runtime of the successful jobs of the same rule in "
+            "previous runs, as recorded in the job history of the working "
+            "directory (see --job-history). If these correlate with the "
+            "size of the input files, the estimate is scaled accordingly, "
+            "otherwise the largest observed value is used. Rules with less "
+            "than three recorded jobs keep their default resources (see "
+            "--default-resources)."
+        ),
+    )
+    group_exec.add_argument(
+        "--estimate-resources-margin",
+        type=float,
+        default=1.2,
+        metavar="FACTOR",
+        help="Factor by which resources estimated with --estimate-resources "
+        "are increased, as a safety margin (default 1.2).",
+    )
+
     group_exec.add_argument(
         "--preemption-default",
         type=int,
@@ -1434,13 +1542,19 @@ def get_argument_parser(profile=None):
     group_exec.add_argument(
         "--rerun-triggers",
         nargs="+",
-        choices=RERUN_TRIGGERS,
+        choices=RERUN_TRIGGERS + OPTIONAL_RERUN_TRIGGERS,
         default=RERUN_TRIGGERS,
         help="Define what triggers the rerunning of a job. By default, "
-        "all triggers are used, which guarantees that results are "
+        "all triggers except 'checksum' are used, which guarantees that results are "
         "consistent with the workflow code and configuration. If you "
         "rather prefer the traditional way of just considering "
-        "file modification dates, use '--rerun-trigger mtime'.",
+        "file modification dates, use '--rerun-trigger mtime'. "
+        "With 'checksum', an input file that is newer than the output "
+        "only triggers a rerun if its content has changed, regardless of its "
+        "size (by default, this is only checked for files smaller than 100kB). "
+        "This requires to read each input file once; checksums are cached in the "
+        "metadata by device, inode, size and modification time of the file. "
+        "If the xxhash package is installed, it is used for computing checksums.",
     )
     group_exec.add_argument(
         "--force",
@@ -1582,6 +1696,47 @@ def get_argument_parser(profile=None):
         choices=lp_solvers,
         help=("Specifies solver to be utilized when selecting ilp-scheduler."),
     )
+    group_exec.add_argument(
+        "--scheduler-ilp-window",
+        type=int,
+        default=1000,
+        metavar="N",
+        help=(
+            "Maximum number of ready jobs considered by the ilp scheduler in each "
+            "scheduling round. Only the N jobs with the highest priority (and "
+            "temp/input size) enter the ilp, the remaining ones are selected by "
+            "the greedy scheduler with the resources that are left. This keeps "
+            "job selection fast if thousands of jobs are ready at the same time. "
+            "Set to 0 to consider all ready jobs."
+        ),
+    )
+    group_exec.add_argument(
+        "--max-temp-disk",
+        type=int,
+        metavar="MB",
+        help=(
+            "Maximum disk space (in MB) occupied by temporary output (see "
+            "temp()), counting the expected temporary output of running jobs "
+            "and temporary output that has not yet been consumed by all of its "
+            "depending jobs. Jobs whose temporary output would exceed this "
+            "budget are only started once depending jobs have released "
+            "enough space. The size of the temporary output of a job is taken "
+            "from its temp_mb resource if defined, and estimated from the "
+            "finished jobs of the same rule otherwise."
+        ),
+    )
+    group_exec.add_argument(
+        "--critical-path-priority",
+        action="store_true",
+        help=(
+            "Among ready jobs of the same priority, prefer those with the "
+            "longest critical path, i.e. the longest expected runtime of the "
+            "jobs that (transitively) depend on them. Expected runtimes are "
+            "taken from benchmark files of previous runs, from the statistics "
+            "of a previous run written to the file given by --stats, or from "
+            "the runtime resource of the rule (in minutes)."
+        ),
+    )
     group_exec.add_argument(
         "--scheduler-solver-path",
         help="Set the PATH to search for scheduler solver binaries (internal use only).",
@@ -1811,6 +1966,13 @@ def get_argument_parser(profile=None):
         "of given files. That means that snakemake removes any tracked "
         "version info, and any marks that files are incomplete.",
     )
+    group_utils.add_argument(
+        "--migrate-metadata",
+        action="store_true",
+        help="Copy all metadata records from the JSON layout under "
+        ".snakemake/metadata and .snakemake/incomplete into the database of the "
+        "metadata backend selected with --metadata-backend.",
+    )
     group_utils.add_argument(
         "--cleanup-shadow",
         action="store_true",
@@ -1863,6 +2025,24 @@ def get_argument_parser(profile=None):
         "workflow. This can be used e.g. for identifying leftover files. Hidden files "
         "and directories are ignored.",
     )
+    group_utils.add_argument(
+        "--list-job-history",
+        action="store_true",
+        help="List the number of jobs and failed jobs per rule, together with "
+        "the median, 90th percentile and maximum of runtime (s), max RSS (MB) and "
+        "I/O (MB), over all jobs that have been executed in the working directory. "
+        "Memory and I/O are only recorded for jobs with a benchmark file.",
+    )
+    group_utils.add_argument(
+        "--job-history",
+        action="store_true",
+        help="Record runtime, max RSS and I/O of the executed jobs in the job "
+        "history of the working directory (.snakemake/history.sqlite, WAL mode), "
+        "as used by --list-job-history, --estimate-resources and "
+        "--critical-path-priority. Like --metadata-backend sqlite, the database "
+        "requires proper file locking, i.e., avoid it on network file systems "
+        "that are accessed from multiple nodes at the same time.",
+    )
     group_utils.add_argument(
         "--delete-all-output",
         action="store_true",
@@ -1898,6 +2078,19 @@ def get_argument_parser(profile=None):
         "Provenance-information based reports (e.g. --report and the "
         "--list_x_changes functions) will be empty or incomplete.",
     )
+    group_utils.add_argument(
+        "--metadata-backend",
+        choices=["json", "sqlite"],
+        default="json",
+        help="Storage of metadata records (used for rerun triggers, reports and "
+        "the --list-x-changes functions). 'json' stores one file per output file "
+        "under .snakemake/metadata. 'sqlite' stores all records in a single "
+        "database (.snakemake/metadata.sqlite, WAL mode), which scales much better "
+        "for large numbers of output files. The database requires proper file "
+        "locking, i.e., avoid it on network file systems that are accessed from "
+        "multiple nodes at the same time. Existing records can be transferred with "
+        "--migrate-metadata.",
+    )
     group_utils.add_argument("--version", "-v", action="version", version=__version__)
 
     group_output = parser.add_argument_group("OUTPUT")
@@ -1938,6 +2131,13 @@ def get_argument_parser(profile=None):
         metavar="FILE",
         help="Write stats about Snakefile execution in JSON format to the given file.",
     )
+    group_output.add_argument(
+        "--dump-critical-path",
+        metavar="FILE",
+        help="Write the critical path of the jobs to be executed (see "
+        "--critical-path-priority) with expected runtimes in TSV format to the "
+        "given file.",
+    )
     group_output.add_argument(
         "--nocolor", action="store_true", help="Do not use a colored output."
     )
@@ -1999,6 +2199,38 @@ def get_argument_parser(profile=None):
         "network file systems. Hence, we do not spend more than a given amount of time and fall back "
         "to individual checks for the rest.",
     )
+    group_behavior.add_argument(
+        "--dag-cache",
+        action="store_true",
+        help="Store the DAG of jobs under .snakemake/dag_cache and restore it in "
+        "subsequent invocations if the Snakefiles, the config and the requested "
+        "targets are unchanged. This avoids resolving input files to rules, "
+        "which can take a long time for large workflows. Which jobs need to be "
+        "executed is still determined from scratch. The cache is discarded if "
+        "input files without producing job have vanished. Changes in Python "
+        "modules imported by the Snakefile are not detected.",
+    )
+    group_behavior.add_argument(
+        "--compact-dag",
+        action="store_true",
+        help="Traverse the DAG of jobs via a compact copy of its edges, in which "
+        "jobs are numbered and the dependencies of each job are stored as an "
+        "array of numbers. This speeds up the repeated traversals of large DAGs "
+        "(e.g. when determining which jobs need to be executed, or after "
+        "checkpoints). The copy needs additional memory and is rebuilt "
+        "whenever the DAG changes.",
+    )
+    group_behavior.add_argument(
+        "--inventory-threads",
+        type=int,
+        default=8,
+        metavar="N",
+        help="Use N threads for collecting modification times and sizes of all "
+        "input and output files when computing which jobs need to be executed. "
+        "Directories containing multiple of these files are listed only once. "
+        "On network file systems, stat calls are dominated by latency, such that "
+        "more threads can speed up this step considerably.",
+    )
     group_behavior.add_argument(
         "--latency-wait",
         "--output-wait",
@@ -2073,8 +2305,8 @@ def get_argument_parser(profile=None):
         "--max-jobs-per-second",
         default=10,
         type=float,
-        help="Maximal number of cluster/drmaa jobs per second, default is 10, "
-        "fractions allowed.",
+        help="Maximal number of cluster jobs submitted per second (see --cluster), "
+        "default is 10, fractions allowed.",
     )
     group_behavior.add_argument(
         "--max-status-checks-per-second",
@@ -2231,6 +2463,16 @@ def get_argument_parser(profile=None):
         # for snakemake to be working in jobscript-
         # mode
     )
+    group_slurm.add_argument(
+        "--slurm-job-arrays",
+        action="store_true",
+        help=(
+            "Submit jobs of the same rule with identical resource requests that"
+            " are ready at the same time as a single SLURM job array"
+            " (sbatch --array) instead of one batch job each. This reduces"
+            " the load on the SLURM controller for workflows with many jobs."
+        ),
+    )
 
     group_cluster = parser.add_argument_group("CLUSTER")
 
@@ -2274,6 +2516,18 @@ def get_argument_parser(profile=None):
         "--drmaa ' -pe threaded {threads}'. Note that ARGS must be given in quotes and "
         "with a leading whitespace.",
     )
+    cluster_mode_group.add_argument(
+        "--worker-pool",
+        type=int,
+        metavar="N",
+        help="Execute jobs on a pool of N long-lived workers instead of "
+        "submitting each job to the cluster. Workers are started locally or "
+        "submitted with --worker-pool-submit. They pull jobs from a queue on the "
+        "shared filesystem as long as the jobs fit into their resources (see "
+        "--worker-pool-cores and --worker-pool-resources). This avoids the "
+        "scheduling overhead of the cluster for many short jobs. --jobs limits "
+        "the number of queued or running jobs.",
+    )
 
     group_cluster.add_argument(
         "--cluster-config",
@@ -2312,6 +2566,49 @@ def get_argument_parser(profile=None):
         "The default script resides as 'jobscript.sh' in the "
         "installation directory.",
     )
+    group_cluster.add_argument(
+        "--job-payloads",
+        action="store_true",
+        help="Let cluster jobs that execute a shell command run it from a "
+        "payload file that is written next to the jobscript, with input, "
+        "output, params, resources and software environment resolved by the "
+        "main process. This way, cluster jobs do not have to parse the "
+        "Snakefile and build the DAG of jobs again, which can take longer "
+        "than the job itself. Jobs with a run, script, wrapper or notebook "
+        "directive, shadow rules, group jobs and jobs with remote files are "
+        "executed via the Snakefile as usual. Requires a shared filesystem.",
+    )
+    group_cluster.add_argument(
+        "--job-payload",
+        metavar="FILE",
+        help="Execute the job in the given payload file (see --job-payloads). "
+        "This is meant for internal use by Snakemake itself only.",
+    )
+    group_cluster.add_argument(
+        "--worker-pool-submit",
+        metavar="CMD",
+        help="Submit the workers of the worker pool (see --worker-pool) with the "
+        "given command, which receives a worker script as its last argument. "
+        "The command can refer to the resources of a worker, e.g. "
+        "'qsub -pe threaded {cores} -l mem={mem_mb}M', and to {workerid}. "
+        "If not given, the workers are started locally.",
+    )
+    group_cluster.add_argument(
+        "--worker-pool-cores",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of cores provided by each worker of the worker pool "
+        "(default 1). Threads of the jobs on a worker may not exceed this.",
+    )
+    group_cluster.add_argument(
+        "--worker-pool-resources",
+        nargs="*",
+        metavar="NAME=INT",
+        help="Resources provided by each worker of the worker pool, e.g. "
+        "mem_mb=16000. A worker only takes jobs that fit into its remaining "
+        "resources. Resources not listed here are not restricted.",
+    )
     group_cluster.add_argument(
         "--jobname",
         "--jn",
@@ -2345,12 +2642,41 @@ def get_argument_parser(profile=None):
         help="Specify maximal number of job ids to pass to --cluster-cancel "
         "command, defaults to 1000.",
     )
+    group_cluster.add_argument(
+        "--cluster-status-nargs",
+        type=int,
+        default=1,
+        help="Specify maximal number of job ids to pass to --cluster-status "
+        "at once, defaults to 1. With a value larger than 1 (or 0 for all "
+        "active jobs), the status command is invoked with multiple job ids "
+        "and has to print one line '<jobid> <status>' per given job id, "
+        "with status being 'success', 'failed' or 'running'. This saves a "
+        "process invocation per job and status check when many jobs are "
+        "active.",
+    )
     group_cluster.add_argument(
         "--cluster-sidecar",
         default=None,
         help="Optional command to start a sidecar process during cluster "
         "execution.  Only active when --cluster is given as well.",
     )
+    group_cluster.add_argument(
+        "--cluster-submit-concurrency",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of submit commands (see --cluster) that may run in parallel. "
+        "The total submission rate is limited by --max-jobs-per-second.",
+    )
+    group_cluster.add_argument(
+        "--cluster-submit-retries",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Retry a failing submit command (see --cluster) up to N times with "
+        "exponential backoff, before the job is considered to have failed "
+        "(see --restart-times).",
+    )
     group_cluster.add_argument(
         "--drmaa-log-dir",
         metavar="DIR",
@@ -2645,7 +2971,12 @@ def main(argv=None):
                 args.cluster_config = adjust_path(args.cluster_config)
         if args.cluster_sync:
             args.cluster_sync = adjust_path(args.cluster_sync)
-        for key in "cluster_status", "cluster_cancel", "cluster_sidecar":
+        for key in (
+            "cluster_status",
+            "cluster_cancel",
+            "cluster_sidecar",
+            "worker_pool_submit",
+        ):
             if getattr(args, key):
                 setattr(args, key, adjust_path(getattr(args, key)))
         if args.report_stylesheet:
@@ -2660,6 +2991,16 @@ def main(argv=None):
         sys.stdout.buffer.write(cmd)
         sys.exit(0)
 
+    if args.job_payload:
+        from snakemake.job_payload import run_job_payload
+
+        setup_logger(quiet=args.quiet, printshellcmds=args.printshellcmds)
+        sys.exit(
+            0
+            if run_job_payload(args.job_payload, latency_wait=args.latency_wait)
+            else 1
+        )
+
     if args.batch is not None and args.forceall:
         print(
             "--batch may not be combined with --forceall, because recomputed upstream "
@@ -2668,6 +3009,7 @@ def main(argv=None):
 
     try:
         resources = parse_resources(args.resources)
+        worker_pool_resources = parse_resources(args.worker_pool_resources)
         config = parse_config(args)
 
         if args.default_resources is not None:
@@ -2691,6 +3033,7 @@ def main(argv=None):
 
     non_local_exec = (
         args.cluster
+        or args.worker_pool
         or args.slurm
         or args.slurm_jobstep
         or args.cluster_sync
@@ -2709,6 +3052,7 @@ def main(argv=None):
         or args.list
         or args.list_target_rules
         or args.list_untracked
+        or args.list_job_history
         or args.list_version_changes
         or args.export_cwl
         or args.generate_unit_tests
@@ -2724,6 +3068,7 @@ def main(argv=None):
         or args.archive
         or args.unlock
         or args.cleanup_metadata
+        or args.migrate_metadata
     )
 
     try:
@@ -2990,6 +3335,7 @@ def main(argv=None):
             keepgoing=args.keep_going,
             slurm=args.slurm,
             slurm_jobstep=args.slurm_jobstep,
+            slurm_job_arrays=args.slurm_job_arrays,
             rerun_triggers=args.rerun_triggers,
             cluster=args.cluster,
             cluster_config=args.cluster_config,
@@ -3018,6 +3364,7 @@ def main(argv=None):
             lock=not args.nolock,
             unlock=args.unlock,
             cleanup_metadata=args.cleanup_metadata,
+            migrate_metadata=args.migrate_metadata,
             conda_cleanup_envs=args.conda_cleanup_envs,
             cleanup_shadow=args.cleanup_shadow,
             cleanup_scripts=not args.skip_script_cleanup,
@@ -3028,6 +3375,7 @@ def main(argv=None):
             list_input_changes=args.list_input_changes,
             list_params_changes=args.list_params_changes,
             list_untracked=args.list_untracked,
+            list_job_history=args.list_job_history,
             summary=args.summary,
             detailed_summary=args.detailed_summary,
             archive=args.archive,
@@ -3037,6 +3385,7 @@ def main(argv=None):
             verbose=args.verbose,
             debug=args.debug,
             jobscript=args.jobscript,
+            job_payloads=args.job_payloads,
             notemp=args.notemp,
             all_temp=args.all_temp,
             keep_remote_local=args.keep_remote,
@@ -3073,22 +3422,40 @@ def main(argv=None):
             cluster_status=args.cluster_status,
             cluster_cancel=args.cluster_cancel,
             cluster_cancel_nargs=args.cluster_cancel_nargs,
+            cluster_status_nargs=args.cluster_status_nargs,
             cluster_sidecar=args.cluster_sidecar,
+            cluster_submit_concurrency=args.cluster_submit_concurrency,
+            cluster_submit_retries=args.cluster_submit_retries,
+            worker_pool=args.worker_pool,
+            worker_pool_submit=args.worker_pool_submit,
+            worker_pool_cores=args.worker_pool_cores,
+            worker_pool_resources=worker_pool_resources,
             export_cwl=args.export_cwl,
             show_failed_logs=args.show_failed_logs,
             keep_incomplete=args.keep_incomplete,
             keep_metadata=not args.drop_metadata,
+            metadata_backend=args.metadata_backend,
+            job_history=args.job_history,
             edit_notebook=args.edit_notebook,
             envvars=args.envvars,
             overwrite_groups=overwrite_groups,
             group_components=group_components,
             max_inventory_wait_time=args.max_inventory_time,
+            inventory_threads=args.inventory_threads,
             log_handler=log_handler,
             execute_subworkflows=not args.no_subworkflows,
             conda_not_block_search_path_envvars=args.conda_not_block_search_path_envvars,
             scheduler_solver_path=args.scheduler_solver_path,
+            scheduler_ilp_window=args.scheduler_ilp_window,
+            max_temp_disk=args.max_temp_disk,
+            critical_path_priority=args.critical_path_priority,
+            dump_critical_path=args.dump_critical_path,
+            estimate_resources=args.estimate_resources,
+            estimate_resources_margin=args.estimate_resources_margin,
             conda_base_path=args.conda_base_path,
             local_groupid=args.local_groupid,
+            dag_cache=args.dag_cache,
+            compact_dag=args.compact_dag,
         )
 
     if args.runtime_profile:
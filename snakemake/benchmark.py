@@ -386,3 +386,28 @@ def write_benchmark_records(records, path):
     """Write benchmark records to file at path"""
     with open(path, "wt") as f:
         print_benchmark_records(records, f)
+
+
+def read_benchmark_records(path):
+    """Read the records of the benchmark file at path as a list of ``dict``
+    mapping the columns to values (``float``, or ``None`` for missing values)"""
+
+    def to_float(x):
+        try:
+            return float(x)
+        except ValueError:
+            return None
+
+    records = []
+    with open(path, "rt") as f:
+        header = next(f).rstrip("\n").split("\t")
+        for line in f:
+            values = line.rstrip("\n").split("\t")
+            records.append(
+                {
+                    name: to_float(value)
+                    for name, value in zip(header, values)
+                    if name != "h:m:s"
+                }
+            )
+    return records
@@ -6,6 +6,8 @@ __license__ = "MIT"
 
 import hashlib
 import json
+import os
+import tempfile
 
 from snakemake.jobs import Job
 from snakemake import script
@@ -19,6 +21,7 @@ __version__ = "0.1"
 class ProvenanceHashMap:
     def __init__(self):
         self._hashes = dict()
+        self._file_hashes = None
 
     def get_provenance_hash(self, job: Job, cache_mode: str):
         versioned_hash = hashlib.sha256()
@@ -27,6 +30,19 @@ class ProvenanceHashMap:
         versioned_hash.update(__version__.encode())
         return versioned_hash.hexdigest()
 
+    def save(self):
+        """Store the digests of input files, to be called once per run."""
+        if self._file_hashes is not None:
+            self._file_hashes.save()
+
+    def _hash_input_file(self, f, workflow):
+        if self._file_hashes is None:
+            persistence = getattr(workflow, "persistence", None)
+            if persistence is None:
+                return hash_file(f)
+            self._file_hashes = FileHashCache(persistence.file_hashes_path)
+        return self._file_hashes.get(f)
+
     def _get_provenance_hash(self, job: Job, cache_mode: str):
         """
         Recursively calculate hash for the output of the given job
@@ -106,7 +122,7 @@ class ProvenanceHashMap:
 
         # Hash input files that are not generated by other jobs (sorted by hash value).
         for file_hash in sorted(
-            hash_file(f)
+            self._hash_input_file(f, workflow)
             for f in job.input
             if not any(f in depfiles for depfiles in job.dag.dependencies[job].values())
         ):
@@ -136,10 +152,70 @@ class ProvenanceHashMap:
         return provenance_hash
 
 
-def hash_file(f):
+class FileHashCache:
+    """Persistent store of file digests (as calculated by hash_file()).
+
+    Digests are keyed by the absolute path of the file and only reused
+    as long as inode, size and modification time of the file are unchanged.
+    This way, large input files have to be read only once across runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._digests = None
+        self._changed = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self._digests = json.load(f)
+        except (OSError, ValueError):
+            self._digests = dict()
+
+    def get(self, f):
+        """Return the digest of the given file, calculating it if necessary."""
+        if self._digests is None:
+            self._load()
+        path = os.path.abspath(f)
+        stat = os.stat(path)
+        key = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+        entry = self._digests.get(path)
+        if entry is not None and entry[:3] == key:
+            return entry[3]
+        digest = hash_file(path)
+        self._digests[path] = key + [digest]
+        self._changed = True
+        return digest
+
+    def save(self):
+        """Store the digests if any of them have changed."""
+        if not self._changed:
+            return
+        # forget about files that have been deleted in the meantime
+        digests = {
+            path: entry for path, entry in self._digests.items() if os.path.exists(path)
+        }
+        dirname = os.path.dirname(self.path)
+        os.makedirs(dirname, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w", dir=dirname, delete=False, suffix=".tmp"
+        ) as tmpfile:
+            json.dump(digests, tmpfile)
+        os.replace(tmpfile.name, self.path)
+        self._digests = digests
+        self._changed = False
+
+
+def hash_file(f, blocksize=1 << 20):
     h = hashlib.sha256()
-    with open(f, "rb") as f:
-        # Read and update hash string value in blocks of 4K
-        for byte_block in iter(lambda: f.read(4096), b""):
-            h.update(byte_block)
+    buffer = bytearray(blocksize)
+    view = memoryview(buffer)
+    with open(f, "rb", buffering=0) as f:
+        # Read into a reused buffer in large blocks (1MiB by default), avoiding
+        # both many small reads and allocating a new bytes object per block.
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
     return h.hexdigest()
@@ -0,0 +1,192 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import json
+import os
+from collections import defaultdict
+
+from snakemake.benchmark import read_benchmark_records
+from snakemake.logging import logger
+
+
+def read_benchmark_runtime(path):
+    """Return the mean runtime (in seconds) over the repeats recorded in the
+    given benchmark file, or None if it cannot be read."""
+    try:
+        runtimes = [record["s"] for record in read_benchmark_records(path)]
+    except (OSError, StopIteration, KeyError):
+        return None
+    if not runtimes or None in runtimes:
+        return None
+    return sum(runtimes) / len(runtimes)
+
+
+class CriticalPath:
+    """
+    Critical-path scores of the jobs to be executed: the expected runtime of
+    the longest path from a job through the jobs depending on it.
+
+    Expected runtimes of jobs are taken (in this order) from their benchmark
+    files of a previous run, from the durations recorded in a statistics file
+    of a previous run (see --stats), from the job history of the working
+    directory, from the mean of the former for all jobs of the same rule, from
+    the median runtime of the rule in the job history, or from the runtime
+    resource (in minutes) of the rule.
+    Jobs without any of these are assumed to take the mean of all known
+    runtimes.
+    """
+
+    def __init__(self, stats=None):
+        self.rule_runtimes = dict()
+        self.file_runtimes = dict()
+        if stats is not None and os.path.exists(stats):
+            try:
+                with open(stats) as f:
+                    data = json.load(f)
+                self.rule_runtimes = {
+                    rule: values["mean-runtime"]
+                    for rule, values in data.get("rules", {}).items()
+                }
+                self.file_runtimes = {
+                    f: values["duration"] for f, values in data.get("files", {}).items()
+                }
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(
+                    "Failed to read runtimes from statistics file {}: {}".format(
+                        stats, e
+                    )
+                )
+        self._benchmark_runtimes = dict()
+        # (rule, wildcards) -> last runtime, rule -> median runtime
+        self.history_runtimes = None
+        self.history_rule_runtimes = dict()
+        self._scores = dict()
+        # job -> (expected runtime, source of the estimate)
+        self._runtimes = dict()
+
+    def _known_runtime(self, job):
+        if job.benchmark:
+            if job not in self._benchmark_runtimes:
+                self._benchmark_runtimes[job] = (
+                    read_benchmark_runtime(job.benchmark)
+                    if os.path.exists(job.benchmark)
+                    else None
+                )
+            runtime = self._benchmark_runtimes[job]
+            if runtime is not None:
+                return runtime, "benchmark"
+        for f in job.output:
+            runtime = self.file_runtimes.get(f)
+            if runtime is not None:
+                return runtime, "stats"
+        if self.history_runtimes:
+            runtime = self.history_runtimes.get(
+                (job.rule.name, json.dumps(dict(job.wildcards_dict), sort_keys=True))
+            )
+            if runtime is not None:
+                return runtime, "history"
+        return None, None
+
+    def load_history(self, history):
+        """Use the runtimes of the successful jobs in the given JobHistory."""
+        self.history_runtimes = dict()
+        for record in history.jobs(status="success"):
+            if record.runtime is not None:
+                key = record.rule, json.dumps(record.wildcards, sort_keys=True)
+                self.history_runtimes[key] = record.runtime
+        self.history_rule_runtimes = {
+            rule: percentiles[50]
+            for rule, percentiles in history.percentiles(q=(50,)).items()
+        }
+
+    def _estimate_runtimes(self, jobs):
+        runtimes = dict()
+        rule_runtimes = defaultdict(list)
+        for job in jobs:
+            runtime, source = self._known_runtime(job)
+            if runtime is not None:
+                runtimes[job] = runtime, source
+                rule_runtimes[job.rule.name].append(runtime)
+        rule_means = {
+            rule: sum(values) / len(values) for rule, values in rule_runtimes.items()
+        }
+        known = [runtime for runtime, _ in runtimes.values()]
+        default = sum(known) / len(known) if known else 1
+
+        for job in jobs:
+            if job in runtimes:
+                continue
+            rule = job.rule.name
+            if rule in rule_means:
+                runtimes[job] = rule_means[rule], "rule"
+            elif rule in self.history_rule_runtimes:
+                runtimes[job] = self.history_rule_runtimes[rule], "history"
+            elif rule in self.rule_runtimes:
+                runtimes[job] = self.rule_runtimes[rule], "stats"
+            elif isinstance(job.rule.resources.get("runtime"), int):
+                runtimes[job] = job.rule.resources["runtime"] * 60, "resource"
+            else:
+                runtimes[job] = default, "default"
+        return runtimes
+
+    def update(self, dag):
+        """Compute the scores of all jobs that still have to be executed."""
+        jobs = set(dag.needrun_jobs())
+        self._runtimes = self._estimate_runtimes(jobs)
+        scores = self._scores = dict()
+        # visit the depending jobs first
+        for level in reversed(list(dag.toposorted(jobs))):
+            for job in level:
+                scores[job] = self._runtimes[job][0] + max(
+                    (scores.get(job_, 0) for job_ in dag.depending[job]), default=0
+                )
+
+    def score(self, job):
+        if job.is_group():
+            return max((self._scores.get(j, 0) for j in job), default=0)
+        return self._scores.get(job, 0)
+
+    def path(self, dag):
+        """Return the jobs on the critical path, starting with the job that has
+        the highest score."""
+        if not self._scores:
+            return []
+        job = max(self._scores, key=self._scores.get)
+        path = [job]
+        while True:
+            depending = [job_ for job_ in dag.depending[job] if job_ in self._scores]
+            if not depending:
+                return path
+            job = max(depending, key=self._scores.get)
+            path.append(job)
+
+    def dump(self, dag, path):
+        """Write the critical path as a table to the given file."""
+        with open(path, "w") as f:
+            print(
+                "jobid",
+                "rule",
+                "wildcards",
+                "expected_runtime",
+                "estimated_from",
+                "remaining_runtime",
+                sep="\t",
+                file=f,
+            )
+            for job in self.path(dag):
+                runtime, source = self._runtimes[job]
+                print(
+                    dag.jobid(job),
+                    job.rule.name,
+                    ",".join(
+                        "{}={}".format(name, value)
+                        for name, value in job.wildcards_dict.items()
+                    ),
+                    "{:.2f}".format(runtime),
+                    source,
+                    "{:.2f}".format(self._scores[job]),
+                    sep="\t",
+                    file=f,
+                )
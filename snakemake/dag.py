@@ -12,8 +12,8 @@ import textwrap
 import time
 import tarfile
 from collections import defaultdict, Counter, deque, namedtuple
-from itertools import chain, filterfalse, groupby
 from functools import partial
+from itertools import chain, filterfalse, groupby
 from pathlib import Path
 import uuid
 import math
@@ -39,6 +39,10 @@ from snakemake.logging import logger
 from snakemake.common import DYNAMIC_FILL, ON_WINDOWS, group_into_chunks, is_local_file
 from snakemake.deployment import conda, singularity
 from snakemake.output_index import OutputIndex
+from snakemake.job_graph import Adjacency
+from snakemake.dag_cache import DAGCache
+from snakemake.temp_deletion import TempDeletion
+from snakemake.critical_path import CriticalPath
 from snakemake import workflow
 from snakemake.sourcecache import (
     LocalSourceFile,
@@ -113,10 +117,23 @@ class DAG:
         notemp=False,
         keep_remote_local=False,
         batch=None,
+        compact_graph=False,
+        critical_path=False,
+        runtime_stats=None,
     ):
         self.dryrun = dryrun
-        self.dependencies = defaultdict(partial(defaultdict, set))
-        self.depending = defaultdict(partial(defaultdict, set))
+        if compact_graph:
+            # track changes, such that integer-indexed copies of the graph can
+            # be traversed
+            self.dependencies = Adjacency()
+            self.depending = Adjacency()
+        else:
+            self.dependencies = defaultdict(partial(defaultdict, set))
+            self.depending = defaultdict(partial(defaultdict, set))
+        self.compact_graph = compact_graph
+        self.critical_path = (
+            CriticalPath(stats=runtime_stats) if critical_path else None
+        )
         self._needrun = set()
         self._priority = dict()
         self._reason = defaultdict(Reason)
@@ -137,6 +154,9 @@ class DAG:
         self.targetjobs = set()
         self.prioritytargetjobs = set()
         self._ready_jobs = set()
+        # jobs that became ready since the last call of pop_new_ready_jobs(),
+        # None if the ready jobs have to be considered from scratch
+        self._new_ready_jobs = None
         self.notemp = notemp
         self.keep_remote_local = keep_remote_local
         self._jobid = dict()
@@ -146,6 +166,11 @@ class DAG:
         self._progress = 0
         self._group = dict()
         self._n_until_ready = defaultdict(int)
+        # number of unfinished needrun jobs consuming each temp file
+        self._temp_consumers = Counter()
+        # finished jobs whose temp input has not yet been released
+        self._finishing = set()
+        self.temp_deletion = TempDeletion()
         self._running = set()
 
         self.job_factory = JobFactory()
@@ -193,6 +218,35 @@ class DAG:
 
     def init(self, progress=False):
         """Initialise the DAG."""
+        dag_cache = None
+        if self.workflow.dag_cache and not self.has_dynamic_rules and not self.batch:
+            dag_cache = DAGCache(self, self.workflow.persistence.dag_cache_path)
+        restored = dag_cache is not None and dag_cache.restore()
+        if not restored:
+            self.build(progress=progress)
+
+        self.cleanup()
+        if dag_cache is not None and not restored:
+            dag_cache.save()
+
+        self.check_incomplete()
+
+        self.update_container_imgs()
+        self.update_conda_envs()
+
+        self.update_needrun(create_inventory=True)
+        self.set_until_jobs()
+        self.delete_omitfrom_jobs()
+        self.update_jobids()
+
+        self.check_directory_outputs()
+
+        # check if remaining jobs are valid
+        for i, job in enumerate(self.jobs):
+            job.is_valid()
+
+    def build(self, progress=False):
+        """Resolve the target jobs and all their dependencies."""
         for job in map(self.rule2job, self.targetrules):
             job = self.update([job], progress=progress, create_inventory=True)
             self.targetjobs.add(job)
@@ -220,24 +274,6 @@ class DAG:
                 )
                 self.targetjobs.add(job)
 
-        self.cleanup()
-
-        self.check_incomplete()
-
-        self.update_container_imgs()
-        self.update_conda_envs()
-
-        self.update_needrun(create_inventory=True)
-        self.set_until_jobs()
-        self.delete_omitfrom_jobs()
-        self.update_jobids()
-
-        self.check_directory_outputs()
-
-        # check if remaining jobs are valid
-        for i, job in enumerate(self.jobs):
-            job.is_valid()
-
     def check_directory_outputs(self):
         """Check that no output file is contained in a directory output of the same or another rule."""
         outputs = sorted(
@@ -439,6 +475,17 @@ class DAG:
         """Jobs that are ready to execute."""
         return self._ready_jobs
 
+    def pop_new_ready_jobs(self):
+        """Return the jobs that became ready since the last call.
+
+        Returns None if the ready jobs have been recomputed in the meantime
+        (e.g. because the DAG has been updated), such that all of them have
+        to be considered again.
+        """
+        new_ready_jobs = self._new_ready_jobs
+        self._new_ready_jobs = []
+        return new_ready_jobs
+
     def needrun(self, job):
         """Return whether a given job needs to be executed."""
         return job in self._needrun
@@ -706,19 +753,17 @@ class DAG:
             return
 
         is_temp = lambda f: is_flagged(f, "temp")
-
-        # handle temp input
-        needed = lambda job_, f: any(
-            f in files
-            for j, files in self.depending[job_].items()
-            if not self.finished(j) and self.needrun(j) and j != job
-        )
+        _temp_consumers = self._temp_consumers
 
         def unneeded_files():
             # temp input
             for job_, files in self.dependencies[job].items():
-                tempfiles = set(f for f in job_.expanded_output if is_temp(f))
-                yield from filterfalse(partial(needed, job_), tempfiles & files)
+                for f in job_.expanded_output:
+                    if f in files and is_temp(f):
+                        _temp_consumers[f] -= 1
+                        if _temp_consumers[f] <= 0:
+                            del _temp_consumers[f]
+                            yield f
 
             # temp output
             if (
@@ -729,19 +774,44 @@ class DAG:
                     or job.rule.name == self.workflow.default_target
                 )
             ):
-                tempfiles = (
+                yield from (
                     f
                     for f in job.expanded_output
-                    if is_temp(f) and f not in self.targetfiles
+                    if is_temp(f)
+                    and f not in self.targetfiles
+                    and f not in _temp_consumers
                 )
-                yield from filterfalse(partial(needed, job), tempfiles)
 
         for f in unneeded_files():
             if self.dryrun:
                 logger.info(f"Would remove temporary output {f}")
             else:
-                logger.info("Removing temporary output {}.".format(f))
-                f.remove(remove_non_empty_dir=True)
+                self.temp_deletion.submit(f)
+
+    def temp_needed(self, f):
+        """Return whether the given temp file is still needed by unfinished
+        jobs."""
+        return f in self._temp_consumers
+
+    def update_temp_consumers(self):
+        """Count the unfinished needrun jobs that consume each temp file,
+        such that handle_temp() does not have to scan the depending jobs."""
+        _temp_consumers = self._temp_consumers
+        _temp_consumers.clear()
+        if self.notemp:
+            return
+        tempfiles = dict()
+        # Jobs that are currently being finished still count as consumers,
+        # since handle_temp() releases their temp input afterwards.
+        for job in chain(self.needrun_jobs(), self._finishing):
+            for job_, files in self.dependencies[job].items():
+                temp = tempfiles.get(job_)
+                if temp is None:
+                    temp = tempfiles[job_] = {
+                        f for f in job_.expanded_output if is_flagged(f, "temp")
+                    }
+                if temp:
+                    _temp_consumers.update(temp & files)
 
     def handle_log(self, job, upload_remote=True):
         for f in job.log:
@@ -1058,12 +1128,13 @@ class DAG:
             try:
                 return is_same_checksum_cache[(f, job)]
             except KeyError:
-                if not f.is_checksum_eligible():
+                persistence = self.workflow.persistence
+                if not f.is_checksum_eligible(any_size=persistence.content_checksums):
                     # no chance to compute checksum, cannot be assumed the same
                     is_same = False
                 else:
                     # obtain the input checksums for the given file for all output files of the job
-                    checksums = self.workflow.persistence.input_checksums(job, f)
+                    checksums = persistence.input_checksums(job, f)
                     if len(checksums) > 1:
                         # more than one checksum recorded, cannot be all the same
                         is_same = False
@@ -1071,7 +1142,7 @@ class DAG:
                         # no checksums recorded, we cannot assume them to be the same
                         is_same = False
                     else:
-                        is_same = f.is_same_checksum(checksums.pop())
+                        is_same = persistence.is_same_checksum(f, checksums.pop())
 
                 is_same_checksum_cache[(f, job)] = is_same
                 return is_same
@@ -1174,6 +1245,7 @@ class DAG:
         _needrun.clear()
         _n_until_ready.clear()
         self._ready_jobs.clear()
+        self._new_ready_jobs = None
 
         candidates = list(self.toposorted())
 
@@ -1232,6 +1304,8 @@ class DAG:
         for job in _needrun:
             _n_until_ready[job] = sum(1 for dep in dependencies[job] if dep in _needrun)
 
+        self.update_temp_consumers()
+
         # update len including finished jobs (because they have already increased the job counter)
         self._len = len(self._finished | self._needrun)
 
@@ -1290,6 +1364,20 @@ class DAG:
         ):
             self._priority[job] = Job.HIGHEST_PRIORITY
 
+    def update_critical_path(self):
+        """Update the critical-path scores of the jobs to be executed."""
+        if self.critical_path is not None:
+            if self.critical_path.history_runtimes is None:
+                self.critical_path.load_history(self.workflow.persistence.history)
+            self.critical_path.update(self)
+
+    def critical_path_score(self, job):
+        """Return the critical-path score of the given job, or 0 if jobs shall
+        not be prioritized by their critical path."""
+        if self.critical_path is None or not self.workflow.critical_path_priority:
+            return 0
+        return self.critical_path.score(job)
+
     def update_groups(self):
         groups = dict()
         for job in self.needrun_jobs():
@@ -1365,7 +1453,9 @@ class DAG:
 
         if jobs is None:
             jobs = self.needrun_jobs()
+            self._new_ready_jobs = None
 
+        new_ready_jobs = []
         potential_new_ready_jobs = False
         candidate_groups = set()
         for job in jobs:
@@ -1375,17 +1465,20 @@ class DAG:
             if not self.finished(job) and self._ready(job):
                 potential_new_ready_jobs = True
                 if job.group is None:
-                    self._ready_jobs.add(job)
+                    new_ready_jobs.append(job)
                 else:
                     group = self._group[job]
-                    if group not in self._running:
+                    if group not in self._running and group not in self._ready_jobs:
                         candidate_groups.add(group)
 
-        self._ready_jobs.update(
+        new_ready_jobs.extend(
             group
             for group in candidate_groups
             if all(self._ready(job) for job in group)
         )
+        self._ready_jobs.update(new_ready_jobs)
+        if self._new_ready_jobs is not None:
+            self._new_ready_jobs.extend(new_ready_jobs)
         return potential_new_ready_jobs
 
     def get_jobs_or_groups(self):
@@ -1418,6 +1511,7 @@ class DAG:
             self.update_conda_envs()
             self.update_needrun()
         self.update_priority()
+        self.update_critical_path()
         self.handle_pipes_and_services()
         self.update_groups()
 
@@ -1567,9 +1661,13 @@ class DAG:
     def update_checkpoint_dependencies(self, jobs=None):
         """Update dependencies of checkpoints."""
         updated = False
-        self.update_checkpoint_outputs()
         if jobs is None:
             jobs = [job for job in self.jobs if not self.needrun(job)]
+        elif not any(job.is_checkpoint for job in jobs):
+            # Nothing to do. Avoid recollecting the checkpoint outputs,
+            # which would iterate over all needrun jobs.
+            return updated
+        self.update_checkpoint_outputs()
         for job in jobs:
             if job.is_checkpoint:
                 depending = list(self.depending[job])
@@ -1583,6 +1681,12 @@ class DAG:
             self.postprocess()
         return updated
 
+    def register_restart(self, job):
+        """Mark a failed job as ready again such that it can be restarted."""
+        self._ready_jobs.add(job)
+        if self._new_ready_jobs is not None:
+            self._new_ready_jobs.append(job)
+
     def register_running(self, jobs):
         self._running.update(jobs)
         self._ready_jobs -= jobs
@@ -1617,16 +1721,22 @@ class DAG:
             jobs = [job]
 
         self._finished.update(jobs)
+        self._finishing.update(jobs)
 
         updated_dag = False
         if update_dynamic:
             updated_dag = self.update_checkpoint_dependencies(jobs)
 
+        # Only the direct dependents of the finished jobs are touched here.
+        # _n_until_ready holds, per needrun job, the number of unfinished
+        # needrun dependencies (i.e. its in-degree in the remaining DAG), such
+        # that the cost of finishing a job is linear in its out-degree.
         depending = [
             j
             for job in jobs
+            if not self.in_until(job)
             for j in self.depending[job]
-            if not self.in_until(job) and self.needrun(j)
+            if self.needrun(j)
         ]
 
         if not updated_dag:
@@ -1664,11 +1774,17 @@ class DAG:
 
         for job in jobs:
             self.handle_temp(job)
+        self._finishing.clear()
 
         return potential_new_ready_jobs
 
     def new_job(
-        self, rule, targetfile=None, format_wildcards=None, wildcards_dict=None
+        self,
+        rule,
+        targetfile=None,
+        format_wildcards=None,
+        wildcards_dict=None,
+        matched_wildcards=None,
     ):
         """Create new job for given rule and (optional) targetfile.
         This will reuse existing jobs with the same wildcards."""
@@ -1687,7 +1803,11 @@ class DAG:
         if key in self.job_cache:
             assert targetfile is not None
             return self.job_cache[key]
-        wildcards_dict = rule.get_wildcards(targetfile, wildcards_dict=wildcards_dict)
+        wildcards_dict = rule.get_wildcards(
+            targetfile,
+            wildcards_dict=wildcards_dict,
+            matched_wildcards=matched_wildcards,
+        )
         job = self.job_factory.new(
             rule,
             self,
@@ -1880,8 +2000,21 @@ class DAG:
                     # no dependency found
                     yield PotentialDependency(file, None, False)
 
+    def _compact(self, direction, jobs):
+        """Return the compact graph of the given direction if enabled and if
+        it contains all given jobs."""
+        if self.compact_graph and isinstance(direction, Adjacency):
+            graph = direction.compact()
+            if graph.covers(jobs):
+                return graph
+        return None
+
     def bfs(self, direction, *jobs, stop=lambda job: False):
         """Perform a breadth-first traversal of the DAG."""
+        graph = self._compact(direction, jobs)
+        if graph is not None:
+            yield from graph.bfs(jobs, stop=stop)
+            return
         queue = deque(jobs)
         visited = set(queue)
         while queue:
@@ -1898,10 +2031,14 @@ class DAG:
     def level_bfs(self, direction, *jobs, stop=lambda job: False):
         """Perform a breadth-first traversal of the DAG, but also yield the
         level together with each job."""
-        queue = [(job, 0) for job in jobs]
+        graph = self._compact(direction, jobs)
+        if graph is not None:
+            yield from graph.level_bfs(jobs, stop=stop)
+            return
+        queue = deque((job, 0) for job in jobs)
         visited = set(jobs)
         while queue:
-            job, level = queue.pop(0)
+            job, level = queue.popleft()
             if stop(job):
                 # stop criterion reached for this node
                 continue
@@ -1914,6 +2051,10 @@ class DAG:
 
     def dfs(self, direction, *jobs, stop=lambda job: False, post=True):
         """Perform depth-first traversal of the DAG."""
+        graph = self._compact(direction, jobs)
+        if graph is not None:
+            yield from graph.dfs(jobs, stop=stop, post=post)
+            return
         visited = set()
 
         def _dfs(job):
@@ -1931,7 +2072,7 @@ class DAG:
                 yield job
 
         for job in jobs:
-            for job_ in self._dfs(direction, job, visited, stop=stop, post=post):
+            for job_ in _dfs(job):
                 yield job_
 
     def new_wildcards(self, job):
@@ -1957,19 +2098,21 @@ class DAG:
         return self.new_job(targetrule)
 
     def file2jobs(self, targetfile, wildcards_dict=None):
-        rules = self.output_index.match(targetfile)
+        producers = self.output_index.match_producers(targetfile)
         jobs = []
         exceptions = list()
-        for rule in rules:
-            if rule.is_producer(targetfile):
-                try:
-                    jobs.append(
-                        self.new_job(
-                            rule, targetfile=targetfile, wildcards_dict=wildcards_dict
-                        )
+        for rule, matched_wildcards in producers.items():
+            try:
+                jobs.append(
+                    self.new_job(
+                        rule,
+                        targetfile=targetfile,
+                        wildcards_dict=wildcards_dict,
+                        matched_wildcards=matched_wildcards,
                     )
-                except InputFunctionException as e:
-                    exceptions.append(e)
+                )
+            except InputFunctionException as e:
+                exceptions.append(e)
         if not jobs:
             if exceptions:
                 raise exceptions[0]
@@ -2509,16 +2652,20 @@ class DAG:
                     d for job in group for d in self.dependencies[job] if d not in group
                 )
 
-        # Collect every job's dependencies into a definitive mapping
-        dependencies = {}
-        for job in jobs:
-            if job.pipe_group in pipe_dependencies:
-                deps = pipe_dependencies[job.pipe_group]
-            else:
-                deps = self.dependencies[job]
-            dependencies[job] = {dep for dep in deps if dep in jobs}
+        graph = None if pipe_dependencies else self._compact(self.dependencies, ())
+        if graph is not None:
+            toposorted = graph.toposort(jobs)
+        else:
+            # Collect every job's dependencies into a definitive mapping
+            dependencies = {}
+            for job in jobs:
+                if job.pipe_group in pipe_dependencies:
+                    deps = pipe_dependencies[job.pipe_group]
+                else:
+                    deps = self.dependencies[job]
+                dependencies[job] = {dep for dep in deps if dep in jobs}
 
-        toposorted = toposort(dependencies)
+            toposorted = toposort(dependencies)
 
         # Within each toposort layer, entries should be sorted so that pipe jobs are
         # listed order of dependence, i.e. dependent jobs before depending jobs
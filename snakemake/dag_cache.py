@@ -0,0 +1,201 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@uni-due.de"
+__license__ = "MIT"
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from snakemake.exceptions import WorkflowError
+from snakemake.logging import logger
+
+
+class DAGCache:
+    """Persistent on-disk cache of the job graph.
+
+    The cache stores the jobs (rule name, wildcards and targetfile) and the
+    edges between them after the initial DAG computation. It is keyed by a
+    fingerprint of everything that determines the shape of the graph: the
+    Snakemake version, the content of all included Snakefiles, the config
+    and the requested targets. If nothing of that changed, the graph can be
+    restored without resolving any file to its producing rule. Whether jobs
+    need to run is still determined from scratch afterwards.
+
+    Note that the fingerprint does not cover the file system: if files
+    that have been present when the cache was written disappear, the cache
+    is discarded (see validation in restore()). Python modules imported
+    from the Snakefile are not part of the fingerprint either.
+    """
+
+    version = 1
+    max_entries = 5
+
+    def __init__(self, dag, path):
+        self.dag = dag
+        self.path = path
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            from snakemake import __version__
+
+            workflow = self.dag.workflow
+            h = hashlib.sha256()
+            h.update(f"{self.version}:{__version__}".encode())
+            for source_file in workflow.included:
+                h.update(source_file.get_path_or_uri().encode())
+                with workflow.sourcecache.open(source_file, "rb") as f:
+                    h.update(f.read())
+            h.update(json.dumps(workflow.config, sort_keys=True, default=str).encode())
+            h.update(json.dumps(sorted(rule.name for rule in self.dag.rules)).encode())
+            h.update(
+                json.dumps(sorted(rule.name for rule in self.dag.targetrules)).encode()
+            )
+            h.update(json.dumps(sorted(map(str, self.dag.targetfiles))).encode())
+            if self.dag.target_jobs_def:
+                h.update(
+                    json.dumps(
+                        sorted(
+                            [spec.rulename, sorted(spec.wildcards_dict.items())]
+                            for spec in self.dag.target_jobs_def
+                        )
+                    ).encode()
+                )
+            h.update(str(self.dag.ignore_ambiguity).encode())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    @property
+    def record_path(self):
+        return os.path.join(self.path, f"{self.fingerprint}.json")
+
+    @staticmethod
+    def _input_digest(job):
+        return hashlib.md5(
+            "\0".join(sorted(map(str, job.unique_input))).encode()
+        ).hexdigest()
+
+    def save(self):
+        """Store the current job graph."""
+        dag = self.dag
+        jobs = list(dag.dependencies)
+        jobidx = {job: i for i, job in enumerate(jobs)}
+        record = {
+            "version": self.version,
+            "jobs": [
+                [
+                    job.rule.name,
+                    job.wildcards_dict,
+                    None if job.targetfile is None else str(job.targetfile),
+                    self._input_digest(job),
+                ]
+                for job in jobs
+            ],
+            "targetjobs": sorted(jobidx[job] for job in dag.targetjobs),
+            "dependencies": [
+                [jobidx[job], jobidx[dep], sorted(map(str, files))]
+                for job, deps in dag.dependencies.items()
+                for dep, files in deps.items()
+            ],
+        }
+        os.makedirs(self.path, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w", dir=self.path, delete=False, suffix=".tmp"
+        ) as tmpfile:
+            json.dump(record, tmpfile)
+        os.replace(tmpfile.name, self.record_path)
+        self._prune()
+
+    def _prune(self):
+        # keep only the most recently used records
+        records = sorted(
+            Path(self.path).glob("*.json"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for p in records[self.max_entries :]:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+    def load(self):
+        try:
+            with open(self.record_path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("version") != self.version:
+            return None
+        return record
+
+    def restore(self):
+        """Restore the job graph from the cache.
+
+        Returns True if successful. Otherwise, the DAG is left untouched
+        and has to be computed from scratch.
+        """
+        record = self.load()
+        if record is None:
+            return False
+
+        dag = self.dag
+        rules = {rule.name: rule for rule in dag.rules}
+        jobs = []
+        for rulename, wildcards_dict, targetfile, input_digest in record["jobs"]:
+            rule = rules.get(rulename)
+            if rule is None:
+                return self._invalidate(f"rule {rulename} is unknown")
+            try:
+                job = dag.job_factory.new(
+                    rule, dag, wildcards_dict=wildcards_dict, targetfile=targetfile
+                )
+            except WorkflowError:
+                return self._invalidate(f"failed to restore job of rule {rulename}")
+            if self._input_digest(job) != input_digest:
+                return self._invalidate(f"input of {job} has changed")
+            jobs.append(job)
+
+        dependencies = dict()
+        for i, j, files in record["dependencies"]:
+            job = jobs[i]
+            input_files = {str(f): f for f in job.unique_input}
+            try:
+                dependencies[(i, j)] = {input_files[f] for f in files}
+            except KeyError:
+                return self._invalidate(f"input of {job} has changed")
+
+        # files without producer must be present on disk
+        produced = {(i, f) for (i, _), files in dependencies.items() for f in files}
+        for i, job in enumerate(jobs):
+            for f in job.unique_input:
+                if (i, f) in produced or f in job.subworkflow_input:
+                    continue
+                f.inventory()
+                if not f.exists:
+                    return self._invalidate(f"input file {f} is missing")
+
+        for job in jobs:
+            dag.cache_job(job)
+            dag.dependencies[job]
+        for (i, j), files in dependencies.items():
+            dag.dependencies[jobs[i]][jobs[j]].update(files)
+            dag.depending[jobs[j]][jobs[i]].update(files)
+        dag.targetjobs.update(jobs[i] for i in record["targetjobs"])
+
+        # mark record as recently used
+        os.utime(self.record_path)
+        logger.info(f"Restored DAG of {len(jobs)} jobs from cache.")
+        return True
+
+    def _invalidate(self, reason):
+        logger.debug(f"Discarding cached DAG: {reason}.")
+        try:
+            os.remove(self.record_path)
+        except OSError:
+            pass
+        return False
@@ -10,7 +10,6 @@ import hashlib
 from distutils.version import LooseVersion
 
 import snakemake
-from snakemake.deployment.conda import Conda
 from snakemake.common import (
     is_local_file,
     parse_uri,
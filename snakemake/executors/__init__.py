@@ -22,13 +22,15 @@ import signal
 import tempfile
 from functools import partial
 from itertools import chain
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 import random
 import base64
 import uuid
 import re
 import math
 from snakemake.target_jobs import encode_target_jobs_cli_args
+from snakemake.job_payload import ineligible_reason, write_job_payload
+from snakemake import job_runner
 from fractions import Fraction
 
 from snakemake.jobs import Job
@@ -56,6 +58,7 @@ from snakemake.common import (
     async_lock,
 )
 from snakemake.executors.common import format_cli_arg, format_cli_pos_arg, join_cli_args
+from snakemake.executors.submission import SubmissionPool
 from snakemake.io import _IOFile
 
 
@@ -70,6 +73,12 @@ async def sleep():
         await asyncio.sleep(1)
 
 
+def _chunks(lst, n):
+    """Yield successive n-sized chunks from lst."""
+    for i in range(0, len(lst), n):
+        yield lst[i : i + n]
+
+
 class AbstractExecutor:
     def __init__(
         self,
@@ -98,15 +107,32 @@ class AbstractExecutor:
             ]
         )
 
-    def get_set_resources_args(self):
+    def get_set_resources_args(self, job=None):
+        """Return the --set-resources argument. If resources are estimated
+        from previous runs, the estimates for the given job are passed along
+        with the overwritten resources as a job argument instead of a general
+        argument, such that spawned processes use the same values."""
+        estimated = self.workflow.resource_estimator is not None
+        if estimated != (job is not None):
+            return ""
+        overwrite_resources = defaultdict(dict)
+        for rule, res in self.workflow.overwrite_resources.items():
+            overwrite_resources[rule].update(res)
+        if job is not None:
+            for j in job if job.is_group() else [job]:
+                res = overwrite_resources[j.rule.name]
+                for name in self.workflow.resource_estimator.resources:
+                    value = j.resources.get(name)
+                    if name in j.rule.explicit_resources or not isinstance(value, int):
+                        continue
+                    res[name] = max(value, res.get(name, value))
         return format_cli_arg(
             "--set-resources",
             [
                 f"{rule}:{name}={value}"
-                for rule, res in self.workflow.overwrite_resources.items()
+                for rule, res in overwrite_resources.items()
                 for name, value in res.items()
             ],
-            skip=not self.workflow.overwrite_resources,
         )
 
     def get_default_resources_args(self, default_resources=None):
@@ -277,6 +303,7 @@ class RealExecutor(AbstractExecutor):
             keep_metadata=self.workflow.keep_metadata,
         )
         self.stats.report_job_end(job)
+        self.record_history(job)
 
     def handle_job_error(self, job, upload_remote=True):
         job.postprocess(
@@ -284,6 +311,20 @@ class RealExecutor(AbstractExecutor):
             assume_shared_fs=self.assume_shared_fs,
             latency_wait=self.latency_wait,
         )
+        self.record_history(job, success=False)
+
+    def record_history(self, job, success=True):
+        """Record the job in the job history of the working directory."""
+        if self.workflow.mode != Mode.default:
+            # recorded by the main process
+            return
+        first = next(iter(job)) if job.is_group() else job
+        self.workflow.persistence.history.record(
+            job,
+            starttime=self.stats.starttime.get(first),
+            endtime=time.time(),
+            success=success,
+        )
 
     def workflow_property_to_arg(
         self, property, flag=None, quote=True, skip=False, invert=False, attr=None
@@ -339,6 +380,7 @@ class RealExecutor(AbstractExecutor):
                 w2a("max_threads"),
                 w2a("use_env_modules", flag="--use-envmodules"),
                 w2a("keep_metadata", flag="--drop-metadata", invert=True),
+                w2a("metadata_backend"),
                 w2a("wrapper_prefix"),
                 w2a("overwrite_threads", flag="--set-threads"),
                 w2a("overwrite_scatter", flag="--set-scatter"),
@@ -396,6 +438,7 @@ class RealExecutor(AbstractExecutor):
                 format_cli_arg("--attempt", job.attempt),
                 format_cli_arg("--force-use-threads", not job.is_group()),
                 self.get_resource_declarations(job),
+                self.get_set_resources_args(job),
             ]
         )
 
@@ -424,6 +467,12 @@ class RealExecutor(AbstractExecutor):
     def get_job_exec_suffix(self, job):
         return ""
 
+    def get_job_payload(self, job):
+        """Return the path to a payload file from which the spawned process
+        can execute the given job without parsing the Snakefile, or None if
+        the job has to be executed via the Snakefile."""
+        return None
+
     def format_job_exec(self, job):
         prefix = self.get_job_exec_prefix(job)
         if prefix:
@@ -431,6 +480,20 @@ class RealExecutor(AbstractExecutor):
         suffix = self.get_job_exec_suffix(job)
         if suffix:
             suffix = f"&& {suffix}"
+        payload = self.get_job_payload(job)
+        if payload is not None:
+            # the job runner does not import the snakemake package
+            return join_cli_args(
+                [
+                    prefix,
+                    self.get_envvar_declarations(),
+                    self.get_python_executable(),
+                    format_cli_pos_arg(os.path.abspath(job_runner.__file__)),
+                    format_cli_pos_arg(payload),
+                    str(self.latency_wait),
+                    suffix,
+                ]
+            )
         return join_cli_args(
             [
                 prefix,
@@ -459,6 +522,10 @@ class TouchExecutor(RealExecutor):
     def handle_job_success(self, job):
         super().handle_job_success(job, ignore_missing_output=True)
 
+    def record_history(self, job, success=True):
+        # touched jobs have not been executed
+        pass
+
 
 _ProcessPoolExceptions = (KeyboardInterrupt,)
 try:
@@ -696,6 +763,10 @@ class ClusterExecutor(RealExecutor):
     """
 
     default_jobscript = "jobscript.sh"
+    # whether jobs may be executed from payload files (see --job-payloads)
+    supports_job_payloads = False
+    # whether payloads are used even without --job-payloads
+    job_payloads_by_default = False
 
     def __init__(
         self,
@@ -807,6 +878,28 @@ class ClusterExecutor(RealExecutor):
     def get_exec_mode(self):
         return Mode.cluster
 
+    def get_job_payload(self, job):
+        if not (
+            (self.workflow.job_payloads or self.job_payloads_by_default)
+            and self.supports_job_payloads
+            and self.assume_shared_fs
+        ):
+            return None
+        reason = ineligible_reason(job, self.workflow)
+        if reason is not None:
+            logger.debug(
+                "Executing job {} via the Snakefile ({}).".format(job.jobid, reason)
+            )
+            return None
+        payload = self.get_jobscript(job) + ".payload.json"
+        write_job_payload(
+            job,
+            self.workflow,
+            payload,
+            wait_for_files=[self.tmpdir] + job.get_wait_for_files(),
+        )
+        return payload
+
     def get_job_args(self, job):
         waitfiles_parameter = ""
         if self.assume_shared_fs:
@@ -975,6 +1068,10 @@ GenericClusterJob = namedtuple(
 
 
 class GenericClusterExecutor(ClusterExecutor):
+    supports_job_payloads = True
+    # seconds to wait before the first retry, doubled with each further retry
+    submit_backoff = 2
+
     def __init__(
         self,
         workflow,
@@ -982,6 +1079,7 @@ class GenericClusterExecutor(ClusterExecutor):
         cores,
         submitcmd="qsub",
         statuscmd=None,
+        statusnargs=1,
         cancelcmd=None,
         cancelnargs=None,
         sidecarcmd=None,
@@ -994,6 +1092,9 @@ class GenericClusterExecutor(ClusterExecutor):
         assume_shared_fs=True,
         max_status_checks_per_second=1,
         keepincomplete=False,
+        max_jobs_per_second=None,
+        submit_concurrency=1,
+        submit_retries=0,
     ):
 
         self.submitcmd = submitcmd
@@ -1004,6 +1105,7 @@ class GenericClusterExecutor(ClusterExecutor):
             )
 
         self.statuscmd = statuscmd
+        self.statusnargs = statusnargs
         self.cancelcmd = cancelcmd
         self.sidecarcmd = sidecarcmd
         self.cancelnargs = cancelnargs
@@ -1027,6 +1129,14 @@ class GenericClusterExecutor(ClusterExecutor):
             keepincomplete=keepincomplete,
         )
 
+        self.submission = SubmissionPool(
+            concurrency=submit_concurrency,
+            max_per_second=max_jobs_per_second,
+            retries=submit_retries,
+            backoff=self.submit_backoff,
+            error_handler=self._submission_error,
+        )
+
         self.sidecar_vars = None
         if self.sidecarcmd:
             self._launch_sidecar()
@@ -1103,12 +1213,16 @@ class GenericClusterExecutor(ClusterExecutor):
         )
         thread_wait.start()
 
-    def cancel(self):
-        def _chunks(lst, n):
-            """Yield successive n-sized chunks from lst."""
-            for i in range(0, len(lst), n):
-                yield lst[i : i + n]
+    def _submission_error(self, e):
+        self.workflow.scheduler.executor_error_callback(e)
+
+    def shutdown(self):
+        self.submission.shutdown()
+        super().shutdown()
 
+    def cancel(self):
+        # jobs that have not yet been submitted are not submitted anymore
+        self.submission.shutdown(cancel=True)
         if self.cancelcmd:  # We have --cluster-cancel
             # Enumerate job IDs and create chunks.  If cancelnargs evaluates to false (0/None)
             # then pass all job ids at once
@@ -1194,6 +1308,34 @@ class GenericClusterExecutor(ClusterExecutor):
         except AttributeError as e:
             raise WorkflowError(str(e), rule=job.rule if not job.is_group() else None)
 
+        args = (
+            job,
+            submitcmd,
+            jobscript,
+            jobfinished,
+            jobfailed,
+            callback,
+            submit_callback,
+            error_callback,
+        )
+        if self.workflow.immediate_submit:
+            # The external jobid is needed for the dependencies of the next job.
+            self.submit(*args)
+        else:
+            self.submission.submit(self.submit, *args)
+
+    def submit(
+        self,
+        job,
+        submitcmd,
+        jobscript,
+        jobfinished,
+        jobfailed,
+        callback,
+        submit_callback,
+        error_callback,
+    ):
+        jobid = job.jobid
         try:
             env = dict(os.environ)
             if self.sidecar_vars:
@@ -1204,7 +1346,8 @@ class GenericClusterExecutor(ClusterExecutor):
             env.pop("SNAKEMAKE_PROFILE", None)
 
             ext_jobid = (
-                subprocess.check_output(
+                self.submission.call(
+                    subprocess.check_output,
                     '{submitcmd} "{jobscript}"'.format(
                         submitcmd=submitcmd, jobscript=jobscript
                     ),
@@ -1252,18 +1395,19 @@ class GenericClusterExecutor(ClusterExecutor):
         success = "success"
         failed = "failed"
         running = "running"
+        valid_returns = [running, success, failed]
         status_cmd_kills = []
         if self.statuscmd is not None:
 
-            def job_status(job, valid_returns=["running", "success", "failed"]):
+            def run_status_cmd(jobs):
                 try:
-                    # this command shall return "success", "failed" or "running"
                     env = dict(os.environ)
                     if self.sidecar_vars:
                         env["SNAKEMAKE_CLUSTER_SIDECAR_VARS"] = self.sidecar_vars
-                    ret = subprocess.check_output(
-                        "{statuscmd} '{jobid}'".format(
-                            jobid=job.jobid, statuscmd=self.statuscmd
+                    return subprocess.check_output(
+                        "{statuscmd} {jobids}".format(
+                            jobids=" ".join(f"'{job.jobid}'" for job in jobs),
+                            statuscmd=self.statuscmd,
                         ),
                         shell=True,
                         env=env,
@@ -1286,34 +1430,72 @@ class GenericClusterExecutor(ClusterExecutor):
                                 )
                             )
                             status_cmd_kills.clear()
+                        # check again in the next round
+                        return None
                     else:
                         raise WorkflowError(
                             "Failed to obtain job status. "
                             "See above for error message."
                         )
 
+            def job_statuses(jobs):
+                ret = run_status_cmd(jobs)
+                if ret is None:
+                    return [running] * len(jobs)
                 ret = ret.strip().split("\n")
-                if len(ret) != 1 or ret[0] not in valid_returns:
-                    raise WorkflowError(
-                        "Cluster status command {} returned {} but just a single line with one of {} is expected.".format(
-                            self.statuscmd, "\\n".join(ret), ",".join(valid_returns)
+
+                if self.statusnargs == 1:
+                    # this command shall return "success", "failed" or "running"
+                    if len(ret) != 1 or ret[0] not in valid_returns:
+                        raise WorkflowError(
+                            "Cluster status command {} returned {} but just a single line with one of {} is expected.".format(
+                                self.statuscmd, "\\n".join(ret), ",".join(valid_returns)
+                            )
+                        )
+                    return ret
+
+                # batch protocol: the command is invoked with multiple job ids and
+                # shall return one line "<jobid> <status>" per job id
+                statuses = dict()
+                for line in ret:
+                    fields = line.split()
+                    if len(fields) != 2 or fields[1] not in valid_returns:
+                        raise WorkflowError(
+                            "Cluster status command {} returned line '{}' but lines of the "
+                            "form '<jobid> <status>' with status being one of {} are "
+                            "expected.".format(
+                                self.statuscmd, line, ",".join(valid_returns)
+                            )
                         )
+                    statuses[fields[0]] = fields[1]
+                try:
+                    return [statuses[job.jobid] for job in jobs]
+                except KeyError as e:
+                    raise WorkflowError(
+                        "Cluster status command {} did not return a status for "
+                        "job id {}.".format(self.statuscmd, e)
                     )
-                return ret[0]
+
+            chunksize = self.statusnargs
 
         else:
 
             def job_status(job):
-                if os.path.exists(active_job.jobfinished):
-                    os.remove(active_job.jobfinished)
-                    os.remove(active_job.jobscript)
+                if os.path.exists(job.jobfinished):
+                    os.remove(job.jobfinished)
+                    os.remove(job.jobscript)
                     return success
-                if os.path.exists(active_job.jobfailed):
-                    os.remove(active_job.jobfailed)
-                    os.remove(active_job.jobscript)
+                if os.path.exists(job.jobfailed):
+                    os.remove(job.jobfailed)
+                    os.remove(job.jobscript)
                     return failed
                 return running
 
+            def job_statuses(jobs):
+                return list(map(job_status, jobs))
+
+            chunksize = 1
+
         while True:
             async with async_lock(self.lock):
                 if not self.wait:
@@ -1322,10 +1504,12 @@ class GenericClusterExecutor(ClusterExecutor):
                 self.active_jobs = list()
                 still_running = list()
             # logger.debug("Checking status of {} jobs.".format(len(active_jobs)))
-            for active_job in active_jobs:
+            # If chunksize evaluates to false (0/None), query all jobs at once.
+            for chunk in _chunks(active_jobs, chunksize or max(len(active_jobs), 1)):
                 async with self.status_rate_limiter:
-                    status = job_status(active_job)
+                    statuses = job_statuses(chunk)
 
+                for active_job, status in zip(chunk, statuses):
                     if status == success:
                         active_job.callback(active_job.job)
                     elif status == failed:
@@ -1358,6 +1542,8 @@ class SynchronousClusterExecutor(ClusterExecutor):
     remote exit code at remote exit.
     """
 
+    supports_job_payloads = True
+
     def __init__(
         self,
         workflow,
@@ -1468,6 +1654,8 @@ DRMAAClusterJob = namedtuple(
 
 
 class DRMAAExecutor(ClusterExecutor):
+    supports_job_payloads = True
+
     def __init__(
         self,
         workflow,
@@ -1,5 +1,7 @@
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 from functools import partial
+from itertools import count
+import asyncio
 import os
 import re
 import stat
@@ -16,7 +18,7 @@ from snakemake.logging import logger
 from snakemake.exceptions import print_exception
 from snakemake.exceptions import log_verbose_traceback
 from snakemake.exceptions import WorkflowError
-from snakemake.executors import ClusterExecutor
+from snakemake.executors import ClusterExecutor, _chunks
 from snakemake.utils import makedirs
 from snakemake.io import get_wildcard_names, Wildcards
 from snakemake.common import async_lock
@@ -42,6 +44,50 @@ def get_account():
         return None
 
 
+def expand_array_jobid(jobid):
+    """
+    expands the notation of sacct for array tasks that are summarized in
+    a single line (e.g. pending ones), like '123_[0-4:2,7%10]', into the
+    individual job ids '123_0', '123_2', '123_4', '123_7'
+    """
+    m = re.fullmatch(r"(\d+)_\[([^\]]+)\]", jobid)
+    if m is None:
+        return [jobid]
+    array_jobid, task_ids = m.groups()
+    # ignore the limit of simultaneously running tasks
+    task_ids = task_ids.split("%")[0]
+    expanded = []
+    for task_range in task_ids.split(","):
+        task_range, _, step = task_range.partition(":")
+        first, _, last = task_range.partition("-")
+        expanded.extend(
+            f"{array_jobid}_{task_id}"
+            for task_id in range(int(first), int(last or first) + 1, int(step or 1))
+        )
+    return expanded
+
+
+def parse_sacct_output(sacct_res, jobids):
+    """
+    parse the output of 'sacct -P -b -n' into a dict of job id -> state,
+    considering only the given job ids (i.e. no job steps)
+    """
+    jobids = set(jobids)
+    stati = dict()
+    for line in sacct_res.strip().split("\n"):
+        fields = line.split("|")
+        if len(fields) < 2:
+            continue
+        # states like 'CANCELLED by 1234' carry additional information
+        state = fields[1].split()
+        if not state:
+            continue
+        for jobid in expand_array_jobid(fields[0]):
+            if jobid in jobids:
+                stati[jobid] = state[0]
+    return stati
+
+
 def test_account(account):
     """
     tests whether the given account is registered, raises an error, if not
@@ -95,6 +141,18 @@ class SlurmExecutor(ClusterExecutor):
     clusters using snakemake resource string
     """
 
+    # maximal number of job ids to pass to a single sacct call
+    sacct_chunk_size = 1000
+    # number of active jobs per second of poll interval, see poll_interval()
+    status_jobs_per_second = 100
+    max_poll_interval = 60
+    # number of attempts to obtain the status of a job via sacct or scontrol
+    status_attempts = 10
+    # seconds to wait after a failed status query, multiplied by the attempt
+    status_retry_delay = 1
+    # maximal number of tasks per job array (SLURM's default MaxArraySize is 1001)
+    max_array_size = 1000
+
     def __init__(
         self,
         workflow,
@@ -107,6 +165,7 @@ class SlurmExecutor(ClusterExecutor):
         restart_times=0,
         max_status_checks_per_second=0.03,
         cluster_config=None,
+        job_arrays=False,
     ):
         super().__init__(
             workflow,
@@ -123,6 +182,9 @@ class SlurmExecutor(ClusterExecutor):
         )
         self._fallback_account_arg = None
         self._fallback_partition = None
+        self._tested_accounts = set()
+        self.job_arrays = job_arrays
+        self._array_ids = count()
 
     def additional_general_args(self):
         # we need to set -j to 1 here, because the behaviour
@@ -161,7 +223,9 @@ class SlurmExecutor(ClusterExecutor):
         if job.resources.get("slurm_account"):
             # here, we check whether the given or guessed account is valid
             # if not, a WorkflowError is raised
-            test_account(job.resources.slurm_account)
+            if job.resources.slurm_account not in self._tested_accounts:
+                test_account(job.resources.slurm_account)
+                self._tested_accounts.add(job.resources.slurm_account)
             return f" -A {job.resources.slurm_account}"
         else:
             if self._fallback_account_arg is None:
@@ -196,23 +260,16 @@ class SlurmExecutor(ClusterExecutor):
         else:
             return ""
 
-    def run(self, job, callback=None, submit_callback=None, error_callback=None):
-        super()._run(job)
-        jobid = job.jobid
-
-        log_folder = f"group_{job.name}" if job.is_group() else f"rule_{job.name}"
-
-        slurm_logfile = f".snakemake/slurm_logs/{log_folder}/%j.log"
-        os.makedirs(os.path.dirname(slurm_logfile), exist_ok=True)
-
-        # generic part of a submission string:
-        call = f"sbatch -J {self.get_jobname(job)} -o {slurm_logfile} --export=ALL"
-
-        call += self.get_account_arg(job)
-        call += self.get_partition_arg(job)
+    def get_sbatch_args(self, job):
+        """
+        returns the sbatch arguments that describe the resource
+        request of the given job
+        """
+        args = self.get_account_arg(job)
+        args += self.get_partition_arg(job)
 
         if job.resources.get("runtime"):
-            call += f" -t {job.resources.runtime}"
+            args += f" -t {job.resources.runtime}"
         else:
             logger.warning(
                 "No wall time information given. This might or might not work on your cluster. "
@@ -221,11 +278,11 @@ class SlurmExecutor(ClusterExecutor):
             )
 
         if job.resources.get("constraint"):
-            call += f" -C {job.resources.constraint}"
+            args += f" -C {job.resources.constraint}"
         if job.resources.get("mem_mb_per_cpu"):
-            call += f" --mem-per-cpu {job.resources.mem_mb_per_cpu}"
+            args += f" --mem-per-cpu {job.resources.mem_mb_per_cpu}"
         elif job.resources.get("mem_mb"):
-            call += f" --mem {job.resources.mem_mb}"
+            args += f" --mem {job.resources.mem_mb}"
         else:
             logger.warning(
                 "No job memory information ('mem_mb' or 'mem_mb_per_cpu') is given "
@@ -235,9 +292,9 @@ class SlurmExecutor(ClusterExecutor):
         # MPI job
         if job.resources.get("mpi", False):
             if job.resources.get("nodes", False):
-                call += f" --nodes={job.resources.get('nodes', 1)}"
+                args += f" --nodes={job.resources.get('nodes', 1)}"
             if job.resources.get("tasks", False):
-                call += f" --ntasks={job.resources.get('tasks', 1)}"
+                args += f" --ntasks={job.resources.get('tasks', 1)}"
 
         cpus_per_task = job.threads
         if job.resources.get("cpus_per_task"):
@@ -246,17 +303,16 @@ class SlurmExecutor(ClusterExecutor):
                     "cpus_per_task must be an integer, but is {}".format(cpus_per_task)
                 )
             cpus_per_task = job.resources.cpus_per_task
-        call += f" --cpus-per-task={cpus_per_task}"
+        args += f" --cpus-per-task={cpus_per_task}"
 
         if job.resources.get("slurm_extra"):
-            call += f" {job.resources.slurm_extra}"
-
-        exec_job = self.format_job_exec(job)
-        # ensure that workdir is set correctly
-        call += f" --chdir={self.workflow.workdir_init}"
-        # and finally the job to execute with all the snakemake parameters
-        call += f" --wrap={shlex.quote(exec_job)}"
+            args += f" {job.resources.slurm_extra}"
+        return args
 
+    def sbatch(self, call):
+        """
+        submits the given sbatch call and returns the SLURM jobid
+        """
         logger.debug(f"sbatch call: {call}")
         try:
             out = subprocess.check_output(
@@ -266,8 +322,70 @@ class SlurmExecutor(ClusterExecutor):
             raise WorkflowError(
                 f"SLURM job submission failed. The error message was {e.output}"
             )
+        return out.split(" ")[-1]
+
+    def run_jobs(self, jobs, callback=None, submit_callback=None, error_callback=None):
+        if not self.job_arrays:
+            super().run_jobs(
+                jobs,
+                callback=callback,
+                submit_callback=submit_callback,
+                error_callback=error_callback,
+            )
+            return
+
+        # bundle jobs of the same rule with identical resource requests
+        bundles = defaultdict(list)
+        for job in jobs:
+            if job.is_group():
+                self.run(job, callback=callback, error_callback=error_callback)
+            else:
+                bundles[(job.rule.name, self.get_sbatch_args(job))].append(job)
+        for (_, sbatch_args), bundle in bundles.items():
+            for chunk in _chunks(bundle, self.max_array_size):
+                if len(chunk) == 1:
+                    self.submit(
+                        chunk[0],
+                        sbatch_args,
+                        callback=callback,
+                        error_callback=error_callback,
+                    )
+                else:
+                    self.submit_array(
+                        chunk,
+                        sbatch_args,
+                        callback=callback,
+                        error_callback=error_callback,
+                    )
+
+    def run(self, job, callback=None, submit_callback=None, error_callback=None):
+        self.submit(
+            job,
+            self.get_sbatch_args(job),
+            callback=callback,
+            error_callback=error_callback,
+        )
+
+    def submit(self, job, sbatch_args, callback=None, error_callback=None):
+        super()._run(job)
+        jobid = job.jobid
 
-        slurm_jobid = out.split(" ")[-1]
+        log_folder = f"group_{job.name}" if job.is_group() else f"rule_{job.name}"
+
+        slurm_logfile = f".snakemake/slurm_logs/{log_folder}/%j.log"
+        os.makedirs(os.path.dirname(slurm_logfile), exist_ok=True)
+
+        # generic part of a submission string:
+        call = f"sbatch -J {self.get_jobname(job)} -o {slurm_logfile} --export=ALL"
+        call += sbatch_args
+
+        exec_job = self.format_job_exec(job)
+        # ensure that workdir is set correctly
+        call += f" --chdir={self.workflow.workdir_init}"
+        # and finally the job to execute with all the snakemake parameters
+        call += f" --wrap={shlex.quote(exec_job)}"
+
+        slurm_jobid = self.sbatch(call)
         slurm_logfile = slurm_logfile.replace("%j", slurm_jobid)
         logger.info(
             f"Job {jobid} has been submitted with SLURM jobid {slurm_jobid} (log: {slurm_logfile})"
@@ -276,35 +394,89 @@ class SlurmExecutor(ClusterExecutor):
             SlurmJob(job, slurm_jobid, callback, error_callback, slurm_logfile)
         )
 
-    async def job_status(self, jobid: int):
+    def submit_array(self, jobs, sbatch_args, callback=None, error_callback=None):
         """
-        obtain SLURM job status of submitted jobs
+        submits the given jobs (of the same rule, with identical sbatch
+        arguments) as a single SLURM job array, with one task per job
         """
-        STATUS_ATTEMPTS = 10
-        res = None
-        # this code is inspired by the snakemake profile: TODO: link to github
-        for i in range(STATUS_ATTEMPTS):
-            # use self.status_rate_limiter to avoid too many API calls.
-            async with self.status_rate_limiter:
-                sacct_error = None
-                try:
-                    sacct_cmd = f"sacct -P -b -j {jobid} -n"
-                    sacct_res = subprocess.check_output(
-                        sacct_cmd, text=True, shell=True, stderr=subprocess.PIPE
-                    )
-                    logger.debug(f"The sacct output is: '{sacct_res}'")
-                    res = {
-                        x.split("|")[0]: x.split("|")[1]
-                        for x in sacct_res.strip().split("\n")
-                    }
-                    break
-                except subprocess.CalledProcessError as e:
-                    sacct_error = e.stderr
-                    pass  # try scontrol below
-                except IndexError as e:
-                    pass
-                # Try getting job with scontrol instead in case sacct is misconfigured
-                if not res:
+        for job in jobs:
+            super()._run(job)
+
+        slurm_logfile = f".snakemake/slurm_logs/rule_{jobs[0].name}/%A_%a.log"
+        os.makedirs(os.path.dirname(slurm_logfile), exist_ok=True)
+
+        # each array task executes the script with its task id
+        script_prefix = os.path.join(self.tmpdir, f"array{next(self._array_ids)}_")
+        for task_id, job in enumerate(jobs):
+            with open(f"{script_prefix}{task_id}.sh", "w") as f:
+                print("#!/bin/sh", self.format_job_exec(job), sep="\n", file=f)
+        wrap = f"sh {shlex.quote(script_prefix)}${{SLURM_ARRAY_TASK_ID}}.sh"
+
+        call = f"sbatch -J {self.get_jobname(jobs[0])} -o {slurm_logfile} --export=ALL"
+        call += f" --array=0-{len(jobs) - 1}"
+        call += sbatch_args
+        call += f" --chdir={self.workflow.workdir_init}"
+        call += f" --wrap={shlex.quote(wrap)}"
+
+        slurm_jobid = self.sbatch(call)
+        slurm_logfile = slurm_logfile.replace("%A", slurm_jobid)
+        logger.info(
+            f"Jobs {', '.join(str(job.jobid) for job in jobs)} have been submitted "
+            f"as SLURM array job {slurm_jobid} (log: {slurm_logfile}, "
+            "with %a being the array task id)"
+        )
+        for task_id, job in enumerate(jobs):
+            self.active_jobs.append(
+                SlurmJob(
+                    job,
+                    f"{slurm_jobid}_{task_id}",
+                    callback,
+                    error_callback,
+                    slurm_logfile.replace("%a", str(task_id)),
+                )
+            )
+
+    async def job_stati(self, jobids):
+        """
+        obtain SLURM job status of all given jobs, using a single
+        sacct call per chunk of job ids
+        """
+        stati = dict()
+        sacct_error = None
+        for chunk in _chunks(jobids, self.sacct_chunk_size):
+            # this code is inspired by the snakemake profile: TODO: link to github
+            for i in range(self.status_attempts):
+                # use self.status_rate_limiter to avoid too many API calls.
+                async with self.status_rate_limiter:
+                    try:
+                        # array tasks are queried via their array job
+                        query = dict.fromkeys(jobid.split("_")[0] for jobid in chunk)
+                        sacct_cmd = f"sacct -P -b -n -j {','.join(query)}"
+                        sacct_res = subprocess.check_output(
+                            sacct_cmd, text=True, shell=True, stderr=subprocess.PIPE
+                        )
+                        logger.debug(f"The sacct output is: '{sacct_res}'")
+                        stati.update(parse_sacct_output(sacct_res, chunk))
+                        break
+                    except subprocess.CalledProcessError as e:
+                        sacct_error = e.stderr.strip()
+                        logger.debug(f"sacct failed: {sacct_error}")
+                if i < self.status_attempts - 1:
+                    await asyncio.sleep(self.status_retry_delay * (i + 1))
+            else:
+                logger.warning(
+                    f"sacct failed {self.status_attempts} times, falling back to "
+                    f"scontrol: {sacct_error}"
+                )
+
+        # Try getting the remaining jobs with scontrol instead in case sacct is
+        # misconfigured or does not know about them (yet).
+        for jobid in jobids:
+            if jobid in stati:
+                continue
+            scontrol_error = None
+            for i in range(self.status_attempts):
+                async with self.status_rate_limiter:
                     try:
                         sctrl_cmd = f"scontrol show jobid -dd {jobid}"
                         out = subprocess.check_output(
@@ -315,17 +487,38 @@ class SlurmExecutor(ClusterExecutor):
                         )
                         logger.debug(f"The scontrol output is: '{out}'")
                         m = re.search(r"JobState=(\w+)", out)
-                        res = {jobid: m.group(1)}
-                        break
+                        if m:
+                            stati[jobid] = m.group(1)
+                            break
+                        scontrol_error = "no JobState in output"
                     except subprocess.CalledProcessError as e:
-                        logger.error(
-                            f"Error getting status of slurm job {jobid}:\n    sacct error: {sacct_error.strip()}\n    scontrol error: {e.stderr.strip()}"
-                        )
+                        scontrol_error = e.stderr.strip()
+                    logger.debug(f"scontrol failed: {scontrol_error}")
+                if i < self.status_attempts - 1:
+                    await asyncio.sleep(self.status_retry_delay * (i + 1))
+            else:
+                raise WorkflowError(
+                    f"Error getting status of slurm job {jobid} "
+                    f"({self.status_attempts} attempts):\n    "
+                    f"sacct error: {sacct_error}\n    "
+                    f"scontrol error: {scontrol_error}"
+                )
 
-                if i >= STATUS_ATTEMPTS - 1:
-                    raise WorkflowError("Unable to query job status for 10 times")
+        return stati
 
-        return res[jobid]  # == status
+    def poll_interval(self, n_active_jobs):
+        """
+        Return the number of seconds to wait before the next status check.
+        Since all jobs are queried at once, polling is slowed down with
+        the number of active jobs in order to not overload slurmdbd.
+        """
+        return min(
+            max(
+                1 / self.max_status_checks_per_second,
+                n_active_jobs / self.status_jobs_per_second,
+            ),
+            self.max_poll_interval,
+        )
 
     async def _wait_for_jobs(self):
         # busy wait on job completion
@@ -350,8 +543,9 @@ class SlurmExecutor(ClusterExecutor):
                 active_jobs = self.active_jobs
                 self.active_jobs = list()
                 still_running = list()
+            stati = await self.job_stati([j.jobid for j in active_jobs])
             for j in active_jobs:
-                status = await self.job_status(j.jobid)
+                status = stati[j.jobid]
                 if status == "COMPLETED":
                     j.callback(j.job)
                 elif status == "UNKNOWN":
@@ -370,4 +564,4 @@ class SlurmExecutor(ClusterExecutor):
 
             async with async_lock(self.lock):
                 self.active_jobs.extend(still_running)
-            time.sleep(1 / self.max_status_checks_per_second)
+            await asyncio.sleep(self.poll_interval(len(still_running)))
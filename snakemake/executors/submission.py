@@ -0,0 +1,129 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@uni-due.de"
+__license__ = "MIT"
+
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from snakemake.logging import logger
+
+
+class TokenBucket:
+    """Thread-safe token bucket that allows on average `rate` acquisitions per
+    second, with bursts of up to `capacity` acquisitions."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # Reserve a token, even if it is not yet available, such that
+            # the waiting does not have to happen while holding the lock.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            self.sleep(wait)
+
+
+class SubmissionPool:
+    """Runs job submissions in a pool of threads.
+
+    Calls of the submit command are rate limited and retried with exponential
+    backoff if they fail with one of the given transient exceptions. Whenever
+    all submitted tasks are done, the achieved throughput is logged.
+    """
+
+    def __init__(
+        self,
+        concurrency=1,
+        max_per_second=None,
+        retries=3,
+        backoff=2,
+        transient=(subprocess.CalledProcessError,),
+        error_handler=None,
+    ):
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.rate_limiter = TokenBucket(max_per_second) if max_per_second else None
+        self.retries = retries
+        self.backoff = backoff
+        self.transient = transient
+        self.error_handler = error_handler
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.burst_start = None
+        self.burst_count = 0
+
+    def call(self, func, *args, **kwargs):
+        """Call func with the given arguments, respecting the rate limit and
+        retrying on transient errors."""
+        for attempt in count():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except self.transient as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                logger.warning(
+                    "Submission failed ({}), retrying in {} seconds.".format(e, delay)
+                )
+                if self.cancelled.wait(delay):
+                    raise
+                continue
+            with self.lock:
+                self.burst_count += 1
+            return result
+
+    def submit(self, task, *args):
+        """Run task with the given arguments in the pool."""
+        with self.lock:
+            if self.pending == 0:
+                self.burst_start = time.monotonic()
+                self.burst_count = 0
+            self.pending += 1
+        self.pool.submit(self._run, task, *args)
+
+    def _run(self, task, *args):
+        try:
+            if not self.cancelled.is_set():
+                task(*args)
+        except Exception as e:
+            if self.error_handler is None:
+                raise
+            self.error_handler(e)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                done = self.pending == 0
+                submitted = self.burst_count
+                elapsed = time.monotonic() - self.burst_start
+            if done and submitted > 1:
+                logger.info(
+                    "Submitted {} jobs in {:.1f} seconds ({:.1f} jobs/s).".format(
+                        submitted, elapsed, submitted / max(elapsed, 1e-3)
+                    )
+                )
+
+    def shutdown(self, cancel=False):
+        """Wait for all pending submissions. If cancel is True, submissions
+        that have not yet been started are skipped."""
+        if cancel:
+            self.cancelled.set()
+        self.pool.shutdown(wait=True)
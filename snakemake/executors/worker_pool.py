@@ -0,0 +1,352 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@uni-due.de"
+__license__ = "MIT"
+
+import asyncio
+import json
+import os
+import shlex
+import shutil
+import stat
+import subprocess
+import threading
+from itertools import count
+
+from snakemake import pool_worker
+from snakemake.common import async_lock
+from snakemake.exceptions import WorkflowError
+from snakemake.executors import ClusterExecutor, GenericClusterJob
+from snakemake.logging import logger
+from snakemake.pool_worker import Heartbeat, touch
+
+
+class WorkerPoolExecutor(ClusterExecutor):
+    """Execute jobs on a pool of long-lived workers.
+
+    Instead of submitting each job to the cluster, a fixed number of workers
+    is submitted once (or started locally if no submit command is given).
+    Jobs are written to a queue directory on the shared filesystem, from which
+    the workers pull them as long as they fit into their resources (see
+    snakemake/pool_worker.py). Jobs that are eligible for a job payload are
+    executed from it within the worker process. Other jobs are executed via
+    their jobscript, exactly as they would be on the cluster.
+    """
+
+    supports_job_payloads = True
+    job_payloads_by_default = True
+    # seconds between checks of the job markers and worker heartbeats
+    poll_interval = 1
+    # seconds without heartbeat after which a worker is considered to be lost
+    heartbeat_timeout = 60
+    # seconds after which a warning is issued if a worker has not yet started
+    start_timeout = 600
+
+    def __init__(
+        self,
+        workflow,
+        dag,
+        workers,
+        submitcmd=None,
+        worker_cores=1,
+        worker_resources=None,
+        jobname="snakejob.{rulename}.{jobid}.sh",
+        printreason=False,
+        quiet=False,
+        printshellcmds=False,
+        assume_shared_fs=True,
+        keepincomplete=False,
+    ):
+        if not assume_shared_fs:
+            raise WorkflowError("A worker pool requires a shared filesystem.")
+        if workers < 1:
+            raise WorkflowError("A worker pool needs at least one worker.")
+
+        # the wait thread is started by the base class, before the queue exists
+        self._queue_ready = threading.Event()
+        super().__init__(
+            workflow,
+            dag,
+            None,
+            jobname=jobname,
+            printreason=printreason,
+            quiet=quiet,
+            printshellcmds=printshellcmds,
+            assume_shared_fs=assume_shared_fs,
+            keepincomplete=keepincomplete,
+        )
+        self.submitcmd = submitcmd
+        self.worker_resources = dict(worker_resources or dict())
+        self.worker_resources["_cores"] = worker_cores
+
+        self.queue = os.path.join(self.tmpdir, "workerpool")
+        self.pending = os.path.join(self.queue, "pending")
+        self.main_heartbeat = os.path.join(self.queue, "heartbeat")
+        os.makedirs(self.pending)
+        os.makedirs(os.path.join(self.queue, "workers"))
+        touch(self.main_heartbeat)
+
+        self._ticketids = count()
+        self._workerids = count()
+        # worker id -> heartbeat
+        self.workers = dict()
+        self.unstarted_warned = set()
+        self.local_workers = list()
+        for _ in range(workers):
+            self.submit_worker()
+        self._queue_ready.set()
+
+    def get_job_exec_prefix(self, job):
+        # quoting the workdir since it may contain spaces
+        return f"cd {repr(self.workflow.workdir_init)}"
+
+    def get_job_exec_suffix(self, job):
+        return (
+            f"touch {repr(self.get_jobfinished_marker(job))} || "
+            f"(touch {repr(self.get_jobfailed_marker(job))}; exit 1)"
+        )
+
+    def get_jobfinished_marker(self, job):
+        return os.path.join(self.tmpdir, "{}.jobfinished".format(job.jobid))
+
+    def get_jobfailed_marker(self, job):
+        return os.path.join(self.tmpdir, "{}.jobfailed".format(job.jobid))
+
+    def get_worker_args(self, workerid):
+        return [
+            self.get_python_executable(),
+            os.path.abspath(pool_worker.__file__),
+            self.queue,
+            workerid,
+            "--cores",
+            str(self.worker_resources["_cores"]),
+            "--resources",
+            *(
+                f"{name}={value}"
+                for name, value in self.worker_resources.items()
+                if name != "_cores"
+            ),
+            "--poll-interval",
+            str(self.poll_interval),
+            "--heartbeat-timeout",
+            str(self.heartbeat_timeout),
+            "--workdir",
+            self.workflow.workdir_init,
+        ]
+
+    def submit_worker(self):
+        workerid = str(next(self._workerids))
+        args = self.get_worker_args(workerid)
+        if self.submitcmd is None:
+            self.local_workers.append(subprocess.Popen(args))
+            logger.info("Started pool worker {}.".format(workerid))
+        else:
+            script = os.path.join(self.queue, "worker.{}.sh".format(workerid))
+            with open(script, "w") as f:
+                print("#!/bin/sh", " ".join(map(shlex.quote, args)), sep="\n", file=f)
+            os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR | stat.S_IRUSR)
+
+            resources = {
+                name: value
+                for name, value in self.worker_resources.items()
+                if name != "_cores"
+            }
+            try:
+                submitcmd = self.submitcmd.format(
+                    workerid=workerid,
+                    cores=self.worker_resources["_cores"],
+                    **resources,
+                )
+            except (KeyError, IndexError) as e:
+                raise WorkflowError(
+                    "Error formatting worker pool submit command {}: value for {} "
+                    "not found.".format(self.submitcmd, e)
+                )
+            env = dict(os.environ)
+            # the jobs of the worker must run locally
+            env.pop("SNAKEMAKE_PROFILE", None)
+            try:
+                ext_jobid = (
+                    subprocess.check_output(
+                        '{submitcmd} "{script}"'.format(
+                            submitcmd=submitcmd, script=script
+                        ),
+                        shell=True,
+                        env=env,
+                    )
+                    .decode()
+                    .split("\n")[0]
+                )
+            except subprocess.CalledProcessError as ex:
+                raise WorkflowError(
+                    "Error submitting pool worker (exit code {}):\n{}".format(
+                        ex.returncode, ex.output.decode()
+                    )
+                )
+            logger.info(
+                "Submitted pool worker {} with external jobid '{}'.".format(
+                    workerid, ext_jobid
+                )
+            )
+        self.workers[workerid] = Heartbeat(
+            os.path.join(self.get_workerdir(workerid), "heartbeat")
+        )
+
+    def get_workerdir(self, workerid):
+        return os.path.join(self.queue, "workers", workerid)
+
+    def get_requirements(self, job):
+        return {name: job.resources.get(name, 0) or 0 for name in self.worker_resources}
+
+    def run(self, job, callback=None, submit_callback=None, error_callback=None):
+        super()._run(job)
+
+        requirements = self.get_requirements(job)
+        exceeded = [
+            name
+            for name, value in requirements.items()
+            if value > self.worker_resources[name]
+        ]
+        if exceeded:
+            # such a job would never be taken by any worker
+            logger.error(
+                "Error executing job {}: it requires more resources than a pool "
+                "worker provides ({}).".format(
+                    job.jobid,
+                    ", ".join(
+                        "{}={}, worker: {}".format(
+                            name.lstrip("_"),
+                            requirements[name],
+                            self.worker_resources[name],
+                        )
+                        for name in exceeded
+                    ),
+                )
+            )
+            error_callback(job)
+            return
+
+        jobfinished = self.get_jobfinished_marker(job)
+        jobfailed = self.get_jobfailed_marker(job)
+        content = {
+            "jobfinished": jobfinished,
+            "jobfailed": jobfailed,
+            "resources": requirements,
+        }
+        payload = self.get_job_payload(job)
+        if payload is not None:
+            # executed by the worker itself, without starting a new process
+            jobscript = payload
+            content["payload"] = payload
+            content["latency_wait"] = self.latency_wait
+        else:
+            jobscript = self.get_jobscript(job)
+            self.write_jobscript(job, jobscript)
+            content["jobscript"] = jobscript
+
+        name = "{:09d}.{}.json".format(next(self._ticketids), job.jobid)
+        ticket = os.path.join(self.queue, name)
+        with open(ticket, "w") as f:
+            json.dump(content, f)
+        # move the complete ticket into the queue, such that workers never
+        # see a partially written one
+        os.rename(ticket, os.path.join(self.pending, name))
+
+        submit_callback(job)
+
+        with self.lock:
+            self.active_jobs.append(
+                GenericClusterJob(
+                    job,
+                    None,
+                    callback,
+                    error_callback,
+                    jobscript,
+                    jobfinished,
+                    jobfailed,
+                )
+            )
+
+    def check_workers(self):
+        """Fail the jobs of workers that stopped sending heartbeats and
+        replace those workers."""
+        for workerid, heartbeat in list(self.workers.items()):
+            age = heartbeat.age()
+            if heartbeat.mtime is None:
+                # not yet started (e.g. still queued on the cluster)
+                if age > self.start_timeout and workerid not in self.unstarted_warned:
+                    self.unstarted_warned.add(workerid)
+                    logger.warning(
+                        "Pool worker {} has not started within {} seconds. "
+                        "It might still be queued or might have been rejected "
+                        "by the cluster. Pending jobs wait for a worker to "
+                        "start.".format(workerid, self.start_timeout)
+                    )
+                continue
+            if age <= self.heartbeat_timeout:
+                continue
+            workerdir = self.get_workerdir(workerid)
+            logger.error(
+                "Pool worker {} did not send a heartbeat for {} seconds. "
+                "Its jobs are considered to have failed.".format(
+                    workerid, self.heartbeat_timeout
+                )
+            )
+            for name in os.listdir(workerdir):
+                if not name.endswith(".json"):
+                    continue
+                with open(os.path.join(workerdir, name)) as f:
+                    ticket = json.load(f)
+                if not (
+                    os.path.exists(ticket["jobfinished"])
+                    or os.path.exists(ticket["jobfailed"])
+                ):
+                    touch(ticket["jobfailed"])
+            # removing the directory also stops the worker if it is still there
+            shutil.rmtree(workerdir, ignore_errors=True)
+            del self.workers[workerid]
+            self.submit_worker()
+
+    def _wait_thread(self):
+        self._queue_ready.wait()
+        super()._wait_thread()
+
+    async def _wait_for_jobs(self):
+        while True:
+            async with async_lock(self.lock):
+                if not self.wait:
+                    return
+                active_jobs = self.active_jobs
+                self.active_jobs = list()
+                still_running = list()
+            touch(self.main_heartbeat)
+            self.check_workers()
+            for active_job in active_jobs:
+                if os.path.exists(active_job.jobfinished):
+                    os.remove(active_job.jobfinished)
+                    os.remove(active_job.jobscript)
+                    active_job.callback(active_job.job)
+                elif os.path.exists(active_job.jobfailed):
+                    os.remove(active_job.jobfailed)
+                    os.remove(active_job.jobscript)
+                    self.print_job_error(active_job.job)
+                    logger.error(
+                        "Error executing job {} on pool worker (jobscript: {}). "
+                        "For error details see the log of the worker and the log "
+                        "files of the involved rule(s).".format(
+                            self.dag.jobid(active_job.job), active_job.jobscript
+                        )
+                    )
+                    active_job.error_callback(active_job.job)
+                else:
+                    still_running.append(active_job)
+            async with async_lock(self.lock):
+                self.active_jobs.extend(still_running)
+            await asyncio.sleep(self.poll_interval)
+
+    def shutdown(self):
+        # workers terminate their remaining jobs and exit
+        touch(os.path.join(self.queue, "shutdown"))
+        for process in self.local_workers:
+            process.wait()
+        super().shutdown()
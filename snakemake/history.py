@@ -0,0 +1,245 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import json
+import math
+import os
+import threading
+from collections import namedtuple, defaultdict
+
+from snakemake.benchmark import read_benchmark_records
+from snakemake.logging import logger
+
+
+HistoryRecord = namedtuple(
+    "HistoryRecord",
+    [
+        "rule",
+        "wildcards",
+        "starttime",
+        "endtime",
+        "runtime",
+        "max_rss",
+        "io_in",
+        "io_out",
+        "input_size",
+        "status",
+    ],
+)
+
+#: Measures of jobs that can be queried from the history
+MEASURES = ("runtime", "max_rss", "io_in", "io_out")
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0 <= q <= 100) of the given sorted values,
+    interpolating linearly between the closest ranks."""
+    if not values:
+        return None
+    k = (len(values) - 1) * q / 100
+    lower, upper = math.floor(k), math.ceil(k)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+class JobHistory:
+    """
+    Runtime and resource usage of all jobs executed in the working directory
+    across runs, stored in a SQLite database. Runtime (in seconds), maximum
+    RSS (in MB) and I/O (in MB) are taken from the benchmark file of a job if
+    it has one, and the runtime is the wall clock time between start and end
+    of the job otherwise. The total size of the input files (in MB) is
+    recorded as well.
+    """
+
+    #: number of recorded jobs that are written to the database at once
+    batch_size = 100
+
+    def __init__(self, path, record_jobs=True):
+        self.path = path
+        self.record_jobs = record_jobs
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = []
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            import sqlite3
+
+            self._conn = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "rule TEXT NOT NULL, wildcards TEXT NOT NULL, "
+                "starttime REAL, endtime REAL, runtime REAL, max_rss REAL, "
+                "io_in REAL, io_out REAL, input_size REAL, status TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_rule ON jobs (rule)")
+        return self._conn
+
+    @staticmethod
+    def _measures(job, starttime, endtime):
+        runtime = None if starttime is None else endtime - starttime
+        max_rss = io_in = io_out = None
+        if job.benchmark and os.path.exists(job.benchmark):
+            try:
+                records = read_benchmark_records(job.benchmark)
+            except (OSError, StopIteration) as e:
+                logger.debug("Failed to read benchmark {}: {}".format(job.benchmark, e))
+                records = []
+
+            def mean(name):
+                values = [r.get(name) for r in records]
+                if not values or None in values:
+                    return None
+                return sum(values) / len(values)
+
+            if records:
+                runtime = mean("s")
+                rss = [r.get("max_rss") for r in records]
+                max_rss = None if None in rss else max(rss)
+                io_in, io_out = mean("io_in"), mean("io_out")
+        input_size = None
+        if not any(f.is_remote for f in job.input):
+            # the size of remote files is not queried, since that would
+            # require a request per file
+            try:
+                input_size = job.inputsize / 1024 / 1024
+            except Exception:
+                # input files may be gone already
+                pass
+        return runtime, max_rss, io_in, io_out, input_size
+
+    def record(self, job, starttime=None, endtime=None, success=True):
+        """Record the given (finished or failed) job. Records are written to
+        the database in batches (see flush)."""
+        if not self.record_jobs:
+            return
+        status = "success" if success else "failed"
+        rows = [
+            (
+                j.rule.name,
+                json.dumps(dict(j.wildcards_dict), sort_keys=True),
+                starttime,
+                endtime,
+                *self._measures(j, starttime, endtime),
+                status,
+            )
+            for j in (job if job.is_group() else [job])
+        ]
+        with self._lock:
+            self._pending.extend(rows)
+            if len(self._pending) < self.batch_size:
+                return
+        self.flush()
+
+    def flush(self):
+        """Write all pending records to the database in a single transaction."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            if not rows:
+                return
+            try:
+                conn = self.conn
+                conn.execute("BEGIN")
+                try:
+                    conn.executemany(
+                        "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            except Exception as e:
+                logger.warning(
+                    "Failed to record {} jobs in job history {}: {}".format(
+                        len(rows), self.path, e
+                    )
+                )
+
+    def jobs(self, rule=None, wildcards=None, status=None):
+        """Return the recorded jobs (as HistoryRecord), optionally restricted
+        to the given rule, wildcard values (a dict, jobs have to match all of
+        them) and status ("success" or "failed"), in order of their start."""
+        self.flush()
+        if self._conn is None and not os.path.exists(self.path):
+            return []
+        query = "SELECT * FROM jobs"
+        conditions, params = [], []
+        if rule is not None:
+            conditions.append("rule = ?")
+            params.append(rule)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY starttime"
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        records = (
+            HistoryRecord(rule, json.loads(wildcards_), *values)
+            for rule, wildcards_, *values in rows
+        )
+        if wildcards:
+            return [
+                record
+                for record in records
+                if all(
+                    record.wildcards.get(name) == str(value)
+                    for name, value in wildcards.items()
+                )
+            ]
+        return list(records)
+
+    def percentiles(self, rule=None, measure="runtime", q=(50, 90, 100)):
+        """Return the given percentiles of a measure over the successful jobs
+        of each rule, as a dict mapping rules to dicts of percentiles."""
+        if measure not in MEASURES:
+            raise ValueError(
+                "Unknown measure {}, valid are {}.".format(measure, ", ".join(MEASURES))
+            )
+        values = defaultdict(list)
+        for record in self.jobs(rule=rule, status="success"):
+            value = getattr(record, measure)
+            if value is not None:
+                values[record.rule].append(value)
+        return {
+            rule: {q_: percentile(sorted(values_), q_) for q_ in q}
+            for rule, values_ in values.items()
+        }
+
+    def summary(self, q=(50, 90, 100)):
+        """Yield a table (header first) with the number of jobs, failed jobs
+        and the given percentiles of each measure per rule."""
+        counts = defaultdict(lambda: [0, 0])
+        for record in self.jobs():
+            counts[record.rule][record.status != "success"] += 1
+        percentiles = {
+            measure: self.percentiles(measure=measure, q=q) for measure in MEASURES
+        }
+        yield ["rule", "jobs", "failed"] + [
+            "{}_{}".format(measure, "max" if q_ == 100 else "p{}".format(q_))
+            for measure in MEASURES
+            for q_ in q
+        ]
+        for rule, (n_success, n_failed) in sorted(counts.items()):
+            row = [rule, str(n_success + n_failed), str(n_failed)]
+            for measure in MEASURES:
+                values = percentiles[measure].get(rule, {})
+                row.extend(
+                    "-" if values.get(q_) is None else "{:.2f}".format(values[q_])
+                    for q_ in q
+                )
+            yield row
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
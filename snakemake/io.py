@@ -15,12 +15,20 @@ import datetime
 import json
 import copy
 import functools
+import operator
 import subprocess as sp
-from itertools import product, chain
+from itertools import product, chain, islice
 from contextlib import contextmanager
 import string
+import sys
 import collections
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 
 from snakemake.exceptions import (
     MissingOutputException,
@@ -123,7 +131,7 @@ class ExistsDict(dict):
 
 
 class IOCache:
-    def __init__(self, max_wait_time):
+    def __init__(self, max_wait_time, n_workers=8):
         self.mtime = dict()
         self.exists_local = ExistsDict(self)
         self.exists_remote = ExistsDict(self)
@@ -131,48 +139,105 @@ class IOCache:
         self.active = True
         self.remaining_wait_time = max_wait_time
         self.max_wait_time = max_wait_time
+        self.n_workers = n_workers
 
     def mtime_inventory(self, jobs):
-        async_run(self._mtime_inventory(jobs))
-
-    async def _mtime_inventory(self, jobs, n_workers=8):
-        queue = asyncio.Queue()
-        stop_item = object()
-
-        async def worker(queue):
-            while True:
-                item = await queue.get()
-                if item is stop_item:
-                    queue.task_done()
-                    return
-                try:
-                    self.mtime[item] = await self.collect_mtime(item)
-                except Exception as e:
-                    queue.task_done()
-
-                    raise e
-                queue.task_done()
-
-        tasks = [
-            asyncio.get_event_loop().create_task(worker(queue))
-            for _ in range(n_workers)
-        ]
-
+        """Concurrently collect mtimes (and sizes) of all existing files of the
+        given jobs.
+
+        Files are grouped by their parent directory. Each directory with more
+        than one requested file is listed once with os.scandir, such that
+        mtime and size of all contained files are obtained from the directory
+        entries. The work is distributed over a pool of threads, since stat
+        calls release the GIL and are dominated by latency on network file
+        systems.
+        """
+        files = dict()
         for job in jobs:
             for f in chain(job.input, job.expanded_output):
                 if f.exists:
-                    queue.put_nowait(f)
+                    files[f] = None
             if job.benchmark and job.benchmark.exists:
-                queue.put_nowait(job.benchmark)
+                files[job.benchmark] = None
 
-        # Send a stop item to each worker.
-        for _ in range(n_workers):
-            queue.put_nowait(stop_item)
+        by_dir = collections.defaultdict(dict)
+        single = []
+        for f in files:
+            if f.is_remote or ON_WINDOWS:
+                single.append(f)
+            else:
+                folder, name = os.path.split(f)
+                by_dir[folder].setdefault(name, []).append(f)
+        batches = []
+        for folder, names in by_dir.items():
+            if len(names) > 1:
+                batches.append((folder, names))
+            else:
+                single.extend(chain.from_iterable(names.values()))
+
+        start = time.time()
+        n_workers = max(1, min(self.n_workers, len(batches) + len(single)))
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for folder, entries, stats in chain(
+                executor.map(self._collect_dir_stats, batches),
+                executor.map(self._collect_file_stats, single),
+            ):
+                if folder and folder not in self.exists_local.has_inventory:
+                    # the listing also provides existence of all entries
+                    for path in entries:
+                        self.exists_local[path] = True
+                    self.exists_local[folder] = True
+                    self.exists_local.has_inventory.add(folder)
+                for f, mtime, size in stats:
+                    self.mtime[f] = mtime
+                    if size is not None:
+                        self.size[f] = size
+        elapsed = time.time() - start
+        if files:
+            logger.debug(
+                "Collected stats of {} files in {:.2f}s ({:.0f} stats/s, "
+                "{} directory listings, {} threads).".format(
+                    len(files),
+                    elapsed,
+                    len(files) / max(elapsed, 1e-6),
+                    len(batches),
+                    n_workers,
+                )
+            )
 
-        await asyncio.gather(*tasks)
+    @staticmethod
+    def _collect_file_stats(f):
+        return None, None, [(f, f.mtime_uncached, None)]
 
-    async def collect_mtime(self, path):
-        return path.mtime_uncached
+    @staticmethod
+    def _collect_dir_stats(batch):
+        folder, names = batch
+        entries = []
+        stats = []
+        remaining = dict(names)
+        try:
+            with os.scandir(folder or ".") as scan:
+                for entry in scan:
+                    entries.append(entry.path)
+                    requested = remaining.pop(entry.name, None)
+                    if requested is None:
+                        continue
+                    _stat = entry.stat(follow_symlinks=False)
+                    if stat.S_ISREG(_stat.st_mode):
+                        # Regular file: the entry provides all we need.
+                        mtime = Mtime(local=_stat.st_mtime)
+                        stats.extend((f, mtime, _stat.st_size) for f in requested)
+                    else:
+                        # Symlinks and directories need additional stat calls,
+                        # see _IOFile.mtime_uncached.
+                        stats.extend((f, f.mtime_uncached, None) for f in requested)
+        except FileNotFoundError:
+            folder = None
+        # Anything not found in the listing (e.g. a differently normalized path)
+        # is queried individually.
+        for requested in remaining.values():
+            stats.extend((f, f.mtime_uncached, None) for f in requested)
+        return folder, entries, stats
 
     def clear(self):
         self.mtime.clear()
@@ -220,7 +285,9 @@ class _IOFile(str):
             file = stripped
         obj = str.__new__(cls, file)
         obj._is_function = is_callable
-        obj._file = file
+        # plain paths are interned, such that the many IOFiles referring to
+        # the same path (e.g. output of one job and input of others) share it
+        obj._file = sys.intern(file) if type(file) is str else file
         obj.rule = None
         obj._regex = None
         obj._wildcard_constraints = None
@@ -580,11 +647,11 @@ class _IOFile(str):
         self.check_broken_symlink()
         return os.path.getsize(self.file)
 
-    def is_checksum_eligible(self):
+    def is_checksum_eligible(self, any_size=False):
         return (
             self.exists_local
             and not os.path.isdir(self.file)
-            and self.size < 100000
+            and (any_size or self.size < 100000)
             and not self.is_fifo()
         )
 
@@ -785,15 +852,27 @@ class _IOFile(str):
         return self.replace(DYNAMIC_FILL, "{*}")
 
     def clone_flags(self, other):
+        flags = None
+        if isinstance(other._file, AnnotatedString) or isinstance(other._file, _IOFile):
+            flags = getattr(other._file, "flags", None)
         if isinstance(self._file, str):
+            if not flags:
+                # without flags, there is no need for an AnnotatedString
+                self._file = sys.intern(str.__str__(self._file))
+                return
             self._file = AnnotatedString(self._file)
-        if isinstance(other._file, AnnotatedString) or isinstance(other._file, _IOFile):
-            self._file.flags = getattr(other._file, "flags", {}).copy()
-            if "remote_object" in self._file.flags:
+        if flags is not None:
+            if "remote_object" in flags:
+                self._file.flags = flags.copy()
                 self._file.flags["remote_object"] = copy.copy(
                     self._file.flags["remote_object"]
                 )
                 self.update_remote_filepath()
+            else:
+                # Flags are shared with the cloned file (e.g. between all
+                # files created from the same pattern). Hence, they must not
+                # be modified in place afterwards (use set_flags instead).
+                self._file.flags = flags
 
     def clone_remote_object(self, other):
         if (
@@ -1005,6 +1084,8 @@ def is_callable(value):
 
 
 class AnnotatedString(str):
+    __slots__ = ["flags", "callable"]
+
     def __init__(self, value):
         self.flags = dict()
         self.callable = value if is_callable(value) else None
@@ -1206,6 +1287,8 @@ def expand(*args, **wildcards):
     **wildcards -- the wildcards as keyword arguments
         with their values as lists. If allow_missing=True is included
         wildcards in filepattern without values will stay unformatted.
+        If lazy=True is included, an Expansion is returned, which formats
+        the paths on iteration instead of returning a list.
     """
     filepatterns = args[0]
     if len(args) == 1:
@@ -1229,20 +1312,23 @@ def expand(*args, **wildcards):
             "of expand (e.g. 'temp(expand(\"plots/{sample}.pdf\", sample=SAMPLES))')."
         )
 
+    def is_option(name):
+        # check that the option is given and not a wildcard in the filepatterns
+        return wildcards.get(name) is True and not any(
+            name in re.findall(r"{([^}\.[!:]+)", filepattern)
+            for filepattern in filepatterns
+        )
+
     # check if remove missing is provided
     format_dict = dict
-    if "allow_missing" in wildcards and wildcards["allow_missing"] is True:
+    if is_option("allow_missing"):
 
         class FormatDict(dict):
             def __missing__(self, key):
                 return "{" + key + "}"
 
         format_dict = FormatDict
-        # check that remove missing is not a wildcard in the filepatterns
-        for filepattern in filepatterns:
-            if "allow_missing" in re.findall(r"{([^}\.[!:]+)", filepattern):
-                format_dict = dict
-                break
+    lazy = is_option("lazy")
 
     # remove unused wildcards to avoid duplicate filepatterns
     wildcards = {
@@ -1254,23 +1340,166 @@ def expand(*args, **wildcards):
         for filepattern in filepatterns
     }
 
-    def flatten(wildcards):
-        for wildcard, values in wildcards.items():
-            if isinstance(values, str) or not isinstance(
-                values, collections.abc.Iterable
+    expansion = Expansion(filepatterns, wildcards, combinator, format_dict)
+    if lazy:
+        # raise missing wildcards now, like the eager expansion does
+        for filepattern in filepatterns:
+            next(expansion._expand(filepattern), None)
+        return expansion
+    return list(expansion)
+
+
+class Expansion(collections.abc.Sequence):
+    """
+    The lazily formatted paths of an expand() call with lazy=True.
+
+    The paths are formatted on iteration. With the default product
+    combinator, len(), membership tests and indexing do not need to format
+    any path.
+    """
+
+    def __init__(self, filepatterns, wildcards, combinator=product, format_dict=dict):
+        """
+        Create the object.
+
+        Arguments
+        filepatterns -- list of file patterns
+        wildcards    -- dict of the used wildcards and their values per pattern
+        combinator   -- function to combine the wildcard values
+        format_dict  -- dict class used to format the file patterns
+        """
+        self.filepatterns = filepatterns
+        self.combinator = combinator
+        self.format_dict = format_dict
+        self.wildcards = dict()
+        for filepattern, values in wildcards.items():
+            self.wildcards[filepattern] = {
+                wildcard: (
+                    [values]
+                    if isinstance(values, str)
+                    or not isinstance(values, collections.abc.Iterable)
+                    else list(values)
+                )
+                for wildcard, values in values.items()
+            }
+        self._regexes = dict()
+
+    def _expand(self, filepattern):
+        combinations = self.combinator(
+            *[
+                [(wildcard, value) for value in values]
+                for wildcard, values in self.wildcards[filepattern].items()
+            ]
+        )
+        formatter = string.Formatter()
+        try:
+            for comb in map(self.format_dict, combinations):
+                yield formatter.vformat(filepattern, (), comb)
+        except KeyError as e:
+            raise WildcardError("No values given for wildcard {}.".format(e))
+
+    def _size(self, filepattern):
+        sizes = [len(values) for values in self.wildcards[filepattern].values()]
+        if self.combinator is product:
+            return functools.reduce(operator.mul, sizes, 1)
+        elif self.combinator is zip:
+            return min(sizes, default=0)
+        return sum(1 for _ in self._expand(filepattern))
+
+    def _regex(self, filepattern):
+        """Return a regex matching exactly the paths of the given pattern
+        (with the product combinator), or None if there is no such regex."""
+        if filepattern in self._regexes:
+            return self._regexes[filepattern]
+        wildcards = self.wildcards[filepattern]
+        regex_ = []
+        seen = set()
+        try:
+            for literal, name, format_spec, conversion in string.Formatter().parse(
+                filepattern
             ):
-                values = [values]
-            yield [(wildcard, value) for value in values]
+                regex_.append(re.escape(literal))
+                if name is None:
+                    continue
+                if format_spec or conversion or not name.isidentifier():
+                    regex_ = None
+                    break
+                if name not in wildcards:
+                    # the wildcard stays unformatted (allow_missing)
+                    regex_.append(re.escape("{" + name + "}"))
+                elif name in seen:
+                    regex_.append("(?P={})".format(name))
+                else:
+                    seen.add(name)
+                    values = sorted(
+                        set(format(value, "") for value in wildcards[name]),
+                        key=len,
+                        reverse=True,
+                    )
+                    regex_.append(
+                        "(?P<{}>{})".format(name, "|".join(map(re.escape, values)))
+                        if values
+                        else "(?!)"
+                    )
+        except ValueError:
+            # invalid format string
+            regex_ = None
+        if regex_ is not None:
+            regex_ = re.compile("".join(regex_))
+        self._regexes[filepattern] = regex_
+        return regex_
 
-    formatter = string.Formatter()
-    try:
-        return [
-            formatter.vformat(filepattern, (), comb)
-            for filepattern in filepatterns
-            for comb in map(format_dict, combinator(*flatten(wildcards[filepattern])))
-        ]
-    except KeyError as e:
-        raise WildcardError("No values given for wildcard {}.".format(e))
+    def __iter__(self):
+        for filepattern in self.filepatterns:
+            yield from self._expand(filepattern)
+
+    def __len__(self):
+        return sum(map(self._size, self.filepatterns))
+
+    def __contains__(self, path):
+        if not isinstance(path, str):
+            return any(f == path for f in self)
+        for filepattern in self.filepatterns:
+            regex_ = self._regex(filepattern) if self.combinator is product else None
+            if regex_ is None:
+                if any(f == path for f in self._expand(filepattern)):
+                    return True
+            elif regex_.fullmatch(path):
+                return True
+        return False
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for filepattern in self.filepatterns:
+                size = self._size(filepattern)
+                if index >= size:
+                    index -= size
+                elif self.combinator is product:
+                    # the last wildcard changes fastest
+                    comb = []
+                    for wildcard, values in reversed(
+                        list(self.wildcards[filepattern].items())
+                    ):
+                        index, i = divmod(index, len(values))
+                        comb.append((wildcard, values[i]))
+                    try:
+                        return string.Formatter().vformat(
+                            filepattern, (), self.format_dict(comb)
+                        )
+                    except KeyError as e:
+                        raise WildcardError(
+                            "No values given for wildcard {}.".format(e)
+                        )
+                else:
+                    return next(islice(self._expand(filepattern), index, None))
+        raise IndexError("Expansion index out of range")
+
+    def __repr__(self):
+        return "Expansion({})".format(", ".join(map(repr, self.filepatterns)))
 
 
 def multiext(prefix, *extensions):
@@ -1298,10 +1527,37 @@ def limit(pattern, **wildcards):
     )
 
 
-def glob_wildcards(pattern, files=None, followlinks=False):
+def glob_wildcards(pattern, files=None, followlinks=False, threads=1):
     """
     Glob the values of the wildcards by matching the given pattern to the filesystem.
     Returns a named tuple with a list of values for each wildcard.
+
+    Subdirectories that cannot contain any match of the pattern are not
+    visited. Since an unconstrained wildcard may span multiple directories,
+    this requires the wildcards to be constrained, e.g. {sample,[^/]+}.
+    With threads > 1, directories are listed in parallel.
+    """
+    pattern = os.path.normpath(pattern)
+    names = list(
+        dict.fromkeys(
+            match.group("name") for match in _wildcard_regex.finditer(pattern)
+        )
+    )
+    Wildcards = collections.namedtuple("Wildcards", names)
+    wildcards = Wildcards(*[list() for name in names])
+
+    for match in iglob_wildcards(
+        pattern, files=files, followlinks=followlinks, threads=threads
+    ):
+        for name, value in match._asdict().items():
+            getattr(wildcards, name).append(value)
+    return wildcards
+
+
+def iglob_wildcards(pattern, files=None, followlinks=False, threads=1):
+    """
+    Like glob_wildcards, but lazily yield a named tuple with the values of
+    the wildcards for each match, while the filesystem is traversed.
     """
     pattern = os.path.normpath(pattern)
     first_wildcard = re.search("{[^{]", pattern)
@@ -1313,27 +1569,202 @@ def glob_wildcards(pattern, files=None, followlinks=False):
     if not dirname:
         dirname = "."
 
-    names = [match.group("name") for match in _wildcard_regex.finditer(pattern)]
+    names = list(
+        dict.fromkeys(
+            match.group("name") for match in _wildcard_regex.finditer(pattern)
+        )
+    )
     Wildcards = collections.namedtuple("Wildcards", names)
-    wildcards = Wildcards(*[list() for name in names])
 
-    pattern = re.compile(regex(pattern))
+    regex_ = re.compile(regex(pattern))
 
     if files is None:
-        files = (
-            os.path.normpath(os.path.join(dirpath, f))
-            for dirpath, dirnames, filenames in os.walk(
-                dirname, followlinks=followlinks
-            )
-            for f in chain(filenames, dirnames)
-        )
+        files = _walk_pattern(dirname, pattern, followlinks, threads)
 
     for f in files:
-        match = re.match(pattern, f)
+        match = regex_.match(f)
         if match:
-            for name, value in match.groupdict().items():
-                getattr(wildcards, name).append(value)
-    return wildcards
+            yield Wildcards(**match.groupdict())
+
+
+def _walk_pattern(dirname, pattern, followlinks=False, threads=1):
+    """Yield all paths below dirname (in the same order as os.walk would),
+    except those in subdirectories that cannot match the given pattern.
+    """
+    prefix = "" if dirname == "." else dirname.rstrip("/") + "/"
+    rest = pattern[len(prefix) :] if pattern.startswith(prefix) else pattern
+    components = _split_pattern(rest)
+    component_regexes = _component_regexes(rest)
+    # If no wildcard may span multiple directories, the depth is bounded.
+    max_depth = len(components) if len(component_regexes) == len(components) else None
+
+    def descend(name, depth):
+        if max_depth is not None and depth + 1 >= max_depth:
+            return False
+        if depth < len(component_regexes):
+            return component_regexes[depth].fullmatch(name) is not None
+        return True
+
+    def scan(path, prefix, depth):
+        # return all entries and the subdirectories to visit
+        entries, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                        visit = is_dir and (followlinks or not entry.is_symlink())
+                    except OSError:
+                        is_dir = visit = False
+                    entries.append((is_dir, prefix + entry.name))
+                    if visit and descend(entry.name, depth):
+                        subdirs.append(entry.name)
+        except OSError:
+            # like os.walk, ignore directories that cannot be listed
+            pass
+        # os.walk yields files before directories
+        entries.sort(key=lambda item: item[0])
+        return [path for _, path in entries], [
+            (prefix + name, prefix + name + "/", depth + 1) for name in subdirs
+        ]
+
+    def walk(listing, prefetch):
+        stack = [iter([(dirname, prefix, 0)])]
+        while stack:
+            subdir = next(stack[-1], None)
+            if subdir is None:
+                stack.pop()
+                continue
+            paths, subdirs = listing(subdir)
+            yield from paths
+            prefetch(subdirs)
+            stack.append(iter(subdirs))
+
+    if threads > 1:
+        max_prefetch = 4 * threads
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = dict()
+
+            def prefetch(subdirs):
+                # list subdirectories in parallel while the paths of the
+                # earlier ones are yielded, keeping only a bounded number of
+                # listings in flight (the others are listed when visited)
+                for subdir in subdirs:
+                    if len(futures) >= max_prefetch:
+                        break
+                    futures[subdir] = executor.submit(scan, *subdir)
+
+            def listing(subdir):
+                future = futures.pop(subdir, None)
+                return scan(*subdir) if future is None else future.result()
+
+            try:
+                yield from walk(listing, prefetch)
+            finally:
+                for future in futures.values():
+                    future.cancel()
+    else:
+        yield from walk(lambda subdir: scan(*subdir), lambda subdirs: None)
+
+
+def _split_pattern(pattern):
+    """Split the given pattern into path components, ignoring slashes in
+    wildcard constraints."""
+    components = [""]
+    last = 0
+    for match in _wildcard_regex.finditer(pattern):
+        head, *tail = pattern[last : match.start()].split("/")
+        components[-1] += head
+        components.extend(tail)
+        components[-1] += match.group(0)
+        last = match.end()
+    head, *tail = pattern[last:].split("/")
+    components[-1] += head
+    components.extend(tail)
+    return components
+
+
+def _component_regexes(pattern):
+    """Return regexes for the leading path components of the given pattern,
+    up to the first one containing a wildcard that may match a slash (and
+    hence span multiple path components)."""
+    constraints = dict()
+    for match in _wildcard_regex.finditer(pattern):
+        constraints.setdefault(match.group("name"), match.group("constraint"))
+
+    component_regexes = []
+    for component in _split_pattern(pattern):
+        f = []
+        last = 0
+        for match in _wildcard_regex.finditer(component):
+            constraint = constraints[match.group("name")]
+            if constraint is None or _can_match_slash(constraint):
+                return component_regexes
+            f.append(re.escape(component[last : match.start()]))
+            f.append("(?:{})".format(constraint))
+            last = match.end()
+        f.append(re.escape(component[last:]))
+        try:
+            component_regexes.append(re.compile("".join(f)))
+        except re.error:
+            return component_regexes
+    return component_regexes
+
+
+def _can_match_slash(constraint):
+    """Return whether the given regular expression may match a string
+    containing a slash. In case of doubt, True is returned."""
+    try:
+        return _subpattern_can_match_slash(sre_parse.parse(constraint))
+    except (re.error, TypeError, ValueError):
+        return True
+
+
+def _subpattern_can_match_slash(subpattern):
+    slash = ord("/")
+    for op, av in subpattern:
+        if op == sre_parse.LITERAL:
+            if av == slash:
+                return True
+        elif op == sre_parse.NOT_LITERAL:
+            if av != slash:
+                return True
+        elif op == sre_parse.IN:
+            negate = False
+            contains_slash = False
+            for item_op, item_av in av:
+                if item_op == sre_parse.NEGATE:
+                    negate = True
+                elif item_op == sre_parse.LITERAL:
+                    contains_slash |= item_av == slash
+                elif item_op == sre_parse.RANGE:
+                    contains_slash |= item_av[0] <= slash <= item_av[1]
+                elif item_op == sre_parse.CATEGORY:
+                    # \d, \w and \s do not contain a slash, their negations do
+                    contains_slash |= item_av in (
+                        sre_parse.CATEGORY_NOT_DIGIT,
+                        sre_parse.CATEGORY_NOT_WORD,
+                        sre_parse.CATEGORY_NOT_SPACE,
+                    )
+                else:
+                    return True
+            if contains_slash != negate:
+                return True
+        elif op == sre_parse.BRANCH:
+            if any(_subpattern_can_match_slash(branch) for branch in av[1]):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _subpattern_can_match_slash(av[-1]):
+                return True
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if _subpattern_can_match_slash(av[2]):
+                return True
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            # zero-width
+            continue
+        else:
+            return True
+    return False
 
 
 def update_wildcard_constraints(
@@ -1468,6 +1899,14 @@ def strip_wildcard_constraints(pattern):
     return _wildcard_regex.sub(strip_constraint, pattern)
 
 
+_EMPTY_NAMES = dict()
+
+
+@functools.lru_cache(maxsize=10000)
+def _shared_names(names):
+    return dict(names)
+
+
 class Namedlist(list):
     """
     A list that additionally provides functions to name items. Further,
@@ -1491,13 +1930,7 @@ class Namedlist(list):
             Namedlist (keys become names)
         """
         list.__init__(self)
-        self._names = dict()
-
-        # white-list of attribute names that can be overridden in _set_name
-        # default to throwing exception if called to prevent use as functions
-        self._allowed_overrides = ["index", "sort"]
-        for name in self._allowed_overrides:
-            setattr(self, name, functools.partial(self._used_attribute, _name=name))
+        self._names = _EMPTY_NAMES
 
         if toclone is not None:
             if custom_map is not None:
@@ -1515,6 +1948,10 @@ class Namedlist(list):
                 self.append(item)
                 self._add_name(key)
 
+    # white-list of attribute names that can be overridden in _set_name
+    # default to throwing exception if called to prevent use as functions
+    _allowed_overrides = ("index", "sort")
+
     @staticmethod
     def _used_attribute(*args, _name, **kwargs):
         """
@@ -1529,6 +1966,12 @@ class Namedlist(list):
             " for use in some existing workflows".format(_name=_name)
         )
 
+    def index(self, *args, **kwargs):
+        self._used_attribute(_name="index")
+
+    def sort(self, *args, **kwargs):
+        self._used_attribute(_name="sort")
+
     def _add_name(self, name):
         """
         Add a name to the last item.
@@ -1546,18 +1989,32 @@ class Namedlist(list):
         name  -- a name
         index -- the item index
         """
+        self._check_name(name)
+        self._update_names({name: (index, end)})
+        self._set_name_attr(name, index, end)
+
+    def _check_name(self, name):
         if name not in self._allowed_overrides and hasattr(self.__class__, name):
             raise AttributeError(
                 "invalid name for input, output, wildcard, "
                 "params or log: {name} is reserved for internal use".format(name=name)
             )
 
-        self._names[name] = (index, end)
+    def _set_name_attr(self, name, index, end):
         if end is None:
             setattr(self, name, self[index])
         else:
             setattr(self, name, Namedlist(toclone=self[index:end]))
 
+    def _update_names(self, names):
+        # name maps are shared between all lists with the same names
+        # (e.g. the input files of all jobs of a rule), hence never modified
+        self._names = _shared_names(
+            tuple(dict(self._names, **names).items())
+            if self._names
+            else tuple(names.items())
+        )
+
     def _get_names(self):
         """
         Get the defined names as (name, index) pairs.
@@ -1572,8 +2029,15 @@ class Namedlist(list):
         Arguments
         names -- the given names as (name, index) pairs
         """
-        for name, (i, j) in names:
-            self._set_name(name, i, end=j)
+        names = dict(names)
+        if not names:
+            return
+        for name in names:
+            self._check_name(name)
+        # build the name map at once instead of once per name
+        self._update_names(names)
+        for name, (i, j) in names.items():
+            self._set_name_attr(name, i, j)
 
     def items(self):
         for name in self._names:
@@ -1605,7 +2069,7 @@ class Namedlist(list):
         add = len(items) - 1
         for name, (i, j) in self._names.items():
             if i > index:
-                self._names[name] = (i + add, None if j is None else j + add)
+                self._update_names({name: (i + add, None if j is None else j + add)})
             elif i == index:
                 self._set_name(name, i, end=i + len(items))
 
@@ -0,0 +1,329 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+from array import array
+from collections import deque
+
+
+class Adjacency(dict):
+    """
+    Mapping of jobs to their adjacent jobs (dependencies or depending jobs),
+    each mapped to the set of files that connects the two jobs. Missing
+    entries are created on access, as with defaultdict(partial(defaultdict,
+    set)).
+
+    Additions and removals of edges are tracked, such that a compact copy
+    of the graph (see compact()) is only rebuilt after the graph has changed.
+    """
+
+    __slots__ = ["version", "_compact"]
+
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self._compact = None
+
+    def __missing__(self, job):
+        # a job without edges does not change the graph
+        edges = _Edges(self)
+        dict.__setitem__(self, job, edges)
+        return edges
+
+    def __setitem__(self, job, edges):
+        if not isinstance(edges, _Edges) or edges._adjacency is not self:
+            edges = _Edges(self, edges)
+        self.version += 1
+        super().__setitem__(job, edges)
+
+    def __delitem__(self, job):
+        self.version += 1
+        super().__delitem__(job)
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def clear(self):
+        self.version += 1
+        super().clear()
+
+    def setdefault(self, job, edges=None):
+        if job not in self:
+            self[job] = {} if edges is None else edges
+        return self[job]
+
+    def update(self, *args, **kwargs):
+        for job, edges in dict(*args, **kwargs).items():
+            self[job] = edges
+
+    def compact(self):
+        """Return a CompactGraph of the current edges."""
+        if self._compact is None or self._compact.version != self.version:
+            self._compact = CompactGraph(self)
+        return self._compact
+
+
+class _Edges(dict):
+    """The adjacent jobs of a job, see Adjacency."""
+
+    __slots__ = ["_adjacency"]
+
+    def __init__(self, adjacency, *args):
+        super().__init__(*args)
+        self._adjacency = adjacency
+
+    def __missing__(self, job):
+        files = self[job] = set()
+        return files
+
+    def __setitem__(self, job, files):
+        if job not in self:
+            self._adjacency.version += 1
+        super().__setitem__(job, files)
+
+    def __delitem__(self, job):
+        self._adjacency.version += 1
+        super().__delitem__(job)
+
+    def pop(self, *args):
+        self._adjacency.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self._adjacency.version += 1
+        return super().popitem()
+
+    def clear(self):
+        self._adjacency.version += 1
+        super().clear()
+
+    def setdefault(self, job, files=None):
+        if job not in self:
+            self[job] = set() if files is None else files
+        return self[job]
+
+    def update(self, *args, **kwargs):
+        for job, files in dict(*args, **kwargs).items():
+            self[job] = files
+
+
+class CompactGraph:
+    """
+    Read-only copy of the edges of an Adjacency. Each job gets an integer id
+    and the adjacent jobs are stored as contiguous arrays of ids (compressed
+    sparse rows). Traversals thereby avoid hashing jobs on every hop.
+    """
+
+    def __init__(self, adjacency):
+        self.version = adjacency.version
+        self.jobs = list(adjacency)
+        self.ids = {job: i for i, job in enumerate(self.jobs)}
+        ids = self.ids
+        jobs = self.jobs
+
+        offsets = array("q", [0])
+        targets = array("q")
+        for job in list(jobs):
+            for job_ in adjacency[job]:
+                i = ids.get(job_)
+                if i is None:
+                    i = ids[job_] = len(jobs)
+                    jobs.append(job_)
+                targets.append(i)
+            offsets.append(len(targets))
+        # jobs only occurring as adjacent jobs have no edges themselves
+        offsets.extend([len(targets)] * (len(jobs) + 1 - len(offsets)))
+        self.offsets = offsets
+        self.targets = targets
+        self._reverse = None
+
+    @property
+    def reverse(self):
+        """Offsets and targets of the edges in reverse direction."""
+        if self._reverse is None:
+            # count the incoming edges of each job
+            offsets, targets = self.offsets, self.targets
+            n = len(self.jobs)
+            counts = array("q", bytes(8 * (n + 1)))
+            for k in targets:
+                counts[k + 1] += 1
+            for i in range(n):
+                counts[i + 1] += counts[i]
+            reverse_offsets = array("q", counts)
+            reverse_targets = array("q", bytes(8 * len(targets)))
+            for i in range(n):
+                for k in targets[offsets[i] : offsets[i + 1]]:
+                    reverse_targets[counts[k]] = i
+                    counts[k] += 1
+            self._reverse = reverse_offsets, reverse_targets
+        return self._reverse
+
+    def __contains__(self, job):
+        return job in self.ids
+
+    def covers(self, jobs):
+        """Return True if all given jobs are part of the graph."""
+        ids = self.ids
+        return all(job in ids for job in jobs)
+
+    def adjacent(self, i):
+        return self.targets[self.offsets[i] : self.offsets[i + 1]]
+
+    def bfs(self, jobs, stop=lambda job: False):
+        """Perform a breadth-first traversal starting from the given jobs."""
+        ids, all_jobs, offsets, targets = (
+            self.ids,
+            self.jobs,
+            self.offsets,
+            self.targets,
+        )
+        visited = bytearray(len(all_jobs))
+        queue = deque()
+        for job in jobs:
+            i = ids[job]
+            if not visited[i]:
+                visited[i] = 1
+                queue.append(i)
+        while queue:
+            i = queue.popleft()
+            job = all_jobs[i]
+            if stop(job):
+                # stop criterion reached for this node
+                continue
+            yield job
+            for k in targets[offsets[i] : offsets[i + 1]]:
+                if not visited[k]:
+                    visited[k] = 1
+                    queue.append(k)
+
+    def level_bfs(self, jobs, stop=lambda job: False):
+        """Perform a breadth-first traversal starting from the given jobs and
+        yield the level together with each job."""
+        ids, all_jobs, offsets, targets = (
+            self.ids,
+            self.jobs,
+            self.offsets,
+            self.targets,
+        )
+        visited = bytearray(len(all_jobs))
+        queue = deque()
+        for job in jobs:
+            i = ids[job]
+            if not visited[i]:
+                visited[i] = 1
+                queue.append((i, 0))
+        while queue:
+            i, level = queue.popleft()
+            job = all_jobs[i]
+            if stop(job):
+                # stop criterion reached for this node
+                continue
+            yield level, job
+            level += 1
+            for k in targets[offsets[i] : offsets[i + 1]]:
+                if not visited[k]:
+                    visited[k] = 1
+                    queue.append((k, level))
+
+    def dfs(self, jobs, stop=lambda job: False, post=True):
+        """Perform a depth-first traversal starting from the given jobs."""
+        ids, all_jobs, offsets, targets = (
+            self.ids,
+            self.jobs,
+            self.offsets,
+            self.targets,
+        )
+        visited = bytearray(len(all_jobs))
+        for job in jobs:
+            if stop(job):
+                continue
+            if not post:
+                yield job
+            stack = [(ids[job], offsets[ids[job]])]
+            while stack:
+                i, pos = stack[-1]
+                if pos < offsets[i + 1]:
+                    stack[-1] = (i, pos + 1)
+                    k = targets[pos]
+                    if visited[k]:
+                        continue
+                    visited[k] = 1
+                    job_ = all_jobs[k]
+                    if stop(job_):
+                        continue
+                    if not post:
+                        yield job_
+                    stack.append((k, offsets[k]))
+                else:
+                    stack.pop()
+                    if post:
+                        yield all_jobs[i]
+
+    def toposort(self, jobs):
+        """Yield the given jobs as sets in topological order (like
+        toposort.toposort), assuming that edges point to dependencies.
+        Dependencies that are not among the given jobs are ignored."""
+        from toposort import CircularDependencyError
+
+        ids, all_jobs, offsets, targets = (
+            self.ids,
+            self.jobs,
+            self.offsets,
+            self.targets,
+        )
+        reverse_offsets, reverse_targets = self.reverse
+
+        member = bytearray(len(all_jobs))
+        members = []
+        layer = set()
+        for job in jobs:
+            i = ids.get(job)
+            if i is None:
+                # no edges
+                layer.add(job)
+            elif not member[i]:
+                member[i] = 1
+                members.append(i)
+
+        n_deps = array("q", bytes(8 * len(all_jobs)))
+        for i in members:
+            n = 0
+            for k in targets[offsets[i] : offsets[i + 1]]:
+                if member[k] and k != i:
+                    n += 1
+            n_deps[i] = n
+        current = [i for i in members if n_deps[i] == 0]
+        remaining = len(members) - len(current)
+
+        while current or layer:
+            layer.update(all_jobs[i] for i in current)
+            yield layer
+            layer = set()
+            successors = []
+            for i in current:
+                for k in reverse_targets[reverse_offsets[i] : reverse_offsets[i + 1]]:
+                    if member[k] and k != i:
+                        n_deps[k] -= 1
+                        if n_deps[k] == 0:
+                            successors.append(k)
+            remaining -= len(successors)
+            current = successors
+
+        if remaining:
+            raise CircularDependencyError(
+                {
+                    all_jobs[i]: {
+                        all_jobs[targets[pos]]
+                        for pos in range(offsets[i], offsets[i + 1])
+                        if member[targets[pos]] and n_deps[targets[pos]]
+                    }
+                    for i in members
+                    if n_deps[i]
+                }
+            )
@@ -0,0 +1,318 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import base64
+import json
+import os
+import pickle
+import subprocess
+import tempfile
+
+from snakemake.common import TBDString
+from snakemake.logging import logger
+
+PAYLOAD_VERSION = 1
+
+
+def ineligible_reason(job, workflow):
+    """Return why the given job cannot be executed from a payload, or None if
+    it can."""
+    if job.is_group():
+        return "group job"
+    rule = job.rule
+    if not (job.is_shell or job.is_script or job.is_wrapper):
+        return "no shell, script or wrapper directive"
+    if job.is_shadow:
+        return "shadow directory"
+    if job.dynamic_output:
+        return "dynamic output"
+    if any(job.remote_input) or any(job.remote_output):
+        return "remote files"
+    if workflow.get_cache_mode(rule):
+        return "between workflow caching"
+    # The following would have to be evaluated by the spawned process.
+    if job.is_shell and (
+        "bench_iteration" in rule.shellcmd or "tmpdir" in rule.shellcmd
+    ):
+        return "shell command depends on the execution environment"
+    if "tmpdir" in rule.explicit_resources:
+        return "tmpdir resource"
+    if not job.is_shell:
+        try:
+            _script_namespace(job, workflow)
+        except Exception:
+            return "params or config cannot be pickled"
+    return None
+
+
+def _script_namespace(job, workflow):
+    """Pickle what a script or wrapper gets to see of the job, like the
+    Snakemake object in the preamble of a Python script (see
+    snakemake.script.Snakemake)."""
+    namespace = (
+        job.input._plainstrings(),
+        job.output._plainstrings(),
+        job.params,
+        job.wildcards,
+        job.log._plainstrings(),
+        workflow.config,
+    )
+    return base64.b64encode(pickle.dumps(namespace)).decode()
+
+
+def job_payload(job, workflow, wait_for_files=()):
+    """Return everything needed to execute the given job without the
+    Snakefile, with all directives resolved by the main process."""
+    from snakemake.shell import shell
+
+    resources = {
+        name: value
+        for name, value in job.resources.items()
+        if not isinstance(value, TBDString)
+    }
+    tmpdir = isinstance(job.resources.get("tmpdir"), TBDString)
+    conda_env = job.conda_env.address if workflow.use_conda and job.conda_env else None
+    container_img = job.container_img_path if workflow.use_singularity else None
+    env_modules = job.env_modules if workflow.use_env_modules else None
+    script = None
+    if job.is_script or job.is_wrapper:
+        # The path is formatted with wildcards and params by the runner, like
+        # in a spawned process.
+        script = {
+            "path": job.rule.script if job.is_script else job.rule.wrapper,
+            "is_wrapper": job.is_wrapper,
+            "basedir": job.rule.basedir.get_path_or_uri(),
+            "wrapper_prefix": workflow.wrapper_prefix,
+            "cleanup_scripts": workflow.cleanup_scripts,
+            "namespace": _script_namespace(job, workflow),
+        }
+    return {
+        "version": PAYLOAD_VERSION,
+        "rule": job.rule.name,
+        "jobid": job.jobid,
+        "shellcmd": job.shellcmd,
+        "script": script,
+        "shell": {
+            "executable": shell.get_executable(),
+            "prefix": shell._process_prefix,
+            "suffix": shell._process_suffix,
+            "conda_block_conflicting_envvars": shell.conda_block_conflicting_envvars,
+        },
+        "threads": job.threads,
+        "resources": resources,
+        # evaluate the default temporary directory in the spawned process
+        "system_tmpdir": tmpdir,
+        "output": job.output._plainstrings(),
+        # touched after a successful run, like in DAG.handle_touch
+        "touch_output": [
+            [str(f), f.is_directory]
+            for f in job.expanded_output
+            if f in job.touch_output
+        ],
+        "log": job.log._plainstrings(),
+        "benchmark": str(job.benchmark) if job.benchmark is not None else None,
+        "benchmark_repeats": job.benchmark_repeats or 1,
+        "wait_for_files": list(map(str, wait_for_files)),
+        "latency_wait": workflow.latency_wait,
+        "conda_env": conda_env,
+        "conda_base_path": workflow.conda_base_path,
+        "container_img": container_img,
+        "singularity_args": workflow.singularity_args,
+        "env_modules": list(env_modules.names) if env_modules else None,
+    }
+
+
+def write_job_payload(job, workflow, path, wait_for_files=()):
+    with open(path, "w") as f:
+        json.dump(job_payload(job, workflow, wait_for_files=wait_for_files), f)
+
+
+def _touch_or_create(path, is_directory=False):
+    """Touch the given file, or the timestamp file of the given directory,
+    and create it if it does not exist (see IOFile.touch_or_create)."""
+    from snakemake.io import lutime
+
+    if is_directory:
+        os.makedirs(path, exist_ok=True)
+        path = os.path.join(path, ".snakemake_timestamp")
+    elif os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.lexists(path):
+        lutime(path, None)
+    else:
+        with open(path, "w"):
+            pass
+
+
+def _run_script(payload, resources, env_modules, bench_record, bench_iteration):
+    """Execute the script or wrapper of the given payload, the same way as
+    the run function that the Snakefile defines for the rule."""
+    from snakemake.io import Resources
+
+    script = payload["script"]
+    input, output, params, wildcards, log, config = pickle.loads(
+        base64.b64decode(script["namespace"])
+    )
+    args = (
+        input,
+        output,
+        params,
+        wildcards,
+        payload["threads"],
+        Resources(fromdict=resources),
+        log,
+        config,
+        payload["rule"],
+        payload["conda_env"],
+        payload["conda_base_path"],
+        payload["container_img"],
+        payload["singularity_args"],
+        env_modules,
+        bench_record,
+    )
+    # Shadow rules are not eligible, and the source cache of the runner is
+    # a temporary directory.
+    shadow_dir = runtime_sourcecache_path = None
+    if script["is_wrapper"]:
+        from snakemake.wrapper import wrapper
+
+        wrapper(
+            script["path"],
+            *args,
+            script["wrapper_prefix"],
+            payload["jobid"],
+            bench_iteration,
+            script["cleanup_scripts"],
+            shadow_dir,
+            runtime_sourcecache_path,
+        )
+    else:
+        from snakemake.script import script as run_script
+
+        run_script(
+            script["path"],
+            script["basedir"],
+            *args,
+            payload["jobid"],
+            bench_iteration,
+            script["cleanup_scripts"],
+            shadow_dir,
+            runtime_sourcecache_path,
+        )
+
+
+def run_job_payload(path, latency_wait=3):
+    """Execute the job in the given payload file. Return True on success."""
+    from snakemake.io import wait_for_files
+    from snakemake.shell import shell
+
+    # the payload has just been written by the main process, possibly on
+    # another node
+    try:
+        wait_for_files([path], latency_wait=latency_wait)
+    except IOError as e:
+        logger.error(str(e))
+        return False
+    with open(path) as f:
+        payload = json.load(f)
+    if payload.get("version") != PAYLOAD_VERSION:
+        logger.error(
+            "Unsupported job payload version {} in {}.".format(
+                payload.get("version"), path
+            )
+        )
+        return False
+
+    shell._process_args["executable"] = payload["shell"]["executable"]
+    shell._process_prefix = payload["shell"]["prefix"]
+    shell._process_suffix = payload["shell"]["suffix"]
+    shell.conda_block_conflicting_envvars = payload["shell"][
+        "conda_block_conflicting_envvars"
+    ]
+
+    resources = payload["resources"]
+    if payload["system_tmpdir"]:
+        resources["tmpdir"] = tempfile.gettempdir()
+    if resources.get("tmpdir"):
+        os.makedirs(resources["tmpdir"], exist_ok=True)
+
+    env_modules = None
+    if payload["env_modules"]:
+        from snakemake.deployment.env_modules import EnvModules
+
+        env_modules = EnvModules(*payload["env_modules"])
+
+    wait_for_files(payload["wait_for_files"], latency_wait=payload["latency_wait"])
+    for f in payload["output"] + payload["log"] + [payload["benchmark"]]:
+        if f and os.path.dirname(f):
+            os.makedirs(os.path.dirname(f), exist_ok=True)
+
+    # the command has already been formatted by the main process
+    if payload["shellcmd"] is not None:
+        cmd = payload["shellcmd"].replace("{", "{{").replace("}", "}}")
+
+    def run(bench_record=None, bench_iteration=None):
+        if payload["script"] is not None:
+            _run_script(payload, resources, env_modules, bench_record, bench_iteration)
+            return
+        shell(
+            cmd,
+            bench_record=bench_record,
+            is_shell=True,
+            jobid=payload["jobid"],
+            threads=payload["threads"],
+            resources=resources,
+            conda_env=payload["conda_env"],
+            conda_base_path=payload["conda_base_path"],
+            container_img=payload["container_img"],
+            singularity_args=payload["singularity_args"],
+            env_modules=env_modules,
+        )
+
+    try:
+        if payload["benchmark"] is None:
+            run()
+        else:
+            from snakemake.benchmark import BenchmarkRecord, write_benchmark_records
+
+            bench_records = []
+            for bench_iteration in range(payload["benchmark_repeats"]):
+                bench_record = BenchmarkRecord()
+                run(bench_record, bench_iteration)
+                bench_records.append(bench_record)
+            write_benchmark_records(bench_records, payload["benchmark"])
+    except subprocess.CalledProcessError as e:
+        logger.error(
+            "Error in rule {} (jobid {}): command exited with non-zero exit "
+            "status {}.".format(payload["rule"], payload["jobid"], e.returncode)
+        )
+        return False
+    except Exception as e:
+        logger.error(
+            "Error in rule {} (jobid {}): {}".format(
+                payload["rule"], payload["jobid"], e
+            )
+        )
+        return False
+
+    # like DAG.handle_touch and DAG.handle_log in the main process
+    for f, is_directory in payload["touch_output"]:
+        logger.info("Touching output file {}.".format(f))
+        _touch_or_create(f, is_directory=is_directory)
+    for f in payload["log"]:
+        if not os.path.exists(f):
+            _touch_or_create(f)
+    # like DAG.check_and_touch_output, such that the job fails if its output
+    # is missing
+    try:
+        wait_for_files(payload["output"], latency_wait=payload["latency_wait"])
+    except IOError as e:
+        logger.error(
+            "Error in rule {} (jobid {}): {}".format(
+                payload["rule"], payload["jobid"], e
+            )
+        )
+        return False
+    return True
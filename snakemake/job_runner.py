@@ -0,0 +1,57 @@
+"""
+Fast-start runner for jobs serialized by the main process (see
+snakemake.job_payload). It is executed as a script, i.e.
+
+    python /path/to/snakemake/job_runner.py PAYLOAD [LATENCY_WAIT]
+
+such that the snakemake package itself (with the command line interface,
+workflow, DAG, scheduler and executors) is never imported. Only the modules
+needed to run a shell command, script or wrapper, benchmark it and wait for
+its input and output files are loaded.
+"""
+
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import os
+import sys
+import types
+
+
+def _load_without_package_init():
+    """Make submodules of snakemake importable without executing
+    snakemake/__init__.py."""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    # When executed as a script, the package directory comes first in the
+    # search path, which would shadow the standard library with our modules
+    # (e.g. snakemake/logging.py).
+    sys.path = [
+        path for path in sys.path if os.path.abspath(path or os.curdir) != package_dir
+    ]
+    sys.path.insert(0, os.path.dirname(package_dir))
+    if "snakemake" not in sys.modules:
+        package = types.ModuleType("snakemake")
+        package.__path__ = [package_dir]
+        package.__file__ = os.path.join(package_dir, "__init__.py")
+        sys.modules["snakemake"] = package
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (1, 2):
+        print("Usage: job_runner.py PAYLOAD [LATENCY_WAIT]", file=sys.stderr)
+        return 2
+    latency_wait = int(argv[1]) if len(argv) == 2 else 3
+
+    from snakemake.job_payload import run_job_payload
+    from snakemake.logging import setup_logger
+
+    setup_logger(quiet=["progress", "rules"])
+    return 0 if run_job_payload(argv[0], latency_wait=latency_wait) else 1
+
+
+if __name__ == "__main__":
+    _load_without_package_init()
+    sys.exit(main())
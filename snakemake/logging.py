@@ -369,8 +369,12 @@ class Logger:
     def error(self, msg):
         self.handler(dict(level="error", msg=msg))
 
-    def progress(self, done=None, total=None):
-        self.handler(dict(level="progress", done=done, total=total))
+    def progress(self, done=None, total=None, temp_disk=None):
+        msg = dict(level="progress", done=done, total=total)
+        if temp_disk is not None:
+            # used and maximum disk space of temporary output in MB
+            msg["temp_disk"] = temp_disk
+        self.handler(msg)
 
     def resources_info(self, msg):
         self.handler(dict(level="resources_info", msg=msg))
@@ -600,6 +604,10 @@ class Logger:
                         done, total, format_percentage(done, total)
                     )
                 )
+                if "temp_disk" in msg:
+                    self.logger.info(
+                        "Temporary output: {:.0f} of {} MB".format(*msg["temp_disk"])
+                    )
             elif level == "shellcmd":
                 if self.printshellcmds:
                     self.logger.warning(indent(msg["msg"]))
@@ -10,37 +10,67 @@ class OutputIndex:
     def __init__(self, rules):
         import datrie
 
-        def prefixes(rule):
-            return (str(o.constant_prefix()) for o in rule.products())
+        # Index individual products instead of rules, such that a file only
+        # has to be matched against the products whose constant prefix and
+        # suffix fit, instead of all products of all candidate rules.
+        self.products = [
+            (rule, product) for rule in rules for product in rule.products()
+        ]
 
-        def reverse_suffixes(rule):
-            return (str(o.constant_suffix())[::-1] for o in rule.products())
+        def prefix(product):
+            return str(product.constant_prefix())
 
-        def calc_trie(subpatterns):
-            t = datrie.Trie("".join(p for rule in rules for p in subpatterns(rule)))
+        def reverse_suffix(product):
+            return str(product.constant_suffix())[::-1]
+
+        def calc_trie(subpattern):
+            patterns = [subpattern(product) for _, product in self.products]
+            t = datrie.Trie("".join(patterns))
             empty = list()
-            for rule in rules:
-                has_empty = False
-                for p in subpatterns(rule):
-                    if not p:
-                        has_empty = True
-                    if p not in t:
-                        t[p] = [rule]
-                    else:
-                        t[p].append(rule)
-                if has_empty:
-                    empty.append(rule)
+            for i, p in enumerate(patterns):
+                if not p:
+                    empty.append(i)
+                elif p not in t:
+                    t[p] = [i]
+                else:
+                    t[p].append(i)
             return t, empty
 
-        self.prefix_trie, self.empty_prefix = calc_trie(prefixes)
-        self.suffix_trie, self.empty_suffix = calc_trie(reverse_suffixes)
+        self.prefix_trie, self.empty_prefix = calc_trie(prefix)
+        self.suffix_trie, self.empty_suffix = calc_trie(reverse_suffix)
 
-    def match(self, targetfile):
+    def _match_products(self, targetfile):
         def match_pattern(pattern, trie, empty):
             return chain(chain.from_iterable(trie.iter_prefix_values(pattern)), empty)
 
         f = str(targetfile)
         hits = set(match_pattern(f, self.prefix_trie, self.empty_prefix))
-        return hits.intersection(
+        hits.intersection_update(
             match_pattern(f[::-1], self.suffix_trie, self.empty_suffix)
         )
+        return hits
+
+    def match(self, targetfile):
+        """Return all rules that might produce the given file."""
+        return {self.products[i][0] for i in self._match_products(targetfile)}
+
+    def match_producers(self, targetfile):
+        """Return the rules that produce the given file, each with the
+        wildcards obtained by matching the file against its products.
+
+        Only products with fitting constant prefix and suffix are matched,
+        and each of them only once.
+        """
+        matches = dict()
+        for i in sorted(self._match_products(targetfile)):
+            rule, product = self.products[i]
+            wildcards = rule.match_product(product, targetfile)
+            if wildcards is None:
+                continue
+            # same choice as in Rule.get_wildcards()
+            best = matches.get(rule)
+            if not best or rule.get_wildcard_len(best) > rule.get_wildcard_len(
+                wildcards
+            ):
+                matches[rule] = wildcards
+        return matches
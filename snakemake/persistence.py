@@ -4,14 +4,17 @@ __email__ = "johannes.koester@uni-due.de"
 __license__ = "MIT"
 
 import os
+import hashlib
 import shutil
 import signal
 import marshal
 import pickle
 import json
 import tempfile
+import threading
 import time
-from base64 import urlsafe_b64encode, b64encode
+from base64 import urlsafe_b64encode, urlsafe_b64decode, b64encode
+from contextlib import contextmanager
 from functools import lru_cache, partial
 from itertools import filterfalse, count
 from pathlib import Path
@@ -21,6 +24,40 @@ from snakemake.logging import logger
 from snakemake.jobs import jobfiles
 from snakemake.utils import listfiles
 from snakemake.io import is_flagged, get_flag_value
+from snakemake.history import JobHistory
+
+
+def _content_checksum_algorithm():
+    try:
+        import xxhash
+
+        return "xxh3_128"
+    except ImportError:
+        return "blake2b"
+
+
+def _hash_file_content(path, algorithm, blocksize=1 << 20):
+    """Hash the file in large blocks with a fast (non-cryptographic if
+    available) hash function. Returns None if the algorithm is not available."""
+    if algorithm == "xxh3_128":
+        try:
+            import xxhash
+        except ImportError:
+            return None
+        h = xxhash.xxh3_128()
+    elif algorithm == "blake2b":
+        h = hashlib.blake2b(digest_size=16)
+    else:
+        return None
+    buffer = bytearray(blocksize)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    return f"{algorithm}:{h.hexdigest()}"
 
 
 class Persistence:
@@ -32,8 +69,10 @@ class Persistence:
         singularity_prefix=None,
         shadow_prefix=None,
         warn_only=False,
+        metadata_backend="json",
+        job_history=False,
+        content_checksums=False,
     ):
-        self._max_len = None
         self.path = os.path.abspath(".snakemake")
         if not os.path.exists(self.path):
             os.mkdir(self.path)
@@ -46,9 +85,17 @@ class Persistence:
 
         self._metadata_path = os.path.join(self.path, "metadata")
         self._incomplete_path = os.path.join(self.path, "incomplete")
+        self._checksums_path = os.path.join(self.path, "checksums")
+        self.content_checksums = content_checksums
 
         self.conda_env_archive_path = os.path.join(self.path, "conda-archive")
         self.benchmark_path = os.path.join(self.path, "benchmarks")
+        self.dag_cache_path = os.path.join(self.path, "dag_cache")
+        self.file_hashes_path = os.path.join(self.path, "file_hashes.json")
+        # runtimes and resource usage of executed jobs across runs
+        self.history = JobHistory(
+            os.path.join(self.path, "history.sqlite"), record_jobs=job_history
+        )
 
         self.source_cache = os.path.join(self.path, "source_cache")
 
@@ -86,11 +133,21 @@ class Persistence:
 
             migration_indicator.unlink()
 
+        if metadata_backend == "sqlite":
+            self._store = SQLiteRecordStore(os.path.join(self.path, "metadata.sqlite"))
+        elif metadata_backend == "json":
+            self._store = JSONRecordStore()
+        else:
+            raise snakemake.exceptions.WorkflowError(
+                f"Unknown metadata backend {metadata_backend}."
+            )
+
         self._incomplete_cache = None
 
         for d in (
             self._metadata_path,
             self._incomplete_path,
+            self._checksums_path,
             self.shadow_path,
             self.conda_env_archive_path,
             self.conda_env_path,
@@ -136,6 +193,28 @@ class Persistence:
 
         logger.info("Migration complete")
 
+    def migrate_metadata(self):
+        """Copy all records of the JSON layout into the configured backend."""
+        if isinstance(self._store, JSONRecordStore):
+            raise snakemake.exceptions.WorkflowError(
+                "Metadata can only be migrated to a database backend "
+                "(e.g. --metadata-backend sqlite)."
+            )
+        logger.info("Migrating metadata records to {}...".format(self._store))
+        source = JSONRecordStore()
+        n = 0
+        with self._store.transaction():
+            for subject in (self._metadata_path, self._incomplete_path):
+                for id, record, mtime in source.records(subject):
+                    self._store.record(subject, record, id, mtime=mtime)
+                    n += 1
+                    if n % 10000 == 0:
+                        logger.info("{} records migrated".format(n))
+        logger.info(
+            "Migration of {} records complete. The JSON records in {} and {} "
+            "can be deleted.".format(n, self._metadata_path, self._incomplete_path)
+        )
+
     @property
     def files(self):
         if self._files is None:
@@ -214,17 +293,19 @@ class Persistence:
                 shutil.rmtree(os.path.join(self.conda_env_archive_path, d))
 
     def started(self, job, external_jobid=None):
-        for f in job.output:
-            self._record(
-                self._incomplete_path,
-                {"external_jobid": external_jobid},
-                f,
-            )
+        with self._store.transaction():
+            for f in job.output:
+                self._record(
+                    self._incomplete_path,
+                    {"external_jobid": external_jobid},
+                    f,
+                )
 
     def finished(self, job, keep_metadata=True):
         if not keep_metadata:
-            for f in job.expanded_output:
-                self._delete_record(self._incomplete_path, f)
+            with self._store.transaction():
+                for f in job.expanded_output:
+                    self._delete_record(self._incomplete_path, f)
             return
 
         version = str(job.rule.version) if job.rule.version is not None else None
@@ -235,48 +316,48 @@ class Persistence:
         shellcmd = job.shellcmd
         conda_env = self._conda_env(job)
         fallback_time = time.time()
-        for f in job.expanded_output:
-            rec_path = self._record_path(self._incomplete_path, f)
-            starttime = os.path.getmtime(rec_path) if os.path.exists(rec_path) else None
-            # Sometimes finished is called twice, if so, lookup the previous starttime
-            if not os.path.exists(rec_path):
-                starttime = self._read_record(self._metadata_path, f).get(
-                    "starttime", None
-                )
-            endtime = f.mtime.local_or_remote() if f.exists else fallback_time
-
-            checksums = ((infile, infile.checksum()) for infile in job.input)
-
-            self._record(
-                self._metadata_path,
-                {
-                    "version": version,
-                    "code": code,
-                    "rule": job.rule.name,
-                    "input": input,
-                    "log": log,
-                    "params": params,
-                    "shellcmd": shellcmd,
-                    "incomplete": False,
-                    "starttime": starttime,
-                    "endtime": endtime,
-                    "job_hash": hash(job),
-                    "conda_env": conda_env,
-                    "container_img_url": job.container_img_url,
-                    "input_checksums": {
-                        infile: checksum
-                        for infile, checksum in checksums
-                        if checksum is not None
+        checksums = ((infile, self.input_checksum(infile)) for infile in job.input)
+        input_checksums = {
+            infile: checksum for infile, checksum in checksums if checksum is not None
+        }
+        # write the records of all outputs at once (if supported by the backend)
+        with self._store.transaction():
+            for f in job.expanded_output:
+                starttime = self._store.mtime(self._incomplete_path, f)
+                # Sometimes finished is called twice, if so, lookup the previous starttime
+                if starttime is None:
+                    starttime = self._read_record(self._metadata_path, f).get(
+                        "starttime", None
+                    )
+                endtime = f.mtime.local_or_remote() if f.exists else fallback_time
+
+                self._record(
+                    self._metadata_path,
+                    {
+                        "version": version,
+                        "code": code,
+                        "rule": job.rule.name,
+                        "input": input,
+                        "log": log,
+                        "params": params,
+                        "shellcmd": shellcmd,
+                        "incomplete": False,
+                        "starttime": starttime,
+                        "endtime": endtime,
+                        "job_hash": hash(job),
+                        "conda_env": conda_env,
+                        "container_img_url": job.container_img_url,
+                        "input_checksums": input_checksums,
                     },
-                },
-                f,
-            )
-            self._delete_record(self._incomplete_path, f)
+                    f,
+                )
+                self._delete_record(self._incomplete_path, f)
 
     def cleanup(self, job):
-        for f in job.expanded_output:
-            self._delete_record(self._incomplete_path, f)
-            self._delete_record(self._metadata_path, f)
+        with self._store.transaction():
+            for f in job.expanded_output:
+                self._delete_record(self._incomplete_path, f)
+                self._delete_record(self._metadata_path, f)
 
     def incomplete(self, job):
         if self._incomplete_cache is None:
@@ -290,17 +371,12 @@ class Persistence:
         else:
 
             def marked_incomplete(f):
-                rec_path = self._record_path(self._incomplete_path, f)
-                return rec_path in self._incomplete_cache
+                return f in self._incomplete_cache
 
         return any(map(lambda f: f.exists and marked_incomplete(f), job.output))
 
     def _cache_incomplete_folder(self):
-        self._incomplete_cache = {
-            os.path.join(path, f)
-            for path, dirnames, filenames in os.walk(self._incomplete_path)
-            for f in filenames
-        }
+        self._incomplete_cache = self._store.snapshot(self._incomplete_path)
 
     def external_jobids(self, job):
         return list(
@@ -340,6 +416,51 @@ class Persistence:
     def container_img_url(self, path):
         return self.metadata(path).get("container_img_url")
 
+    def input_checksum(self, f):
+        """Return the checksum of the given input file to be recorded in the
+        metadata, None if the file is not eligible for checksumming."""
+        if f.is_checksum_eligible():
+            return f.checksum()
+        if self.content_checksums and f.is_checksum_eligible(any_size=True):
+            return self.content_checksum(f)
+        return None
+
+    def content_checksum(self, f, algorithm=None):
+        """Return a checksum of the content of the given file (of any size).
+
+        The checksum is prefixed with the name of the hash algorithm. Since
+        computing it requires to read the entire file, it is cached in the
+        metadata, keyed by device, inode, size and modification time of the
+        file. Hence, unchanged files are never read twice.
+        Returns None if the given algorithm is not available.
+        """
+        if algorithm is None:
+            algorithm = _content_checksum_algorithm()
+        stat = os.stat(f)
+        key = [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+        record = self._read_record_uncached(self._checksums_path, f)
+        checksums = record.get("checksums", {}) if record.get("key") == key else {}
+        if algorithm not in checksums:
+            checksum = _hash_file_content(f, algorithm)
+            if checksum is None:
+                return None
+            checksums[algorithm] = checksum
+            self._record(self._checksums_path, {"key": key, "checksums": checksums}, f)
+        return checksums[algorithm]
+
+    def is_same_checksum(self, f, checksum):
+        """Return whether the given recorded checksum matches the current
+        content of the input file f."""
+        if checksum is None:
+            return False
+        if f.is_checksum_eligible():
+            return f.is_same_checksum(checksum)
+        algorithm, sep, _ = checksum.partition(":")
+        if not sep:
+            # checksum of a small file, but f has grown in the meantime
+            return False
+        return checksum == self.content_checksum(f, algorithm=algorithm)
+
     def input_checksums(self, job, input_path):
         """Return all checksums of the given input file
         recorded for the output of the given job.
@@ -406,9 +527,6 @@ class Persistence:
     def noop(self, *args):
         pass
 
-    def _b64id(self, s):
-        return urlsafe_b64encode(str(s).encode()).decode()
-
     @lru_cache()
     def _code(self, rule):
         code = rule.run_func.__code__
@@ -441,6 +559,100 @@ class Persistence:
         return sorted(job.output)
 
     def _record(self, subject, json_value, id):
+        self._store.record(subject, json_value, id)
+
+    def _delete_record(self, subject, id):
+        return self._store.delete(subject, id)
+
+    @lru_cache()
+    def _read_record_cached(self, subject, id):
+        return self._read_record_uncached(subject, id)
+
+    def _read_record_uncached(self, subject, id):
+        return self._store.read(subject, id)
+
+    def _exists_record(self, subject, id):
+        return self._store.exists(subject, id)
+
+    def _locks(self, type):
+        return (
+            f
+            for f, _ in listfiles(
+                os.path.join(self._lockdir, "{{n,[0-9]+}}.{}.lock".format(type))
+            )
+            if not os.path.isdir(f)
+        )
+
+    def _lock(self, files, type):
+        for i in count(0):
+            lockfile = os.path.join(self._lockdir, "{}.{}.lock".format(i, type))
+            if not os.path.exists(lockfile):
+                self._lockfile[type] = lockfile
+                with open(lockfile, "w") as lock:
+                    print(*files, sep="\n", file=lock)
+                return
+
+    def all_outputfiles(self):
+        # we only look at output files that will be updated
+        return jobfiles(self.dag.needrun_jobs(), "output")
+
+    def all_inputfiles(self):
+        # we consider all input files, also of not running jobs
+        return jobfiles(self.dag.jobs, "input")
+
+    def deactivate_cache(self):
+        self._read_record_cached.cache_clear()
+        self._read_record = self._read_record_uncached
+        self._incomplete_cache = False
+
+
+class AbstractRecordStore:
+    """Storage of metadata records (JSON-serializable dicts).
+
+    Records are organized by subject (the metadata or the incomplete
+    marker folder under .snakemake) and identified by output file path.
+    """
+
+    def record(self, subject, json_value, id, mtime=None):
+        raise NotImplementedError()
+
+    def delete(self, subject, id):
+        """Delete record. Return False if it did not exist."""
+        raise NotImplementedError()
+
+    def read(self, subject, id):
+        """Return the record, or an empty dict if there is none."""
+        raise NotImplementedError()
+
+    def exists(self, subject, id):
+        raise NotImplementedError()
+
+    def mtime(self, subject, id):
+        """Return the time the record has been written, or None if there
+        is no record."""
+        raise NotImplementedError()
+
+    def snapshot(self, subject):
+        """Return a container of all record ids of the given subject,
+        queryable via the in operator."""
+        raise NotImplementedError()
+
+    @contextmanager
+    def transaction(self):
+        """Group multiple writes such that they are committed at once."""
+        yield
+
+
+class JSONRecordStore(AbstractRecordStore):
+    """One JSON file per record, the file name being the base64 encoded id."""
+
+    def __init__(self):
+        self._max_len = None
+
+    def __str__(self):
+        return "JSON files"
+
+    def record(self, subject, json_value, id, mtime=None):
         recpath = self._record_path(subject, id)
         recdir = os.path.dirname(recpath)
         os.makedirs(recdir, exist_ok=True)
@@ -459,9 +671,11 @@ class Persistence:
             suffix=f".{os.path.basename(recpath)[:8]}",
         ) as tmpfile:
             json.dump(json_value, tmpfile)
+        if mtime is not None:
+            os.utime(tmpfile.name, (mtime, mtime))
         os.replace(tmpfile.name, recpath)
 
-    def _delete_record(self, subject, id):
+    def delete(self, subject, id):
         try:
             recpath = self._record_path(subject, id)
             os.remove(recpath)
@@ -477,12 +691,8 @@ class Persistence:
                 # file is missing, report failure
                 return False
 
-    @lru_cache()
-    def _read_record_cached(self, subject, id):
-        return self._read_record_uncached(subject, id)
-
-    def _read_record_uncached(self, subject, id):
-        if not self._exists_record(subject, id):
+    def read(self, subject, id):
+        if not self.exists(subject, id):
             return dict()
         with open(self._record_path(subject, id), "r") as f:
             try:
@@ -491,29 +701,44 @@ class Persistence:
                 pass
         # case: file is corrupted, delete it
         logger.warning(f"Deleting corrupted metadata record.")
-        self._delete_record(subject, id)
+        self.delete(subject, id)
         return dict()
 
-    def _exists_record(self, subject, id):
+    def exists(self, subject, id):
         return os.path.exists(self._record_path(subject, id))
 
-    def _locks(self, type):
-        return (
-            f
-            for f, _ in listfiles(
-                os.path.join(self._lockdir, "{{n,[0-9]+}}.{}.lock".format(type))
-            )
-            if not os.path.isdir(f)
-        )
+    def mtime(self, subject, id):
+        try:
+            return os.path.getmtime(self._record_path(subject, id))
+        except FileNotFoundError:
+            return None
+
+    def snapshot(self, subject):
+        return _JSONRecordSnapshot(self, subject)
+
+    def records(self, subject):
+        """Iterate over all (id, record, mtime) of the given subject."""
+        for path, _, filenames in os.walk(subject):
+            relpath = os.path.relpath(path, start=subject)
+            chunks = [] if relpath == "." else relpath.split(os.sep)
+            for filename in filenames:
+                if "." in filename:
+                    # leftover temporary file (not part of the base64 alphabet)
+                    continue
+                recpath = os.path.join(path, filename)
+                try:
+                    id = urlsafe_b64decode(
+                        "".join(c.lstrip("@") for c in chunks) + filename
+                    ).decode()
+                    with open(recpath) as f:
+                        record = json.load(f)
+                except (ValueError, UnicodeDecodeError):
+                    logger.warning(f"Skipping corrupted metadata record {recpath}.")
+                    continue
+                yield id, record, os.path.getmtime(recpath)
 
-    def _lock(self, files, type):
-        for i in count(0):
-            lockfile = os.path.join(self._lockdir, "{}.{}.lock".format(i, type))
-            if not os.path.exists(lockfile):
-                self._lockfile[type] = lockfile
-                with open(lockfile, "w") as lock:
-                    print(*files, sep="\n", file=lock)
-                return
+    def _b64id(self, s):
+        return urlsafe_b64encode(str(s).encode()).decode()
 
     def _fetch_max_len(self, subject):
         if self._max_len is None:
@@ -535,18 +760,119 @@ class Persistence:
         path = os.path.join(subject, *b64id)
         return path
 
-    def all_outputfiles(self):
-        # we only look at output files that will be updated
-        return jobfiles(self.dag.needrun_jobs(), "output")
 
-    def all_inputfiles(self):
-        # we consider all input files, also of not running jobs
-        return jobfiles(self.dag.jobs, "input")
+class _JSONRecordSnapshot:
+    def __init__(self, store, subject):
+        self.store = store
+        self.subject = subject
+        self.paths = {
+            os.path.join(path, f)
+            for path, dirnames, filenames in os.walk(subject)
+            for f in filenames
+        }
 
-    def deactivate_cache(self):
-        self._read_record_cached.cache_clear()
-        self._read_record = self._read_record_uncached
-        self._incomplete_cache = False
+    def __contains__(self, id):
+        return self.store._record_path(self.subject, id) in self.paths
+
+
+class SQLiteRecordStore(AbstractRecordStore):
+    """All records in a single SQLite database (in WAL mode).
+
+    This avoids one file (and potentially several directories) per output
+    file. Since SQLite relies on file locking, the database should reside
+    on a local file system or one with proper POSIX locking support.
+    """
+
+    def __init__(self, path):
+        import sqlite3
+
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._conn = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "subject TEXT NOT NULL, id TEXT NOT NULL, "
+            "value TEXT NOT NULL, mtime REAL NOT NULL, "
+            "PRIMARY KEY (subject, id))"
+        )
+
+    def __str__(self):
+        return self.path
+
+    @staticmethod
+    def _subject(subject):
+        # subjects are the folders of the JSON layout, only use their name
+        return os.path.basename(subject)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+    def record(self, subject, json_value, id, mtime=None):
+        with self.transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                (
+                    self._subject(subject),
+                    str(id),
+                    json.dumps(json_value),
+                    time.time() if mtime is None else mtime,
+                ),
+            )
+
+    def delete(self, subject, id):
+        with self.transaction():
+            cursor = self._conn.execute(
+                "DELETE FROM records WHERE subject = ? AND id = ?",
+                (self._subject(subject), str(id)),
+            )
+        return cursor.rowcount > 0
+
+    def _query(self, column, subject, id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {column} FROM records WHERE subject = ? AND id = ?",
+                (self._subject(subject), str(id)),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def read(self, subject, id):
+        value = self._query("value", subject, id)
+        return dict() if value is None else json.loads(value)
+
+    def exists(self, subject, id):
+        return self._query("1", subject, id) is not None
+
+    def mtime(self, subject, id):
+        return self._query("mtime", subject, id)
+
+    def snapshot(self, subject):
+        with self._lock:
+            return {
+                id
+                for (id,) in self._conn.execute(
+                    "SELECT id FROM records WHERE subject = ?",
+                    (self._subject(subject),),
+                )
+            }
 
 
 def _bool_or_gen(func, job, file=None):
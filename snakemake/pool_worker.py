@@ -0,0 +1,260 @@
+"""
+Long-lived worker of a worker pool (see WorkerPoolExecutor). It is executed
+as a script, i.e.
+
+    python /path/to/snakemake/pool_worker.py QUEUE WORKERID [--cores N] ...
+
+and pulls jobs from the queue directory of the main Snakemake process as long
+as they fit into the remaining resources of the worker. Jobs that come with a
+job payload (see snakemake.job_payload) are executed within the worker
+process, such that no Python interpreter has to be started per job. Other
+jobs are executed via their jobscript. Like the job runner, the worker does
+not import the snakemake package itself, so that it starts quickly.
+
+Queue layout (on a filesystem shared with the main process):
+
+    QUEUE/pending/*.json       tickets of jobs that wait for a worker
+    QUEUE/workers/WORKERID/    tickets claimed by a worker, plus its heartbeat
+    QUEUE/heartbeat            heartbeat of the main process
+    QUEUE/shutdown             tells all workers to terminate
+
+A ticket is claimed by atomically moving it into the worker directory.
+"""
+
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+
+class Heartbeat:
+    """Tracks when the modification time of a heartbeat file has last changed.
+
+    Time is measured with the local clock only, such that clock skew between
+    the hosts sharing the filesystem does not matter."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.changed = time.time()
+
+    def age(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.mtime:
+            self.mtime = mtime
+            self.changed = time.time()
+        return time.time() - self.changed
+
+
+def touch(path):
+    with open(path, "a"):
+        os.utime(path)
+
+
+class PayloadJob(threading.Thread):
+    """Executes a job payload in a thread of the worker process, with the same
+    interface as the process of a jobscript."""
+
+    def __init__(self, ticket):
+        super().__init__(daemon=True)
+        self.ticket = ticket
+        self.returncode = None
+
+    def run(self):
+        from snakemake.job_payload import run_job_payload
+
+        success = False
+        try:
+            success = run_job_payload(
+                self.ticket["payload"], latency_wait=self.ticket["latency_wait"]
+            )
+        finally:
+            touch(self.ticket["jobfinished" if success else "jobfailed"])
+            self.returncode = 0 if success else 1
+
+    def poll(self):
+        return None if self.is_alive() else self.returncode
+
+    def terminate(self):
+        # Threads cannot be stopped. Since they are daemonic, they end with
+        # the worker.
+        pass
+
+    def wait(self):
+        pass
+
+
+class Worker:
+    def __init__(
+        self, queue, workerid, resources, poll_interval=1.0, heartbeat_timeout=60
+    ):
+        self.queue = queue
+        self.pending = os.path.join(queue, "pending")
+        self.workerid = workerid
+        self.workerdir = os.path.join(queue, "workers", workerid)
+        self.heartbeat = os.path.join(self.workerdir, "heartbeat")
+        self.shutdown_marker = os.path.join(queue, "shutdown")
+        self.main_heartbeat = Heartbeat(os.path.join(queue, "heartbeat"))
+        self.resources = resources
+        self.free = dict(resources)
+        self.poll_interval = poll_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        # claimed ticket -> (process or PayloadJob, ticket content)
+        self.running = dict()
+
+    def requirements(self, ticket):
+        return {name: ticket["resources"].get(name, 0) or 0 for name in self.resources}
+
+    def fits(self, requirements):
+        return all(value <= self.free[name] for name, value in requirements.items())
+
+    def claim(self):
+        """Start all pending jobs that fit into the free resources."""
+        try:
+            names = sorted(os.listdir(self.pending))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.pending, name)
+            try:
+                with open(path) as f:
+                    ticket = json.load(f)
+            except (OSError, ValueError):
+                # already claimed by another worker
+                continue
+            requirements = self.requirements(ticket)
+            if not self.fits(requirements):
+                continue
+            claimed = os.path.join(self.workerdir, name)
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                # already claimed by another worker
+                continue
+            for res, value in requirements.items():
+                self.free[res] -= value
+            if "payload" in ticket:
+                process = PayloadJob(ticket)
+                process.start()
+            else:
+                process = subprocess.Popen(
+                    [ticket["jobscript"]],
+                    env=dict(os.environ, SNAKEMAKE_POOL_WORKER=self.workerid),
+                )
+            self.running[claimed] = (process, ticket)
+
+    def reap(self):
+        """Release the resources of finished jobs."""
+        for claimed, (process, ticket) in list(self.running.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+            if returncode != 0 and not (
+                os.path.exists(ticket["jobfinished"])
+                or os.path.exists(ticket["jobfailed"])
+            ):
+                # The job script was killed before it could report its status.
+                touch(ticket["jobfailed"])
+            for res, value in self.requirements(ticket).items():
+                self.free[res] += value
+            del self.running[claimed]
+            try:
+                os.remove(claimed)
+            except FileNotFoundError:
+                # the worker has been declared lost in the meantime
+                pass
+
+    def terminate(self):
+        for process, _ in self.running.values():
+            process.terminate()
+        for process, _ in self.running.values():
+            process.wait()
+
+    def stop_reason(self):
+        if not os.path.exists(self.queue):
+            return "queue has been removed"
+        if os.path.exists(self.shutdown_marker):
+            return "shutdown requested"
+        if not os.path.exists(self.workerdir):
+            return "worker has been declared lost by the main process"
+        if self.main_heartbeat.age() > self.heartbeat_timeout:
+            return "main process is unresponsive"
+        return None
+
+    def run(self):
+        os.makedirs(self.workerdir, exist_ok=True)
+        # inherited by the jobs that are executed within the worker process
+        os.environ["SNAKEMAKE_POOL_WORKER"] = self.workerid
+        while True:
+            reason = self.stop_reason()
+            if reason is not None:
+                self.terminate()
+                print(
+                    "Pool worker {} terminates: {}.".format(self.workerid, reason),
+                    file=sys.stderr,
+                )
+                return
+            touch(self.heartbeat)
+            self.reap()
+            self.claim()
+            time.sleep(self.poll_interval)
+
+
+def parse_resource(arg):
+    name, value = arg.split("=", 1)
+    return name, int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snakemake pool worker.")
+    parser.add_argument("queue")
+    parser.add_argument("workerid")
+    parser.add_argument("--cores", type=int, default=1)
+    parser.add_argument("--resources", nargs="*", type=parse_resource, default=[])
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--heartbeat-timeout", type=float, default=60)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    if args.workdir is not None:
+        # paths in job payloads are relative to the working directory
+        os.chdir(args.workdir)
+    from snakemake.logging import setup_logger
+
+    setup_logger(quiet=["progress", "rules"])
+
+    resources = dict(args.resources)
+    resources["_cores"] = args.cores
+    Worker(
+        args.queue,
+        args.workerid,
+        resources,
+        poll_interval=args.poll_interval,
+        heartbeat_timeout=args.heartbeat_timeout,
+    ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    # When executed as a script, the package directory comes first in the
+    # search path, hence the job runner can be imported directly. It makes
+    # the modules of the package importable without importing the package
+    # itself and removes the package directory from the search path, which
+    # would shadow the standard library with our modules.
+    from job_runner import _load_without_package_init
+
+    _load_without_package_init()
+    sys.exit(main())
@@ -0,0 +1,121 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import math
+
+from snakemake.exceptions import WorkflowError
+
+
+def correlation(samples):
+    """Return the Pearson correlation of the given (x, y) pairs, or None if
+    either of them does not vary."""
+    n = len(samples)
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in samples)
+    var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+    var_y = sum((y - mean_y) ** 2 for _, y in samples)
+    if not var_x or not var_y:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def linear_fit(samples):
+    """Return intercept and slope of the least squares line through the given
+    (x, y) pairs."""
+    n = len(samples)
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in samples) / sum(
+        (x - mean_x) ** 2 for x, _ in samples
+    )
+    return mean_y - slope * mean_x, slope
+
+
+class Model:
+    """Upper bound of a measure (e.g. max_rss) of the jobs of a rule.
+
+    If the measure correlates with the input size, the bound is the least
+    squares line over the input size, shifted up by the largest observed
+    deviation above it. Otherwise, it is the largest observed value.
+    """
+
+    def __init__(self, samples, min_correlation=0.8):
+        self.maximum = max(y for _, y in samples)
+        self.fit = None
+        sized = [(x, y) for x, y in samples if x is not None]
+        if len(sized) == len(samples):
+            r = correlation(sized)
+            if r is not None and r >= min_correlation:
+                intercept, slope = linear_fit(sized)
+                residual = max(y - (intercept + slope * x) for x, y in sized)
+                self.fit = intercept + residual, slope
+
+    def predict(self, input_size=None):
+        if self.fit is None or input_size is None:
+            return self.maximum
+        intercept, slope = self.fit
+        return max(intercept + slope * input_size, 0)
+
+
+class ResourceEstimator:
+    """
+    Estimates of the mem_mb and runtime resources of jobs, derived from the
+    max_rss (in MB) and runtime (in seconds) of the successful jobs of the
+    same rule in the job history of the working directory (see
+    snakemake.history). Estimates are multiplied with the given safety
+    margin. Rules with less than min_samples recorded jobs get no estimate,
+    i.e. they keep their configured (default) resources.
+    """
+
+    # resource -> (measure in the history, conversion of the measure)
+    resources = {
+        "mem_mb": ("max_rss", lambda mb: mb),
+        "runtime": ("runtime", lambda s: s / 60),
+    }
+
+    def __init__(self, history, margin=1.2, min_samples=3):
+        if margin < 1:
+            raise WorkflowError(
+                "The safety margin of resource estimates must not be smaller than 1."
+            )
+        self.history = history
+        self.margin = margin
+        self.min_samples = min_samples
+        self._models = dict()
+
+    def models(self, rule):
+        """Return the models of the resources of the given rule."""
+        if rule not in self._models:
+            records = self.history.jobs(rule=rule, status="success")
+            models = dict()
+            for resource, (measure, _) in self.resources.items():
+                samples = [
+                    (record.input_size, getattr(record, measure))
+                    for record in records
+                    if getattr(record, measure) is not None
+                ]
+                if len(samples) >= self.min_samples:
+                    models[resource] = Model(samples)
+            self._models[rule] = models
+        return self._models[rule]
+
+    def estimate(self, rule, input):
+        """Return the estimated resources of a job of the given rule with the
+        given input files."""
+        models = self.models(rule.name)
+        if not models:
+            return dict()
+        try:
+            input_size = input.size_mb
+        except (OSError, WorkflowError):
+            # input is not present (yet)
+            input_size = None
+        estimates = dict()
+        for resource, model in models.items():
+            _, convert = self.resources[resource]
+            value = convert(model.predict(input_size)) * self.margin
+            estimates[resource] = max(int(math.ceil(value)), 1)
+        return estimates
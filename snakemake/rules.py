@@ -31,6 +31,7 @@ from snakemake.io import (
     flag,
     get_flag_value,
     expand,
+    Expansion,
     InputFiles,
     OutputFiles,
     Wildcards,
@@ -93,6 +94,8 @@ class Rule:
             self.subworkflow_input = dict()
             self.shadow_depth = None
             self.resources = None
+            # resources that are not taken from the defaults
+            self.explicit_resources = set()
             self.priority = 0
             self._version = None
             self._log = Log()
@@ -143,6 +146,7 @@ class Rule:
             self.subworkflow_input = dict(other.subworkflow_input)
             self.shadow_depth = other.shadow_depth
             self.resources = other.resources
+            self.explicit_resources = other.explicit_resources
             self.priority = other.priority
             self.version = other.version
             self._log = other._log
@@ -648,6 +652,12 @@ class Rule:
             inoutput.append(item)
             if name:
                 inoutput._add_name(name)
+        elif isinstance(item, Expansion) and not output:
+            # keep lazy expansions as they are, like input functions, the
+            # paths are formatted when the input files of a job are determined
+            inoutput.append(item)
+            if name:
+                inoutput._add_name(name)
         else:
             try:
                 start = len(inoutput)
@@ -843,7 +853,16 @@ class Rule:
                     assert isinstance(item, dict)
                     pairs = [(name, item, _is_callable) for name, item in item.items()]
             else:
-                pairs = [(name, item, _is_callable)]
+                # the paths of a lazy expansion are handled like those returned
+                # by an input function
+                pairs = [
+                    (
+                        name,
+                        item,
+                        _is_callable
+                        or (isinstance(item, Expansion) and not no_flattening),
+                    )
+                ]
 
             for name, item, from_callable in pairs:
                 is_iterable = True
@@ -865,7 +884,7 @@ class Rule:
                             item_, path_modifier, property=property
                         )
 
-                    concrete = concretize(item_, wildcards, _is_callable)
+                    concrete = concretize(item_, wildcards, from_callable)
                     newitems.append(concrete)
                     if mapping is not None:
                         mapping[concrete] = item_
@@ -1120,7 +1139,17 @@ class Rule:
             threads = min(threads, self.workflow.max_threads)
         resources["_cores"] = threads
 
-        for name, res in list(self.resources.items()):
+        resource_items = dict(self.resources)
+        estimator = self.workflow.resource_estimator
+        if estimator is not None and not self.is_handover:
+            # estimates from previous runs replace the default resources
+            resource_items.update(
+                (name, value)
+                for name, value in estimator.estimate(self, input).items()
+                if name not in self.explicit_resources
+            )
+
+        for name, res in resource_items.items():
             if name != "_cores":
                 value = apply(name, res, threads=threads)
 
@@ -1195,11 +1224,18 @@ class Rule:
         """
         Returns True if this rule is a producer of the requested output.
         """
+        return any(
+            self.match_product(o, requested_output) is not None for o in self.products()
+        )
+
+    def match_product(self, product, requested_output):
+        """
+        Match the requested output against the given product of this rule.
+        Returns the wildcards dict or None if there is no match.
+        """
         try:
-            for o in self.products():
-                if o.match(requested_output):
-                    return True
-            return False
+            match = product.match(requested_output)
+            return match.groupdict() if match else None
         except sre_constants.error as ex:
             raise IOFileException(
                 "{} in wildcard statement".format(ex),
@@ -1211,7 +1247,9 @@ class Rule:
                 "{}".format(ex), snakefile=self.snakefile, lineno=self.lineno
             )
 
-    def get_wildcards(self, requested_output, wildcards_dict=None):
+    def get_wildcards(
+        self, requested_output, wildcards_dict=None, matched_wildcards=None
+    ):
         """
         Return wildcard dictionary by
         1. trying to format the output with the given wildcards and comparing with the requested output
@@ -1219,6 +1257,7 @@ class Rule:
 
         Arguments
         requested_output -- a concrete filepath
+        matched_wildcards -- result of step 2 if already known (e.g. from the OutputIndex)
         """
         if requested_output is None:
             return dict()
@@ -1252,6 +1291,10 @@ class Rule:
                     except WildcardError:
                         continue
 
+        if matched_wildcards is not None:
+            self.check_wildcards(matched_wildcards)
+            return matched_wildcards
+
         bestmatchlen = 0
         bestmatch = None
 
@@ -1359,6 +1402,16 @@ class RuleProxy:
                         item(wildcards), self.rule.input_modifier, property="input"
                     )
 
+                return inner
+            elif isinstance(item, Expansion):
+                # Same for lazy expansions, the path modifier is applied to
+                # their paths only when the input files of a job are determined.
+
+                def inner(wildcards):
+                    return self.rule.apply_path_modifier(
+                        item, self.rule.input_modifier, property="input"
+                    )
+
                 return inner
             else:
                 # For strings, the path modifier has been already applied.
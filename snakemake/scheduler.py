@@ -9,10 +9,11 @@ import threading
 import operator
 import time
 import math
+import heapq
 import asyncio
 
 from functools import partial
-from collections import defaultdict
+from collections import defaultdict, Counter
 from itertools import chain, accumulate, product
 from contextlib import ContextDecorator
 
@@ -33,6 +34,7 @@ from snakemake.executors import (
 from snakemake.executors.slurm.slurm_submit import SlurmExecutor
 from snakemake.executors.slurm.slurm_jobstep import SlurmJobstepExecutor
 from snakemake.executors.flux import FluxExecutor
+from snakemake.executors.worker_pool import WorkerPoolExecutor
 from snakemake.executors.google_lifesciences import GoogleLifeSciencesExecutor
 from snakemake.executors.ga4gh_tes import TaskExecutionServiceExecutor
 from snakemake.exceptions import RuleException, WorkflowError, print_exception
@@ -40,8 +42,6 @@ from snakemake.shell import shell
 from snakemake.common import ON_WINDOWS, async_run
 from snakemake.logging import logger
 
-from fractions import Fraction
-
 
 def cumsum(iterable, zero=[0]):
     return list(chain(zero, accumulate(iterable)))
@@ -65,6 +65,160 @@ class DummyRateLimiter(ContextDecorator):
         return False
 
 
+class ReadyQueue:
+    """Jobs that are ready to be scheduled, ordered by decreasing reward.
+
+    The queue is maintained incrementally by the scheduler: jobs are pushed
+    when they become ready and removed when they are started. Removal is lazy,
+    i.e. stale heap entries are skipped when popping.
+    """
+
+    def __init__(self, reward):
+        self.reward = reward
+        self._heap = []
+        self._members = dict()
+        self._counter = 0
+
+    def push(self, job):
+        # negate the reward such that the min-heap yields the best job first,
+        # ties are broken by insertion order
+        self.push_entry((tuple(-r for r in self.reward(job)), 0, job))
+
+    def push_entry(self, entry):
+        """Push an entry obtained from pop_entry() without recomputing
+        the reward."""
+        key, _, job = entry
+        self._counter += 1
+        self._members[job] = self._counter
+        heapq.heappush(self._heap, (key, self._counter, job))
+
+    def pop_entry(self):
+        """Remove the job with the highest reward and return its entry."""
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            _, counter, job = entry
+            if self._members.get(job) == counter:
+                del self._members[job]
+                return entry
+        raise IndexError("pop from empty ReadyQueue")
+
+    def pop(self):
+        """Remove and return the job with the highest reward."""
+        return self.pop_entry()[2]
+
+    def discard(self, job):
+        self._members.pop(job, None)
+        if len(self._heap) > 2 * len(self._members) + 64:
+            self._compact()
+
+    def clear(self):
+        self._heap.clear()
+        self._members.clear()
+
+    def _compact(self):
+        self._heap = [
+            entry for entry in self._heap if self._members.get(entry[2]) == entry[1]
+        ]
+        heapq.heapify(self._heap)
+
+    def __contains__(self, job):
+        return job in self._members
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __bool__(self):
+        return bool(self._members)
+
+
+class TempDiskBudget:
+    """Limit of the disk space (in MB) occupied by temporary output.
+
+    The expected temporary output of running jobs is reserved when they are
+    started. Once a job has finished, its reservation is replaced by the
+    actual size of its temporary output, as long as the output is still
+    needed by depending jobs.
+    """
+
+    def __init__(self, dag, max_mb):
+        self.dag = dag
+        self.max_mb = max_mb
+        # running job -> expected size of its temp output
+        self._reserved = dict()
+        # temp file -> size of not yet consumed temp output
+        self._live = dict()
+        # rule name -> number of finished jobs and their total temp output size
+        self._observed = dict()
+
+    @property
+    def used(self):
+        return sum(self._live.values()) + sum(self._reserved.values())
+
+    def estimate(self, job):
+        """Return the expected size of the temp output of the given job."""
+        if job.is_group():
+            return sum(self.estimate(j) for j in job)
+        if not job.temp_output:
+            return 0
+        temp_mb = job.resources.get("temp_mb")
+        if temp_mb is not None:
+            return temp_mb
+        n, total = self._observed.get(job.rule.name, (0, 0))
+        return total / n if n else 0
+
+    def select(self, jobs):
+        """Split the given jobs into those that fit into the budget (in the
+        given order) and those that do not."""
+        available = self.max_mb - self.used
+        selected, rejected = [], []
+        for job in jobs:
+            size = self.estimate(job)
+            if not size or size <= available:
+                available -= size
+                selected.append(job)
+            else:
+                rejected.append(job)
+        return selected, rejected
+
+    def reserve(self, job):
+        self._reserved[job] = self.estimate(job)
+
+    def release(self, job, finished=True):
+        """Release the reservation of the given job. If the job has finished,
+        account its temp output instead and release the temp input that is
+        not needed anymore."""
+        self._reserved.pop(job, None)
+        if not finished:
+            return
+        for j in job if job.is_group() else [job]:
+            for f in self.dag.temp_input(j):
+                if f in self._live and not self.dag.temp_needed(f):
+                    del self._live[f]
+            if j.temp_output:
+                self._account_temp_output(j)
+
+    def _account_temp_output(self, job):
+        temp_mb = job.resources.get("temp_mb")
+        size = 0
+        for f in job.temp_output:
+            if temp_mb is not None:
+                # the sizes of directories are not measured
+                f_size = temp_mb / len(job.temp_output)
+            else:
+                try:
+                    f_size = f.size / 1024 / 1024
+                except (FileNotFoundError, WorkflowError):
+                    continue
+            size += f_size
+            if self.dag.temp_needed(f):
+                self._live[f] = f_size
+        n, total = self._observed.get(job.rule.name, (0, 0))
+        self._observed[job.rule.name] = (n + 1, total + size)
+
+
 class JobScheduler:
     def __init__(
         self,
@@ -75,13 +229,21 @@ class JobScheduler:
         touch=False,
         slurm=None,
         slurm_jobstep=None,
+        slurm_job_arrays=False,
         cluster=None,
         cluster_status=None,
         cluster_config=None,
         cluster_sync=None,
         cluster_cancel=None,
         cluster_cancel_nargs=None,
+        cluster_status_nargs=1,
         cluster_sidecar=None,
+        cluster_submit_concurrency=1,
+        cluster_submit_retries=0,
+        worker_pool=None,
+        worker_pool_submit=None,
+        worker_pool_cores=1,
+        worker_pool_resources=None,
         drmaa=None,
         drmaa_log_dir=None,
         env_modules=None,
@@ -155,6 +317,15 @@ class JobScheduler:
         use_threads = force_use_threads or (os.name != "posix")
         self._open_jobs = threading.Semaphore(0)
         self._lock = threading.Lock()
+        self._ready_queue = ReadyQueue(self.job_reward)
+        self.temp_disk_budget = None
+        if (
+            workflow.max_temp_disk is not None
+            and not dryrun
+            and not touch
+            and not dag.notemp
+        ):
+            self.temp_disk_budget = TempDiskBudget(dag, workflow.max_temp_disk)
 
         self._errors = False
         self._executor_error = None
@@ -209,6 +380,7 @@ class JobScheduler:
                 printshellcmds=printshellcmds,
                 cluster_config=cluster_config,
                 max_status_checks_per_second=max_status_checks_per_second,
+                job_arrays=slurm_job_arrays,
             )
 
         elif slurm_jobstep:
@@ -222,6 +394,31 @@ class JobScheduler:
             )
             self._local_executor = self._executor
 
+        elif worker_pool:
+            self._local_executor = CPUExecutor(
+                workflow,
+                dag,
+                local_cores,
+                printreason=printreason,
+                quiet=quiet,
+                printshellcmds=printshellcmds,
+                cores=local_cores,
+                keepincomplete=keepincomplete,
+            )
+            self._executor = WorkerPoolExecutor(
+                workflow,
+                dag,
+                worker_pool,
+                submitcmd=worker_pool_submit,
+                worker_cores=worker_pool_cores,
+                worker_resources=worker_pool_resources,
+                jobname=jobname,
+                printreason=printreason,
+                quiet=quiet,
+                printshellcmds=printshellcmds,
+                assume_shared_fs=assume_shared_fs,
+                keepincomplete=keepincomplete,
+            )
         elif cluster or cluster_sync or (drmaa is not None):
             if not workflow.immediate_submit:
                 # No local jobs when using immediate submit!
@@ -244,10 +441,14 @@ class JobScheduler:
                     constructor = partial(
                         GenericClusterExecutor,
                         statuscmd=cluster_status,
+                        statusnargs=cluster_status_nargs,
                         cancelcmd=cluster_cancel,
                         cancelnargs=cluster_cancel_nargs,
                         sidecarcmd=cluster_sidecar,
                         max_status_checks_per_second=max_status_checks_per_second,
+                        max_jobs_per_second=max_jobs_per_second,
+                        submit_concurrency=cluster_submit_concurrency,
+                        submit_retries=cluster_submit_retries,
                     )
 
                 self._executor = constructor(
@@ -416,17 +617,6 @@ class JobScheduler:
                 cores=cores,
                 keepincomplete=keepincomplete,
             )
-        from throttler import Throttler
-
-        if self.max_jobs_per_second and not self.dryrun:
-            max_jobs_frac = Fraction(self.max_jobs_per_second).limit_denominator()
-            self.rate_limiter = Throttler(
-                rate_limit=max_jobs_frac.numerator, period=max_jobs_frac.denominator
-            )
-
-        else:
-            # essentially no rate limit
-            self.rate_limiter = DummyRateLimiter()
 
         # Choose job selector (greedy or ILP)
         self.job_selector = self.job_selector_greedy
@@ -470,13 +660,32 @@ class JobScheduler:
         jobs = self.dag.ready_jobs
 
         if not self.dryrun:
-            jobs = [
-                job
-                for job in jobs
-                if not job.dynamic_input and not self.dag.dynamic(job)
-            ]
+            jobs = [job for job in jobs if self._is_open(job)]
         return jobs
 
+    def _is_open(self, job):
+        return not job.dynamic_input and not self.dag.dynamic(job)
+
+    def _update_ready_queue(self):
+        # must be called from within lock
+        # Only jobs that became ready since the last round are added, instead
+        # of recomputing the open jobs from scratch on each wakeup.
+        new_ready_jobs = self.dag.pop_new_ready_jobs()
+        if new_ready_jobs is None:
+            self._ready_queue.clear()
+            new_ready_jobs = self.dag.ready_jobs
+        for job in new_ready_jobs:
+            if job in self._ready_queue or job not in self.dag.ready_jobs:
+                continue
+            if not self.dryrun:
+                if not self._is_open(job):
+                    continue
+                # Reset params and resources because they might still contain TBDs
+                # or old values from before files have been regenerated.
+                # Now, they can be recalculated as all input is present and up to date.
+                job.reset_params_and_resources()
+            self._ready_queue.push(job)
+
     @property
     def remaining_jobs(self):
         """Return jobs to be scheduled including not yet ready ones."""
@@ -501,7 +710,8 @@ class JobScheduler:
                 with self._lock:
                     self._finish_jobs()
                     self._error_jobs()
-                    needrun = set(self.open_jobs)
+                    self._update_ready_queue()
+                    needrun = self._ready_queue
                     running = list(self.running)
                     errors = self._errors
                     executor_error = self._executor_error
@@ -550,40 +760,48 @@ class JobScheduler:
 
                 # select jobs by solving knapsack problem (omit with dryrun)
                 if self.dryrun:
-                    run = needrun
+                    run = set(needrun)
                 else:
-                    # Reset params and resources because they might still contain TBDs
-                    # or old values from before files have been regenerated.
-                    # Now, they can be recalculated as all input is present and up to date.
-                    for job in needrun:
-                        job.reset_params_and_resources()
-
                     logger.debug(
                         "Resources before job selection: {}".format(self.resources)
                     )
-                    logger.debug(
-                        "Ready jobs ({}):\n\t".format(len(needrun))
-                        + "\n\t".join(map(str, needrun))
-                    )
+                    if self.workflow.verbose:
+                        logger.debug(
+                            "Ready jobs ({}):\n\t".format(len(needrun))
+                            + "\n\t".join(map(str, needrun))
+                        )
 
                     if not self._last_job_selection_empty:
                         logger.info("Select jobs to execute...")
+                    n_ready = len(needrun)
+                    selection_start = time.perf_counter()
                     run = self.job_selector(needrun)
+                    selection_time = time.perf_counter() - selection_start
                     self._last_job_selection_empty = not run
 
                     logger.debug(
-                        "Selected jobs ({}):\n\t".format(len(run))
+                        "Selected jobs ({} of {} ready jobs in {:.3f}s):\n\t".format(
+                            len(run), n_ready, selection_time
+                        )
                         + "\n\t".join(map(str, run))
                     )
                     logger.debug(
                         "Resources after job selection: {}".format(self.resources)
                     )
 
+                    if self.temp_disk_budget is not None:
+                        run = self._apply_temp_disk_budget(run, running)
+
                 # update running jobs
                 with self._lock:
+                    for job in run:
+                        self._ready_queue.discard(job)
                     self.running.update(run)
                     # remove from ready_jobs
                     self.dag.register_running(run)
+                    if self.temp_disk_budget is not None:
+                        for job in run:
+                            self.temp_disk_budget.reserve(job)
 
                 # actually run jobs
                 local_runjobs = [job for job in run if job.is_local]
@@ -595,7 +813,11 @@ class JobScheduler:
                 "Terminating processes on user request, this might take some time."
             )
             self._executor.cancel()
+            self.dag.temp_deletion.shutdown(cancel=True)
             return False
+        finally:
+            # wait for temporary output that is still being removed
+            self.dag.temp_deletion.shutdown()
 
     def _finish_jobs(self):
         # must be called from within lock
@@ -626,6 +848,8 @@ class JobScheduler:
                 self.progress()
 
             self.dag.finish(job, update_dynamic=self.update_dynamic)
+            if self.temp_disk_budget is not None:
+                self.temp_disk_budget.release(job)
         self._tofinish.clear()
 
     def _error_jobs(self):
@@ -689,13 +913,15 @@ class JobScheduler:
         self.get_executor(job).handle_job_error(job)
         self.running.remove(job)
         self._free_resources(job)
+        if self.temp_disk_budget is not None:
+            self.temp_disk_budget.release(job, finished=False)
         # attempt starts counting from 1, but the first attempt is not
         # a restart, hence we subtract 1.
         if job.restart_times > job.attempt - 1:
             logger.info(f"Trying to restart job {self.dag.jobid(job)}.")
             job.attempt += 1
             # add job to those being ready again
-            self.dag._ready_jobs.add(job)
+            self.dag.register_restart(job)
         else:
             self._errors = True
             self.failed.add(job)
@@ -705,10 +931,69 @@ class JobScheduler:
             self._user_kill = "graceful"
         self._open_jobs.release()
 
+    def _apply_temp_disk_budget(self, run, running):
+        """Only keep the selected jobs whose temp output fits into the temp
+        disk budget, in the order of their reward."""
+        run = sorted(run, key=self.job_reward, reverse=True)
+        selected, rejected = self.temp_disk_budget.select(run)
+        if not selected and not running and rejected:
+            # Nothing would ever free space, start the most rewarding job
+            # anyway instead of waiting forever.
+            logger.warning(
+                "Temporary output of job {} exceeds the remaining temp disk "
+                "budget ({:.0f} of {} MB used), starting it anyway since no "
+                "other job is running.".format(
+                    self.dag.jobid(rejected[0]),
+                    self.temp_disk_budget.used,
+                    self.temp_disk_budget.max_mb,
+                )
+            )
+            selected.append(rejected.pop(0))
+        if rejected:
+            logger.debug(
+                "Postponed jobs exceeding the temp disk budget:\n\t"
+                + "\n\t".join(map(str, rejected))
+            )
+        for job in rejected:
+            self._free_resources(job)
+            # the selectors remove selected jobs from the queue
+            self._ready_queue.push(job)
+        return set(selected)
+
     def job_selector_ilp(self, jobs):
         """
         Job scheduling by optimization of resource usage by solving ILP using pulp
+
+        If more jobs are ready than given by the ILP window of the workflow,
+        only the jobs with the highest reward within the window are considered
+        by the ILP. The remaining jobs are selected greedily, using the
+        resources that are left afterwards.
+
+        Args:
+            jobs (ReadyQueue or list):    ready jobs
         """
+        window = self.workflow.scheduler_ilp_window
+        if not window or len(jobs) <= window:
+            return self._job_selector_ilp(jobs)
+
+        if not isinstance(jobs, ReadyQueue):
+            queue = ReadyQueue(self.job_reward)
+            for job in jobs:
+                queue.push(job)
+            jobs = queue
+
+        entries = [jobs.pop_entry() for _ in range(window)]
+        try:
+            selected = self._job_selector_ilp([entry[2] for entry in entries])
+            selected |= self.job_selector_greedy(jobs)
+        finally:
+            # put back the jobs of the window, selected ones are removed
+            # by the caller
+            for entry in entries:
+                jobs.push_entry(entry)
+        return selected
+
+    def _job_selector_ilp(self, jobs):
         import pulp
         from pulp import lpSum
         from stopit import ThreadingTimeout as Timeout, TimeoutException
@@ -768,18 +1053,40 @@ class JobScheduler:
             total_core_requirement = sum(
                 [max(job.scheduler_resources.get("_cores", 1), 1) for job in jobs]
             )
+            # Critical-path scores, discretized into integer levels, such that
+            # any difference in level outweighs the core load below.
+            critical_path_levels = 10
+            critical_path_scores = {
+                job: self.dag.critical_path_score(job) for job in jobs
+            }
+            max_critical_path_score = max(critical_path_scores.values())
+            if max_critical_path_score > 0:
+                critical_path_scores = {
+                    job: round(critical_path_levels * score / max_critical_path_score)
+                    for job, score in critical_path_scores.items()
+                }
+            # Each term below is bounded by the weight of the term above it.
+            core_load_weight = 2 * total_temp_size
+            critical_path_weight = core_load_weight * (total_core_requirement + 1)
+            if max_critical_path_score > 0:
+                priority_weight = critical_path_weight * (
+                    len(jobs) * critical_path_levels + 1
+                )
+            else:
+                priority_weight = 2 * total_core_requirement * core_load_weight
             # Objective function
-            # Job priority > Core load
+            # Job priority > Critical path
+            # Critical path > Core load
             # Core load > temp file removal
             # Instant removal > temp size
             prob += (
-                2
-                * total_core_requirement
-                * 2
-                * total_temp_size
+                priority_weight
                 * lpSum([job.priority * scheduled_jobs[job] for job in jobs])
-                + 2
-                * total_temp_size
+                + critical_path_weight
+                * lpSum(
+                    [critical_path_scores[job] * scheduled_jobs[job] for job in jobs]
+                )
+                + core_load_weight
                 * lpSum(
                     [
                         max(job.scheduler_resources.get("_cores", 1), 1)
@@ -815,16 +1122,21 @@ class JobScheduler:
                 )
 
             # Choose jobs that lead to "fastest" (minimum steps) removal of existing temp file
-            remaining_jobs = self.remaining_jobs
+            # Count the remaining jobs that need each temp file in a single pass,
+            # instead of checking all remaining jobs for each temp file.
+            temp_file_demand = Counter(
+                temp_file
+                for job in self.remaining_jobs
+                for temp_file in set(self.dag.temp_input(job))
+                if temp_file in temp_files
+            )
             for temp_file in temp_files:
                 prob += temp_job_improvement[temp_file] <= lpSum(
                     [
                         scheduled_jobs[job] * self.required_by_job(temp_file, job)
                         for job in jobs
                     ]
-                ) / lpSum(
-                    [self.required_by_job(temp_file, job) for job in remaining_jobs]
-                )
+                ) / max(temp_file_demand[temp_file], 1)
 
                 prob += (
                     temp_file_deletable[temp_file] <= temp_job_improvement[temp_file]
@@ -892,64 +1204,43 @@ class JobScheduler:
         "A Greedy Algorithm for the General Multidimensional Knapsack
         Problem", Akcay, Li, Xu, Annals of Operations Research, 2012
 
+        Since each job is an item with a single copy (0-1 MDKP) and the
+        rewards are compared lexicographically, the heuristic boils down to
+        repeatedly selecting the job with the highest reward that still fits
+        into the remaining resources. Hence, jobs are visited in the order
+        of a ReadyQueue. Jobs that do not fit are put back.
+
         Args:
-            jobs (list):    list of jobs
+            jobs (ReadyQueue or list):    ready jobs
         """
+        if not isinstance(jobs, ReadyQueue):
+            queue = ReadyQueue(self.job_reward)
+            for job in jobs:
+                queue.push(job)
+            jobs = queue
+
         with self._lock:
             if not self.resources["_cores"]:
                 return set()
-            # each job is an item with one copy (0-1 MDKP)
-            n = len(jobs)
-            x = [0] * n  # selected jobs
-            E = set(range(n))  # jobs still free to select
-            u = [1] * n
-            a = list(map(self.job_weight, jobs))  # resource usage of jobs
-            c = list(map(self.job_reward, jobs))  # job rewards
-
-            def calc_reward():
-                return [c_j * y_j for c_j, y_j in zip(c, y)]
-
             b = [
                 self.resources[name] for name in self.global_resources
             ]  # resource capacities
+            cores_idx = list(self.global_resources).index("_cores")
+
+            solution = set()
+            skipped = []
+            while jobs and b[cores_idx] > 0:
+                entry = jobs.pop_entry()
+                job = entry[2]
+                a = self.job_weight(job)  # resource usage of job
+                if all(a_i <= b_i for a_i, b_i in zip(a, b) if a_i > 0):
+                    solution.add(job)
+                    b = [b_i - a_i for b_i, a_i in zip(b, a)]
+                else:
+                    skipped.append(entry)
+            for entry in skipped:
+                jobs.push_entry(entry)
 
-            while True:
-                # Step 2: compute effective capacities
-                y = [
-                    (
-                        min(
-                            (min(u[j], b_i // a_j_i) if a_j_i > 0 else u[j])
-                            for b_i, a_j_i in zip(b, a[j])
-                            if a_j_i
-                        )
-                        if j in E
-                        else 0
-                    )
-                    for j in range(n)
-                ]
-                if not any(y):
-                    break
-                y = [
-                    (max(1, int(self.greediness * y_j)) if y_j > 0 else 0) for y_j in y
-                ]
-
-                # Step 3: compute rewards on cumulative sums
-                reward = calc_reward()
-                j_sel = max(E, key=reward.__getitem__)  # argmax
-
-                # Step 4: batch increment
-                y_sel = y[j_sel]
-
-                # Step 5: update information
-                x[j_sel] += y_sel
-                b = [b_i - (a_j_i * y_sel) for b_i, a_j_i in zip(b, a[j_sel])]
-                u[j_sel] -= y_sel
-                if not u[j_sel] or self.greediness == 1:
-                    E.remove(j_sel)
-                if not E:
-                    break
-
-            solution = set(job for job, sel in zip(jobs, x) if sel)
             # update resources
             for name, b_i in zip(self.global_resources, b):
                 self.resources[name] = b_i
@@ -1003,8 +1294,20 @@ class JobScheduler:
         # ensure selection of groups of jobs that together delete the same temp
         # file.
 
-        return (job.priority, temp_size, input_size)
+        return (
+            job.priority,
+            self.dag.critical_path_score(job),
+            temp_size,
+            input_size,
+        )
 
     def progress(self):
         """Display the progress."""
-        logger.progress(done=self.finished_jobs, total=len(self.dag))
+        if self.temp_disk_budget is not None:
+            logger.progress(
+                done=self.finished_jobs,
+                total=len(self.dag),
+                temp_disk=(self.temp_disk_budget.used, self.temp_disk_budget.max_mb),
+            )
+        else:
+            logger.progress(done=self.finished_jobs, total=len(self.dag))
@@ -16,8 +16,6 @@ import threading
 from snakemake.utils import format, argvquote, cmd_exe_quote, find_bash_on_windows
 from snakemake.common import ON_WINDOWS, RULEFUNC_CONTEXT_MARKER
 from snakemake.logging import logger
-from snakemake.deployment import singularity
-from snakemake.deployment.conda import Conda
 from snakemake.exceptions import WorkflowError
 
 
@@ -178,6 +176,8 @@ class shell:
             logger.info("Activating environment modules: {}".format(env_modules))
 
         if conda_env:
+            from snakemake.deployment.conda import Conda
+
             if ON_WINDOWS and not cls.get_executable():
                 # If we use cmd.exe directly on winodws we need to prepend batch activation script.
                 cmd = Conda(
@@ -198,6 +198,8 @@ class shell:
             cmd = '"{}" "{}"'.format(cls.get_executable() or "/bin/sh", script)
 
         if container_img:
+            from snakemake.deployment import singularity
+
             cmd = singularity.shellcmd(
                 container_img,
                 cmd,
@@ -0,0 +1,79 @@
+__author__ = "Johannes Köster"
+__copyright__ = "Copyright 2022, Johannes Köster"
+__email__ = "johannes.koester@protonmail.com"
+__license__ = "MIT"
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from snakemake.logging import logger
+
+
+class TempDeletion:
+    """
+    Pool of background threads that remove temporary output, such that
+    the scheduler does not have to wait for the removal of large files
+    or directories (e.g. on parallel file systems).
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._futures = set()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.done = 0
+
+    def submit(self, f):
+        """Remove the given temporary output in the background."""
+        logger.info("Removing temporary output {}.".format(f))
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="snakemake-temp-deletion",
+                )
+            self.submitted += 1
+            future = self._executor.submit(f.remove, remove_non_empty_dir=True)
+            self._futures.add(future)
+        future.add_done_callback(lambda future: self._done(f, future))
+
+    def _done(self, f, future):
+        with self._lock:
+            self._futures.discard(future)
+            if future.cancelled():
+                return
+            self.done += 1
+            done, submitted = self.done, self.submitted
+        e = future.exception()
+        if e is not None:
+            logger.warning("Failed to remove temporary output {}: {}".format(f, e))
+        else:
+            logger.info(
+                "Removed temporary output {} ({} of {} removals done).".format(
+                    f, done, submitted
+                )
+            )
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self, cancel=False):
+        """Wait until all submitted removals are done. If cancel is True,
+        removals that have not started yet are skipped."""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+            futures = list(self._futures)
+        if executor is None:
+            return
+        if cancel:
+            for future in futures:
+                future.cancel()
+        elif futures:
+            logger.info(
+                "Waiting for {} removals of temporary output.".format(len(futures))
+            )
+        executor.shutdown(wait=True)
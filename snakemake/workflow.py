@@ -44,8 +44,10 @@ from snakemake.io import (
     ancient,
     directory,
     expand,
+    Expansion,
     dynamic,
     glob_wildcards,
+    iglob_wildcards,
     flag,
     not_iterable,
     touch,
@@ -83,6 +85,7 @@ from snakemake.common import (
 from snakemake.utils import simplify_path
 from snakemake.checkpoints import Checkpoint, Checkpoints
 from snakemake.resources import DefaultResources, ResourceScopes
+from snakemake.resource_estimation import ResourceEstimator
 from snakemake.caching.local import OutputFileCache as LocalOutputFileCache
 from snakemake.caching.remote import OutputFileCache as RemoteOutputFileCache
 from snakemake.modules import ModuleInfo, WorkflowModifier, get_name_modifier_func
@@ -104,6 +107,7 @@ class Workflow:
         snakefile=None,
         rerun_triggers=None,
         jobscript=None,
+        job_payloads=False,
         overwrite_shellcmd=None,
         overwrite_config=None,
         overwrite_workdir=None,
@@ -146,16 +150,26 @@ class Workflow:
         edit_notebook=False,
         envvars=None,
         max_inventory_wait_time=20,
+        inventory_threads=8,
         conda_not_block_search_path_envvars=False,
         execute_subworkflows=True,
         scheduler_solver_path=None,
+        scheduler_ilp_window=1000,
+        max_temp_disk=None,
+        critical_path_priority=False,
+        estimate_resources=False,
+        estimate_resources_margin=1.2,
         conda_base_path=None,
         check_envvars=True,
         max_threads=None,
         all_temp=False,
         local_groupid="local",
         keep_metadata=True,
+        metadata_backend="json",
+        job_history=False,
         latency_wait=3,
+        dag_cache=False,
+        compact_dag=False,
     ):
         """
         Create the controller.
@@ -182,6 +196,7 @@ class Workflow:
         self.included = []
         self.included_stack = []
         self.jobscript = jobscript
+        self.job_payloads = job_payloads
         self.persistence = None
         self._subworkflows = dict()
         self.overwrite_shellcmd = overwrite_shellcmd
@@ -241,6 +256,12 @@ class Workflow:
         self.modules = dict()
         self.sourcecache = SourceCache()
         self.scheduler_solver_path = scheduler_solver_path
+        self.scheduler_ilp_window = scheduler_ilp_window
+        self.max_temp_disk = max_temp_disk
+        self.critical_path_priority = critical_path_priority
+        self.estimate_resources = estimate_resources
+        self.estimate_resources_margin = estimate_resources_margin
+        self.resource_estimator = None
         self._conda_base_path = conda_base_path
         self.check_envvars = check_envvars
         self.max_threads = max_threads
@@ -248,7 +269,11 @@ class Workflow:
         self.scheduler = None
         self.local_groupid = local_groupid
         self.keep_metadata = keep_metadata
+        self.metadata_backend = metadata_backend
+        self.job_history = job_history
         self.latency_wait = latency_wait
+        self.dag_cache = dag_cache
+        self.compact_dag = compact_dag
 
         _globals = globals()
         _globals["workflow"] = self
@@ -284,7 +309,9 @@ class Workflow:
             # only _cores, _nodes, and _tmpdir
             self.default_resources = DefaultResources(mode="bare")
 
-        self.iocache = snakemake.io.IOCache(max_inventory_wait_time)
+        self.iocache = snakemake.io.IOCache(
+            max_inventory_wait_time, n_workers=inventory_threads
+        )
 
         self.globals["config"] = copy.deepcopy(self.overwrite_config)
 
@@ -390,7 +417,9 @@ class Workflow:
             file
             for rule in self.rules
             for file in chain(rule.input, rule.output)
-            if not callable(file) and not file.contains_wildcard()
+            if not callable(file)
+            and not isinstance(file, Expansion)
+            and not file.contains_wildcard()
         )
 
     def check(self):
@@ -514,6 +543,7 @@ class Workflow:
         printdag=False,
         slurm=None,
         slurm_jobstep=None,
+        slurm_job_arrays=False,
         cluster=None,
         cluster_sync=None,
         jobname=None,
@@ -540,6 +570,7 @@ class Workflow:
         tibanna_config=False,
         container_image=None,
         stats=None,
+        dump_critical_path=None,
         force_incomplete=False,
         ignore_incomplete=False,
         list_version_changes=False,
@@ -547,6 +578,7 @@ class Workflow:
         list_input_changes=False,
         list_params_changes=False,
         list_untracked=False,
+        list_job_history=False,
         list_conda_envs=False,
         summary=False,
         archive=None,
@@ -559,6 +591,7 @@ class Workflow:
         notemp=False,
         nodeps=False,
         cleanup_metadata=None,
+        migrate_metadata=False,
         conda_cleanup_envs=False,
         cleanup_shadow=False,
         cleanup_scripts=True,
@@ -577,7 +610,14 @@ class Workflow:
         cluster_status=None,
         cluster_cancel=None,
         cluster_cancel_nargs=None,
+        cluster_status_nargs=1,
         cluster_sidecar=None,
+        cluster_submit_concurrency=1,
+        cluster_submit_retries=0,
+        worker_pool=None,
+        worker_pool_submit=None,
+        worker_pool_cores=1,
+        worker_pool_resources=None,
         report=None,
         report_stylesheet=None,
         export_cwl=False,
@@ -687,6 +727,9 @@ class Workflow:
             notemp=notemp,
             keep_remote_local=keep_remote_local,
             batch=batch,
+            compact_graph=self.compact_dag,
+            critical_path=self.critical_path_priority or dump_critical_path is not None,
+            runtime_stats=stats,
         )
 
         self.persistence = Persistence(
@@ -695,6 +738,9 @@ class Workflow:
             conda_prefix=self.conda_prefix,
             singularity_prefix=self.singularity_prefix,
             shadow_prefix=self.shadow_prefix,
+            metadata_backend=self.metadata_backend,
+            job_history=self.job_history,
+            content_checksums="checksum" in self.rerun_triggers,
             warn_only=dryrun
             or printrulegraph
             or printfilegraph
@@ -713,6 +759,21 @@ class Workflow:
         if self.mode in [Mode.subprocess, Mode.cluster]:
             self.persistence.deactivate_cache()
 
+        if migrate_metadata:
+            self.persistence.migrate_metadata()
+            return True
+
+        if list_job_history:
+            for row in self.persistence.history.summary():
+                print(*row, sep="\t")
+            return True
+
+        if self.estimate_resources and self.mode == Mode.default:
+            # spawned jobs get the estimates via --set-resources
+            self.resource_estimator = ResourceEstimator(
+                self.persistence.history, margin=self.estimate_resources_margin
+            )
+
         if cleanup_metadata:
             failed = []
             for f in cleanup_metadata:
@@ -948,6 +1009,9 @@ class Workflow:
             self.persistence.conda_cleanup_envs()
             return True
 
+        if dump_critical_path:
+            dag.critical_path.dump(dag, dump_critical_path)
+
         self.scheduler = JobScheduler(
             self,
             dag,
@@ -956,12 +1020,20 @@ class Workflow:
             touch=touch,
             slurm=slurm,
             slurm_jobstep=slurm_jobstep,
+            slurm_job_arrays=slurm_job_arrays,
             cluster=cluster,
             cluster_status=cluster_status,
             cluster_cancel=cluster_cancel,
             cluster_cancel_nargs=cluster_cancel_nargs,
+            cluster_status_nargs=cluster_status_nargs,
             cluster_sidecar=cluster_sidecar,
+            cluster_submit_concurrency=cluster_submit_concurrency,
+            cluster_submit_retries=cluster_submit_retries,
             cluster_config=cluster_config,
+            worker_pool=worker_pool,
+            worker_pool_submit=worker_pool_submit,
+            worker_pool_cores=worker_pool_cores,
+            worker_pool_resources=worker_pool_resources,
             cluster_sync=cluster_sync,
             jobname=jobname,
             max_jobs_per_second=max_jobs_per_second,
@@ -1004,6 +1076,10 @@ class Workflow:
                     logger.resources_info(
                         "Provided cluster nodes: {}".format(self.nodes)
                     )
+                elif worker_pool:
+                    logger.resources_info(
+                        "Provided pool workers: {}".format(worker_pool)
+                    )
                 elif kubernetes or tibanna or google_lifesciences:
                     logger.resources_info("Provided cloud nodes: {}".format(self.nodes))
                 else:
@@ -1087,6 +1163,10 @@ class Workflow:
             if dryrun:
                 log_provenance_info()
             raise e
+        finally:
+            if self.output_file_cache is not None:
+                self.output_file_cache.provenance_hash_map.save()
+            self.persistence.history.flush()
 
         if not immediate_submit and not dryrun and self.mode == Mode.default:
             dag.cleanup_workdir()
@@ -1462,8 +1542,10 @@ class Workflow:
                         rule=rule,
                     )
                 rule.resources.update(resources)
+                rule.explicit_resources.update(resources)
             if name in self.overwrite_resources:
                 rule.resources.update(self.overwrite_resources[name])
+                rule.explicit_resources.update(self.overwrite_resources[name])
 
             if ruleinfo.priority:
                 if not isinstance(ruleinfo.priority, int) and not isinstance(
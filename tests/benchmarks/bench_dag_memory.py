@@ -0,0 +1,104 @@
+"""Benchmark the memory needed for the jobs of a large DAG.
+
+A Snakefile with two rules is parsed: a per-sample rule with 20 files (named
+and unnamed input files, flagged output files and a log file) and an
+aggregation rule. The jobs are then created exactly like the DAG creates them
+during its construction: each sample job and the aggregation job, where each
+output of a sample job is one input of the aggregation job. With the default
+of 50000 samples, this amounts to 1M files (plus 400k in the aggregation).
+The memory allocated per sample job (as traced by tracemalloc) is reported.
+
+Usage: python tests/benchmarks/bench_dag_memory.py [--jobs N]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from snakemake.jobs import Job
+from snakemake.workflow import Workflow
+
+
+SNAKEFILE = """
+rule aggregate:
+    input:
+        expand("mapped/{sample}/part{i}.bam", sample=SAMPLES, i=range(8)),
+    output:
+        "all.txt",
+    shell:
+        "touch {output}"
+
+
+rule map:
+    input:
+        reads=expand("data/{{sample}}/chunk{i}.fq", i=range(10)),
+        ref="ref/genome.fa",
+    output:
+        expand("mapped/{{sample}}/part{i}.bam", i=range(8)),
+    log:
+        "logs/{sample}.log",
+    shell:
+        "touch {output}"
+"""
+
+
+def setup(n_jobs, workdir):
+    snakefile = os.path.join(workdir, "Snakefile")
+    with open(snakefile, "w") as f:
+        f.write(
+            "SAMPLES = ['s' + str(i) for i in range({})]\n".format(n_jobs) + SNAKEFILE
+        )
+    workflow = Workflow(snakefile=snakefile)
+    workflow.include(snakefile)
+    return workflow
+
+
+def build_jobs(workflow, n_jobs):
+    dag = SimpleNamespace(workflow=workflow)
+    rule = workflow.get_rule("map")
+    jobs = [Job(rule, dag, {"sample": "s{}".format(i)}) for i in range(n_jobs)]
+    jobs.append(Job(workflow.get_rule("aggregate"), dag, {}))
+    for job in jobs:
+        # as determined by the DAG
+        job.log
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            workflow = setup(args.jobs, workdir)
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            jobs = build_jobs(workflow, args.jobs)
+            elapsed = time.perf_counter() - start
+            gc.collect()
+            used = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    n_files = sum(len(job.input) + len(job.output) + len(job.log) for job in jobs)
+    print(
+        f"created {len(jobs)} jobs with {n_files} files in {elapsed:.1f}s "
+        f"(with tracemalloc): {used / 2 ** 20:.1f} MiB, "
+        f"{used / args.jobs:.0f} bytes per job, {used / n_files:.0f} bytes per file"
+    )
+
+
+if __name__ == "__main__":
+    main()
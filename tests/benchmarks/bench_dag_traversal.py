@@ -0,0 +1,104 @@
+"""Benchmark traversals of a large DAG.
+
+A synthetic DAG of layered jobs is set up without any Snakefile, where each
+job depends on several jobs of the previous layer (1M edges by default).
+Then, the traversals of the DAG (bfs, level_bfs and dfs from the final jobs,
+bfs over the depending jobs of the first layer, and toposorted) are timed,
+once over the dict based adjacency and once over the compact, integer-indexed
+copy of it (--compact-dag). The time for building the compact copy is
+reported separately.
+
+Usage: python tests/benchmarks/bench_dag_traversal.py [--jobs N] [--width W]
+       [--degree D]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from snakemake import workflow as _workflow
+from snakemake.checkpoints import Checkpoints
+from snakemake.dag import DAG
+
+
+class FakeJob:
+    pipe_group = None
+
+    def __init__(self, jobid):
+        self.jobid = jobid
+
+    def __repr__(self):
+        return f"job{self.jobid}"
+
+
+def setup_dag(n_jobs, width, degree, seed=42):
+    rng = random.Random(seed)
+    # normally set up by the Workflow constructor
+    _workflow.checkpoints = Checkpoints()
+    workflow = SimpleNamespace(use_singularity=False, use_conda=False)
+    dag = DAG(workflow, rules=[], notemp=True)
+    jobs = [FakeJob(i) for i in range(n_jobs)]
+    for i, job in enumerate(jobs):
+        dag.dependencies[job]
+        dag.depending[job]
+        if i >= width:
+            layer_start = (i // width - 1) * width
+            for j in rng.sample(range(layer_start, layer_start + width), degree):
+                dep = jobs[j]
+                dag.dependencies[job][dep].add(f"f{j}")
+                dag.depending[dep][job].add(f"f{j}")
+    return dag, jobs
+
+
+def measure(func):
+    start = time.perf_counter()
+    n = func()
+    return time.perf_counter() - start, n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--degree", type=int, default=10)
+    args = parser.parse_args()
+
+    dag, jobs = setup_dag(args.jobs, args.width, args.degree)
+    n_edges = sum(map(len, dag.dependencies.values()))
+    print(f"{len(jobs)} jobs, {n_edges} edges")
+
+    final = jobs[-args.width :]
+    first = jobs[: args.width]
+    traversals = [
+        ("bfs", lambda: sum(1 for _ in dag.bfs(dag.dependencies, *final))),
+        (
+            "level_bfs",
+            lambda: sum(1 for _ in dag.level_bfs(dag.dependencies, *final)),
+        ),
+        ("dfs", lambda: sum(1 for _ in dag.dfs(dag.dependencies, *final))),
+        ("bfs (depending)", lambda: sum(1 for _ in dag.bfs(dag.depending, *first))),
+        ("toposorted", lambda: sum(map(len, dag.toposorted(set(jobs))))),
+    ]
+
+    elapsed, _ = measure(lambda: (dag.dependencies.compact(), dag.depending.compact()))
+    print(f"building the compact graphs: {elapsed:.2f}s")
+
+    for name, func in traversals:
+        dag.compact_graph = False
+        elapsed_dict, n = measure(func)
+        dag.compact_graph = True
+        elapsed_compact, n_compact = measure(func)
+        assert n == n_compact
+        print(
+            f"{name}: {n} jobs, dict {elapsed_dict:.2f}s, "
+            f"compact {elapsed_compact:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
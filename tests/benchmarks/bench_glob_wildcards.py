@@ -0,0 +1,123 @@
+"""Benchmark glob_wildcards on a synthetic deep directory tree.
+
+A tree resembling a sequencing facility is generated once:
+runs/<run>/<sample>/L<lane>/{reads.fq,qc/*,tmp/*}. Then, the wildcards of the
+reads are globbed with the former implementation (os.walk over everything below
+the constant prefix, matching every path) and with the pattern-aware walker,
+sequentially and with a thread pool. Wall time and the number of matches are
+reported.
+
+Usage: python tests/benchmarks/bench_glob_wildcards.py [--dir DIR] [--runs N]
+       [--samples N] [--lanes N] [--extra-files N] [--threads N]
+"""
+
+import argparse
+import collections
+import os
+import re
+import sys
+import tempfile
+import time
+from itertools import chain
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from snakemake.io import glob_wildcards, regex, _wildcard_regex
+
+
+PATTERN = "runs/{run,[^/]+}/{sample,[^/]+}/L{lane,[0-9]+}/reads.fq"
+
+
+def glob_wildcards_walk(pattern, followlinks=False):
+    """The former implementation of glob_wildcards."""
+    pattern = os.path.normpath(pattern)
+    first_wildcard = re.search("{[^{]", pattern)
+    dirname = (
+        os.path.dirname(pattern[: first_wildcard.start()])
+        if first_wildcard
+        else os.path.dirname(pattern)
+    )
+    if not dirname:
+        dirname = "."
+
+    names = [match.group("name") for match in _wildcard_regex.finditer(pattern)]
+    Wildcards = collections.namedtuple("Wildcards", names)
+    wildcards = Wildcards(*[list() for name in names])
+
+    pattern = re.compile(regex(pattern))
+    for dirpath, dirnames, filenames in os.walk(dirname, followlinks=followlinks):
+        for f in chain(filenames, dirnames):
+            f = os.path.normpath(os.path.join(dirpath, f))
+            match = re.match(pattern, f)
+            if match:
+                for name, value in match.groupdict().items():
+                    getattr(wildcards, name).append(value)
+    return wildcards
+
+
+def create_tree(root, n_runs, n_samples, n_lanes, n_extra):
+    n_files = 0
+    for run in range(n_runs):
+        for sample in range(n_samples):
+            for lane in range(1, n_lanes + 1):
+                lanedir = os.path.join(
+                    root, "runs", f"run{run}", f"sample{sample}", f"L{lane}"
+                )
+                for subdir in ("qc", "tmp"):
+                    os.makedirs(os.path.join(lanedir, subdir))
+                    for i in range(n_extra):
+                        path = os.path.join(lanedir, subdir, f"chunk{i}.bin")
+                        open(path, "w").close()
+                open(os.path.join(lanedir, "reads.fq"), "w").close()
+                n_files += 2 * n_extra + 1
+    return n_files
+
+
+def measure(func):
+    start = time.perf_counter()
+    wildcards = func()
+    return time.perf_counter() - start, len(wildcards.run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dir", help="Reuse (or create) the tree in this directory.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--lanes", type=int, default=4)
+    parser.add_argument("--extra-files", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    tmpdir = None
+    root = args.dir
+    if root is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        root = tmpdir.name
+    if not os.path.exists(os.path.join(root, "runs")):
+        n_files = create_tree(
+            root, args.runs, args.samples, args.lanes, args.extra_files
+        )
+        print(f"created {n_files} files in {root}")
+
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        for name, func in [
+            ("os.walk", lambda: glob_wildcards_walk(PATTERN)),
+            ("pruning walker", lambda: glob_wildcards(PATTERN)),
+            (
+                f"pruning walker ({args.threads} threads)",
+                lambda: glob_wildcards(PATTERN, threads=args.threads),
+            ),
+        ]:
+            elapsed, n_matches = measure(func)
+            print(f"{name}: {n_matches} matches in {elapsed:.3f}s")
+    finally:
+        os.chdir(cwd)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
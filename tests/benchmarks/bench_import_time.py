@@ -0,0 +1,104 @@
+"""Benchmark the cold-start time of spawned jobs.
+
+A trivial job payload (a shell command that does nothing) is executed
+repeatedly in fresh Python processes, once via the fast-start job runner
+(snakemake/job_runner.py) and once via the command line interface
+(snakemake --job-payload). For comparison, the startup of the command line
+interface alone is timed as well (snakemake --version). For each variant, the
+median and minimum wall clock time and the number of imported modules (as
+reported by python -X importtime) are printed.
+
+Usage: python tests/benchmarks/bench_import_time.py [--repeats N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+JOB_RUNNER = os.path.join(ROOT, "snakemake", "job_runner.py")
+
+
+def write_payload(path):
+    payload = {
+        "version": 1,
+        "rule": "noop",
+        "jobid": 1,
+        "shellcmd": "true",
+        "shell": {
+            "executable": "/bin/bash",
+            "prefix": "set -euo pipefail; ",
+            "suffix": "",
+            "conda_block_conflicting_envvars": True,
+        },
+        "threads": 1,
+        "resources": {},
+        "system_tmpdir": True,
+        "output": [],
+        "log": [],
+        "benchmark": None,
+        "benchmark_repeats": 1,
+        "wait_for_files": [],
+        "latency_wait": 5,
+        "conda_env": None,
+        "conda_base_path": None,
+        "container_img": None,
+        "singularity_args": "",
+        "env_modules": None,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f)
+
+
+def run(cmd, env):
+    start = time.perf_counter()
+    subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def count_imports(cmd, env):
+    stderr = subprocess.run(
+        [cmd[0], "-X", "importtime"] + cmd[1:],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    ).stderr
+    return sum(1 for line in stderr.splitlines() if line.startswith("import time:"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        payload = os.path.join(tmpdir, "payload.json")
+        write_payload(payload)
+        variants = [
+            ("job runner", [sys.executable, JOB_RUNNER, payload]),
+            (
+                "snakemake --job-payload",
+                [sys.executable, "-m", "snakemake", "--job-payload", payload],
+            ),
+            ("snakemake --version", [sys.executable, "-m", "snakemake", "--version"]),
+        ]
+        for name, cmd in variants:
+            # warm up the file system cache
+            run(cmd, env)
+            times = [run(cmd, env) for _ in range(args.repeats)]
+            print(
+                f"{name}: median {statistics.median(times):.3f}s, "
+                f"min {min(times):.3f}s, {count_imports(cmd, env)} modules"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark a single job selection round with many ready jobs.
+
+A synthetic set of independent ready jobs with a random mix of resource
+requirements (threads, memory, priorities) is generated. Then, one job
+selection round is performed with the greedy selector, the ILP selector over
+all ready jobs and the ILP selector restricted to a window of the jobs with
+the highest reward. The time per round and the resulting resource usage are
+reported.
+
+Usage: python tests/benchmarks/bench_job_selector.py [--jobs N] [--window K]
+       [--cores C] [--mem-mb M] [--skip-full-ilp]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from snakemake import workflow as _workflow
+from snakemake.checkpoints import Checkpoints
+from snakemake.dag import DAG
+from snakemake.scheduler import JobScheduler, ReadyQueue
+
+
+class FakeJob:
+    is_checkpoint = False
+    dynamic_input = ()
+    dynamic_output = ()
+    group = None
+    output = ()
+    temp_output = ()
+    inputsize = 0
+    rule = SimpleNamespace(name="bench")
+
+    def __init__(self, jobid, priority, scheduler_resources):
+        self.jobid = jobid
+        self.priority = priority
+        self.scheduler_resources = scheduler_resources
+
+    def is_group(self):
+        return False
+
+    def reset_params_and_resources(self):
+        pass
+
+    def __repr__(self):
+        return f"job{self.jobid}"
+
+
+# (threads, mem_mb) of the synthetic resource mix and their relative frequency
+RESOURCE_MIX = [
+    ((1, 1000), 50),
+    ((2, 4000), 20),
+    ((4, 8000), 15),
+    ((8, 32000), 10),
+    ((16, 64000), 5),
+]
+
+
+def setup(n_jobs, cores, mem_mb, window, seed=42):
+    rng = random.Random(seed)
+    # normally set up by the Workflow constructor
+    _workflow.checkpoints = Checkpoints()
+    global_resources = {"_cores": cores, "_nodes": None, "mem_mb": mem_mb}
+    workflow = SimpleNamespace(
+        use_singularity=False,
+        use_conda=False,
+        immediate_submit=False,
+        verbose=False,
+        global_resources=global_resources,
+        scheduler_solver_path=None,
+        scheduler_ilp_window=window,
+    )
+    dag = DAG(workflow, rules=[], notemp=True)
+    mix, weights = zip(*RESOURCE_MIX)
+    jobs = []
+    for i, (threads, mem) in enumerate(rng.choices(mix, weights, k=n_jobs)):
+        jobs.append(
+            FakeJob(
+                i,
+                priority=rng.choice((0, 0, 0, 1)),
+                scheduler_resources={"_cores": threads, "_nodes": 1, "mem_mb": mem},
+            )
+        )
+    for job in jobs:
+        dag.dependencies[job]
+        dag._n_until_ready[job] = 0
+    dag._needrun.update(jobs)
+    dag.update_ready()
+
+    scheduler = JobScheduler.__new__(JobScheduler)
+    scheduler.workflow = workflow
+    scheduler.dag = dag
+    scheduler.dryrun = False
+    scheduler.touch = False
+    scheduler.running = set()
+    scheduler.failed = set()
+    scheduler.scheduler_ilp_solver = None
+    scheduler.global_resources = {
+        name: (sys.maxsize if res is None else res)
+        for name, res in global_resources.items()
+    }
+    scheduler.resources = dict(scheduler.global_resources)
+    scheduler._lock = threading.Lock()
+    scheduler._ready_queue = ReadyQueue(scheduler.job_reward)
+    scheduler._update_ready_queue()
+    return scheduler
+
+
+def select(scheduler, selector):
+    scheduler.resources = dict(scheduler.global_resources)
+    start = time.perf_counter()
+    selected = selector(scheduler._ready_queue)
+    elapsed = time.perf_counter() - start
+    for job in selected:
+        scheduler._ready_queue.discard(job)
+    used_cores = sum(job.scheduler_resources["_cores"] for job in selected)
+    used_mem = sum(job.scheduler_resources["mem_mb"] for job in selected)
+    return elapsed, len(selected), used_cores, used_mem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=1000)
+    parser.add_argument("--cores", type=int, default=512)
+    parser.add_argument("--mem-mb", type=int, default=2000000)
+    parser.add_argument("--skip-full-ilp", action="store_true")
+    args = parser.parse_args()
+
+    modes = [("greedy", None), ("ilp (window {})".format(args.window), args.window)]
+    if not args.skip_full_ilp:
+        modes.append(("ilp (all jobs)", 0))
+
+    for name, window in modes:
+        scheduler = setup(args.jobs, args.cores, args.mem_mb, window)
+        selector = (
+            scheduler.job_selector_greedy
+            if window is None
+            else scheduler.job_selector_ilp
+        )
+        elapsed, n_selected, used_cores, used_mem = select(scheduler, selector)
+        print(
+            f"{name}: selected {n_selected} of {args.jobs} jobs in {elapsed:.3f}s, "
+            f"using {used_cores}/{args.cores} cores and "
+            f"{used_mem}/{args.mem_mb} mem_mb"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark resolving files to their producing rules via the OutputIndex.
+
+A workflow with many rules whose outputs share the same generic suffix
+(.bam) is generated. Then, the given number of target paths is resolved
+to producing rules and wildcards, once with the combined
+OutputIndex.match_producers() and once the previous way (candidate rules
+from OutputIndex.match(), followed by Rule.is_producer() and
+Rule.get_wildcards()).
+
+Usage: python tests/benchmarks/bench_output_index.py [--paths N] [--rules R]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from snakemake.output_index import OutputIndex
+from snakemake.workflow import Workflow
+
+SNAKEFILE_RULE = """
+rule step{i}:
+    output:
+        "results/{{sample}}.step{i}.bam",
+    log:
+        "logs/{{sample}}.step{i}.log",
+    shell:
+        "touch {{output}}"
+"""
+
+SNAKEFILE_GENERIC_RULE = """
+rule sort:
+    output:
+        "results/{sample}.sorted.bam",
+    log:
+        "logs/{sample}.sorted.log",
+    shell:
+        "touch {output}"
+"""
+
+
+def setup_workflow(tmpdir, n_rules):
+    snakefile = os.path.join(tmpdir, "Snakefile")
+    with open(snakefile, "w") as f:
+        f.write(SNAKEFILE_GENERIC_RULE)
+        for i in range(n_rules):
+            f.write(SNAKEFILE_RULE.format(i=i))
+    workflow = Workflow(snakefile=snakefile)
+    workflow.include(snakefile)
+    return workflow
+
+
+def resolve_previous(index, path):
+    return {
+        rule: rule.get_wildcards(path)
+        for rule in index.match(path)
+        if rule.is_producer(path)
+    }
+
+
+def resolve_combined(index, path):
+    return index.match_producers(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paths", type=int, default=1000000)
+    parser.add_argument("--rules", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workflow = setup_workflow(tmpdir, args.rules)
+        index = OutputIndex(workflow.rules)
+
+        random.seed(42)
+        paths = [
+            "results/sample{}.step{}.bam".format(
+                random.randrange(10000), random.randrange(args.rules)
+            )
+            for _ in range(args.paths)
+        ]
+
+        # sanity check
+        for path in paths[:100]:
+            assert resolve_previous(index, path) == resolve_combined(index, path)
+
+        for name, resolve in [
+            ("previous", resolve_previous),
+            ("combined", resolve_combined),
+        ]:
+            start = time.process_time()
+            for path in paths:
+                resolve(index, path)
+            elapsed = time.process_time() - start
+            print(
+                f"{name}: {len(paths)} paths in {elapsed:.2f}s "
+                f"({len(paths) / elapsed:.0f} paths/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark the overhead of the scheduler loop.
+
+A synthetic DAG of trivial, independent jobs is set up without any Snakefile.
+The scheduling rounds of JobScheduler.schedule() are replayed: in each round,
+the ready jobs are updated, jobs are selected with the greedy selector and
+all of them are finished immediately. The CPU time spent in the scheduler
+thread is reported. With --rescan, the open jobs are instead recomputed from
+scratch in every round, as it was done before the ready queue was introduced.
+
+Usage: python tests/benchmarks/bench_scheduler.py [--jobs N] [--cores C] [--rescan]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from snakemake import workflow as _workflow
+from snakemake.checkpoints import Checkpoints
+from snakemake.dag import DAG
+from snakemake.scheduler import JobScheduler, ReadyQueue
+
+
+class FakeJob:
+    is_checkpoint = False
+    dynamic_input = ()
+    dynamic_output = ()
+    group = None
+    output = ()
+    temp_output = ()
+    priority = 0
+    inputsize = 0
+    scheduler_resources = {"_cores": 1, "_nodes": 1}
+    rule = SimpleNamespace(name="bench")
+
+    def __init__(self, jobid):
+        self.jobid = jobid
+
+    def is_group(self):
+        return False
+
+    def reset_params_and_resources(self):
+        pass
+
+    def __repr__(self):
+        return f"job{self.jobid}"
+
+
+def setup(n_jobs, cores):
+    # normally set up by the Workflow constructor
+    _workflow.checkpoints = Checkpoints()
+    workflow = SimpleNamespace(
+        use_singularity=False, use_conda=False, immediate_submit=False, verbose=False
+    )
+    dag = DAG(workflow, rules=[], notemp=True)
+    jobs = [FakeJob(i) for i in range(n_jobs)]
+    for job in jobs:
+        dag.dependencies[job]
+        dag._n_until_ready[job] = 0
+    dag._needrun.update(jobs)
+    dag.update_ready()
+
+    scheduler = JobScheduler.__new__(JobScheduler)
+    scheduler.workflow = workflow
+    scheduler.dag = dag
+    scheduler.dryrun = False
+    scheduler.touch = False
+    scheduler.global_resources = {"_cores": cores, "_nodes": sys.maxsize}
+    scheduler.resources = dict(scheduler.global_resources)
+    scheduler._lock = threading.Lock()
+    scheduler._ready_queue = ReadyQueue(scheduler.job_reward)
+    return scheduler
+
+
+def run(scheduler, rescan=False):
+    dag = scheduler.dag
+    finished = 0
+    rounds = 0
+    while True:
+        if rescan:
+            for job in scheduler.open_jobs:
+                job.reset_params_and_resources()
+            needrun = list(scheduler.open_jobs)
+        else:
+            scheduler._update_ready_queue()
+            needrun = scheduler._ready_queue
+        if not needrun:
+            break
+        run = scheduler.job_selector_greedy(needrun)
+        rounds += 1
+        dag.register_running(run)
+        for job in run:
+            scheduler._free_resources(job)
+            dag.finish(job)
+            finished += 1
+    return finished, rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--cores", type=int, default=64)
+    parser.add_argument("--rescan", action="store_true")
+    args = parser.parse_args()
+
+    scheduler = setup(args.jobs, args.cores)
+    start = time.thread_time()
+    finished, rounds = run(scheduler, rescan=args.rescan)
+    cpu = time.thread_time() - start
+    assert finished == args.jobs, "not all jobs have been finished"
+    print(
+        f"scheduled {finished} jobs in {rounds} rounds: scheduler thread CPU time "
+        f"{cpu:.2f}s ({cpu / rounds * 1e3:.2f}ms per round)"
+    )
+
+
+if __name__ == "__main__":
+    main()
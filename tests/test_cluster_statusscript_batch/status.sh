@@ -0,0 +1,6 @@
+#!/bin/bash
+# batch protocol: print one line "<jobid> <status>" per given job id
+echo "$#" >> status.log
+for jobid in "$@"; do
+    echo "$jobid success"
+done
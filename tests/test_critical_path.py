@@ -0,0 +1,47 @@
+import json
+from types import SimpleNamespace
+
+from snakemake.critical_path import CriticalPath, read_benchmark_runtime
+
+
+class FakeJob:
+    def __init__(self, rule, output, benchmark=None, runtime=None):
+        resources = {} if runtime is None else {"runtime": runtime}
+        self.rule = SimpleNamespace(name=rule, resources=resources)
+        self.output = [output]
+        self.benchmark = benchmark
+
+
+def test_runtime_estimates(tmpdir):
+    benchmark = tmpdir.join("a.tsv")
+    benchmark.write("s\th:m:s\tmax_rss\n10.00\t0:00:10\t1.0\n20.00\t0:00:20\t1.0\n")
+    assert read_benchmark_runtime(str(benchmark)) == 15
+    assert read_benchmark_runtime(str(tmpdir.join("missing.tsv"))) is None
+
+    stats = tmpdir.join("stats.json")
+    stats.write(
+        json.dumps(
+            {
+                "rules": {"c": {"mean-runtime": 7.0}},
+                "files": {"b1.txt": {"duration": 3.0}},
+            }
+        )
+    )
+    critical_path = CriticalPath(stats=str(stats))
+    jobs = {
+        "a": FakeJob("a", "a.txt", benchmark=str(benchmark)),
+        "b1": FakeJob("b", "b1.txt"),
+        "b2": FakeJob("b", "b2.txt"),
+        "c": FakeJob("c", "c.txt"),
+        "d": FakeJob("d", "d.txt", runtime=2),
+        "e": FakeJob("e", "e.txt"),
+    }
+    runtimes = critical_path._estimate_runtimes(jobs.values())
+    assert {name: runtimes[j] for name, j in jobs.items()} == {
+        "a": (15, "benchmark"),
+        "b1": (3.0, "stats"),
+        "b2": (3.0, "rule"),
+        "c": (7.0, "stats"),
+        "d": (120, "resource"),
+        "e": (9.0, "default"),
+    }
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+from snakemake.history import JobHistory, percentile
+
+
+class FakeJob:
+    def __init__(self, rule, benchmark=None, inputsize=0, remote=False, **wildcards):
+        self.rule = SimpleNamespace(name=rule)
+        self.wildcards_dict = wildcards
+        self.benchmark = benchmark
+        self.inputsize = inputsize
+        self.input = [SimpleNamespace(is_remote=remote)]
+
+    def is_group(self):
+        return False
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([1.0], 90) == 1.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_job_history(tmpdir):
+    benchmark = tmpdir.join("bench.tsv")
+    benchmark.write(
+        "s\th:m:s\tmax_rss\tmax_vms\tmax_uss\tmax_pss\tio_in\tio_out\tmean_load\t"
+        "cpu_time\n"
+        "10.00\t0:00:10\t100.00\t-\t-\t-\t1.00\t2.00\t0.00\t0.00\n"
+        "20.00\t0:00:20\t300.00\t-\t-\t-\t3.00\t4.00\t0.00\t0.00\n"
+    )
+    history = JobHistory(str(tmpdir.join("history.sqlite")))
+    history.record(FakeJob("map", str(benchmark), 2 * 1024**2, sample="a"), 0, 1)
+    for i, runtime in enumerate([1, 2, 3, 4]):
+        history.record(FakeJob("sort", sample=str(i)), 100, 100 + runtime)
+    history.record(FakeJob("sort", sample="x"), 200, 300, success=False)
+    history.close()
+
+    # reopen
+    history = JobHistory(str(tmpdir.join("history.sqlite")))
+    (record,) = history.jobs(rule="map")
+    assert record.wildcards == {"sample": "a"}
+    assert (record.runtime, record.max_rss, record.io_in, record.io_out) == (
+        15,
+        300,
+        2,
+        3,
+    )
+    assert record.input_size == 2
+    assert record.status == "success"
+
+    assert len(history.jobs(rule="sort")) == 5
+    assert [r.runtime for r in history.jobs(wildcards={"sample": 2})] == [3]
+    assert [r.runtime for r in history.jobs(status="failed")] == [100]
+
+    assert history.percentiles(q=(50, 100)) == {
+        "map": {50: 15, 100: 15},
+        "sort": {50: 2.5, 100: 4},
+    }
+    assert history.percentiles(measure="max_rss") == {
+        "map": {50: 300, 90: 300, 100: 300}
+    }
+    with pytest.raises(ValueError):
+        history.percentiles(measure="foo")
+
+    header, *rows = history.summary(q=(50,))
+    assert header == [
+        "rule",
+        "jobs",
+        "failed",
+        "runtime_p50",
+        "max_rss_p50",
+        "io_in_p50",
+        "io_out_p50",
+    ]
+    assert rows == [
+        ["map", "1", "0", "15.00", "300.00", "2.00", "3.00"],
+        ["sort", "5", "1", "2.50", "-", "-", "-"],
+    ]
+
+
+def test_job_history_batches(tmpdir):
+    path = str(tmpdir.join("history.sqlite"))
+    history = JobHistory(path)
+    history.batch_size = 3
+    history.record(FakeJob("a", inputsize=1024**2, remote=True), 0, 1)
+    history.record(FakeJob("b"), 0, 1)
+    # nothing is written before a batch is complete
+    assert not tmpdir.join("history.sqlite").exists()
+    history.record(FakeJob("c"), 0, 1)
+    assert len(JobHistory(path).jobs()) == 3
+    history.record(FakeJob("d"), 0, 1)
+    history.close()
+    records = JobHistory(path).jobs()
+    assert [r.rule for r in records] == ["a", "b", "c", "d"]
+    # the size of remote input files is not determined
+    assert records[0].input_size is None
+
+
+def test_job_history_disabled(tmpdir):
+    history = JobHistory(str(tmpdir.join("history.sqlite")), record_jobs=False)
+    history.record(FakeJob("a"), 0, 1)
+    history.close()
+    assert history.jobs() == []
+    assert not tmpdir.join("history.sqlite").exists()
@@ -1,6 +1,16 @@
-from pathlib import PosixPath
-
-from snakemake.io import _wildcard_regex, expand
+import os
+from pathlib import Path, PosixPath
+from types import SimpleNamespace
+
+from snakemake.io import (
+    _wildcard_regex,
+    expand,
+    Expansion,
+    glob_wildcards,
+    iglob_wildcards,
+    IOCache,
+    IOFile,
+)
 from snakemake.exceptions import WildcardError
 
 
@@ -109,3 +119,132 @@ def test_expand():
         x="Hello",
         y="world",
     ) == ["Hello/world"]
+
+
+def test_expand_lazy():
+    wildcards = {"a": [1, 2, 10], "b": ["x", "x_y"], "c": [5]}
+    patterns = ["{a}_{b}.{c}", "{a}/{a}.txt", "{{w}}/{b}"]
+    expansion = expand(patterns, **wildcards, lazy=True)
+    expected = expand(patterns, **wildcards)
+
+    assert isinstance(expansion, Expansion)
+    assert list(expansion) == expected
+    assert len(expansion) == len(expected)
+    assert [expansion[i] for i in range(-len(expected), len(expected))] == (
+        expected * 2
+    )
+    assert expansion[2:5] == expected[2:5]
+    for path in expected:
+        assert path in expansion
+    for path in ["1_y.5", "1_x_y.6", "1/2.txt", "3/3.txt", "w/x", "{w}/z"]:
+        assert path not in expansion
+
+    # other combinators, missing and unused wildcards
+    assert list(expand("{a}-{b}", zip, lazy=True, **wildcards)) == ["1-x", "2-x_y"]
+    assert "2-x_y" in expand("{a}-{b}", zip, lazy=True, **wildcards)
+    assert list(expand("{a}{d}", allow_missing=True, lazy=True, a=[1])) == ["1{d}"]
+    assert "1{d}" in expand("{a}{d}", allow_missing=True, lazy=True, a=[1])
+    assert len(expand("{a}{b}", lazy=True, a=[1, 2], b=[])) == 0
+    assert expand("{lazy}", lazy=True) == ["True"]
+    try:
+        expand("{a}{d}", lazy=True, a=[1])
+        assert False
+    except WildcardError:
+        pass
+
+
+def test_mtime_inventory(tmpdir):
+    iocache = IOCache(max_wait_time=20, n_workers=2)
+    rule = SimpleNamespace(workflow=SimpleNamespace(iocache=iocache))
+    with tmpdir.as_cwd():
+        os.makedirs("a")
+        for f in ["a/x.txt", "a/y.txt", "b.txt"]:
+            with open(f, "w") as out:
+                out.write(f)
+        os.symlink("x.txt", "a/link.txt")
+
+        files = [IOFile(f, rule=rule) for f in ["a/x.txt", "a/y.txt", "a/link.txt"]]
+        job = SimpleNamespace(
+            input=files,
+            expanded_output=[IOFile("b.txt", rule=rule)],
+            benchmark=None,
+        )
+        iocache.mtime_inventory([job])
+
+        for f in files + job.expanded_output:
+            assert (
+                iocache.mtime[f].local() == os.stat(f, follow_symlinks=False).st_mtime
+            )
+        assert (
+            iocache.mtime[files[2]].local(follow_symlinks=True)
+            == os.stat("a/x.txt").st_mtime
+        )
+        assert iocache.size[files[0]] == len("a/x.txt")
+        assert "a" in iocache.exists_local.has_inventory
+
+
+def test_glob_wildcards(tmpdir, mocker):
+    with tmpdir.as_cwd():
+        for sample in ["a", "b", "c"]:
+            for lane in ["1", "2"]:
+                os.makedirs(f"runs/{sample}/L{lane}/tmp")
+                with open(f"runs/{sample}/L{lane}/reads.fq", "w"):
+                    pass
+        with open("runs/a/L1/tmp/reads.fq", "w"):
+            pass
+        os.makedirs("runs/b/other")
+
+        scandir = mocker.spy(os, "scandir")
+        expected = [("a", "1"), ("a", "2"), ("b", "1"), ("b", "2"), ("c", "1")]
+        for threads in [1, 4]:
+            scandir.reset_mock()
+            sample, lane = glob_wildcards(
+                "runs/{sample,[a-z]}/L{lane,[0-9]}/reads.fq", threads=threads
+            )
+            assert sorted(zip(sample, lane)) == expected + [("c", "2")]
+            # neither runs/b/other nor any tmp directory has been listed
+            listed = sorted(call.args[0] for call in scandir.call_args_list)
+            assert "runs/b/other" not in listed
+            assert not any(path.endswith("tmp") for path in listed)
+
+        # an unconstrained wildcard may span multiple directories
+        assert sorted(glob_wildcards("runs/{path}/reads.fq").path) == [
+            "a/L1",
+            "a/L1/tmp",
+            "a/L2",
+            "b/L1",
+            "b/L2",
+            "c/L1",
+            "c/L2",
+        ]
+        assert sorted(glob_wildcards(Path("runs") / "{s,[a-z]}" / "L1").s) == [
+            "a",
+            "b",
+            "c",
+        ]
+        # slashes in constraints do not split path components
+        assert len(glob_wildcards("runs/{sample,[^/]+}/L{lane}/reads.fq").sample) == 7
+
+        matches = iglob_wildcards("runs/{sample,[a-z]}/L{lane,[0-9]}/reads.fq")
+        first = next(matches)
+        assert first._fields == ("sample", "lane")
+        assert sorted([first] + list(matches))[:5] == expected
+
+
+def test_glob_wildcards_bounded_prefetch(tmpdir, mocker):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tmpdir.as_cwd():
+        for i in range(50):
+            os.makedirs(f"wide/{i}")
+            with open(f"wide/{i}/x.txt", "w"):
+                pass
+        submit = mocker.spy(ThreadPoolExecutor, "submit")
+        matches = iglob_wildcards("wide/{i}/x.txt", threads=2)
+        next(matches)
+        # only a bounded number of directory listings is prefetched
+        assert submit.call_count <= 8
+        assert len(list(matches)) == 49
+        assert list(iglob_wildcards("wide/{i}/x.txt", threads=2)) == list(
+            iglob_wildcards("wide/{i}/x.txt")
+        )
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+from toposort import CircularDependencyError, toposort
+
+from snakemake.job_graph import Adjacency
+
+
+def random_dag(n_jobs, n_edges, seed=0):
+    rng = random.Random(seed)
+    dependencies = Adjacency()
+    for _ in range(n_edges):
+        i, j = sorted(rng.sample(range(n_jobs), 2))
+        dependencies[j][i].add(f"f{i}")
+    for i in range(n_jobs):
+        dependencies[i]
+    return dependencies
+
+
+def reference_bfs(direction, *jobs, stop=lambda job: False):
+    queue = list(jobs)
+    visited = set(queue)
+    while queue:
+        job = queue.pop(0)
+        if stop(job):
+            continue
+        yield job
+        for job_ in direction[job]:
+            if job_ not in visited:
+                queue.append(job_)
+                visited.add(job_)
+
+
+def test_compact_traversals():
+    dependencies = random_dag(200, 600)
+    graph = dependencies.compact()
+    stop = lambda job: job % 7 == 0
+
+    for start in [(199,), (150, 120, 3)]:
+        assert list(graph.bfs(start)) == list(reference_bfs(dependencies, *start))
+        assert list(graph.bfs(start, stop=stop)) == list(
+            reference_bfs(dependencies, *start, stop=stop)
+        )
+        levels = list(graph.level_bfs(start))
+        assert [job for _, job in levels] == list(graph.bfs(start))
+        for level, job in levels:
+            assert level == 0 or any(
+                job in dependencies[job_]
+                for level_, job_ in levels
+                if level_ == level - 1
+            )
+        # postorder: all dependencies come before the jobs depending on them
+        seen = set()
+        for job in graph.dfs(start):
+            assert all(dep in seen for dep in dependencies[job])
+            seen.add(job)
+        assert seen == set(graph.bfs(start))
+        assert list(graph.dfs(start, post=False))[0] == start[0]
+
+    jobs = set(range(0, 200, 2))
+    expected = list(
+        toposort(
+            {job: {dep for dep in dependencies[job] if dep in jobs} for job in jobs}
+        )
+    )
+    assert list(graph.toposort(jobs)) == expected
+
+
+def test_compact_graph_updates():
+    dependencies = random_dag(20, 40)
+    graph = dependencies.compact()
+    assert dependencies.compact() is graph
+
+    # accessing jobs without adding edges keeps the compact graph
+    dependencies[100]
+    dependencies[5].get(6)
+    assert 6 not in dependencies[5]
+    assert dependencies.compact() is graph
+    assert 100 not in graph
+
+    dependencies[100][19].add("f")
+    graph = dependencies.compact()
+    assert list(graph.bfs([100])) == list(reference_bfs(dependencies, 100))
+
+    del dependencies[100]
+    assert 100 not in dependencies.compact()
+
+    dependencies[0][19].add("f")
+    dependencies[19][0].add("f")
+    with pytest.raises(CircularDependencyError):
+        list(dependencies.compact().toposort(range(20)))
@@ -0,0 +1,2 @@
+with open(snakemake.output[0], "w") as out:
+    print(snakemake.params.greeting, snakemake.rule, file=out)
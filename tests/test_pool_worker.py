@@ -0,0 +1,103 @@
+import json
+import os
+import stat
+
+from snakemake.pool_worker import Worker
+
+
+def write_ticket(queue, name, cores, mem_mb):
+    jobscript = os.path.join(queue, name + ".sh")
+    with open(jobscript, "w") as f:
+        print("#!/bin/sh", "sleep 60", sep="\n", file=f)
+    os.chmod(jobscript, os.stat(jobscript).st_mode | stat.S_IXUSR)
+    with open(os.path.join(queue, "pending", name + ".json"), "w") as f:
+        json.dump(
+            {
+                "jobscript": jobscript,
+                "jobfinished": os.path.join(queue, name + ".jobfinished"),
+                "jobfailed": os.path.join(queue, name + ".jobfailed"),
+                "resources": {"_cores": cores, "mem_mb": mem_mb},
+            },
+            f,
+        )
+
+
+def test_worker_respects_resources(tmp_path):
+    queue = str(tmp_path)
+    os.makedirs(os.path.join(queue, "pending"))
+    write_ticket(queue, "0", cores=2, mem_mb=100)
+    write_ticket(queue, "1", cores=2, mem_mb=100)
+    write_ticket(queue, "2", cores=1, mem_mb=600)
+    write_ticket(queue, "3", cores=1, mem_mb=600)
+
+    worker = Worker(queue, "a", {"_cores": 3, "mem_mb": 1000})
+    os.makedirs(worker.workerdir)
+    worker.claim()
+    try:
+        assert sorted(os.listdir(worker.workerdir)) == ["0.json", "2.json"]
+        assert sorted(os.listdir(os.path.join(queue, "pending"))) == [
+            "1.json",
+            "3.json",
+        ]
+        assert worker.free == {"_cores": 0, "mem_mb": 300}
+    finally:
+        worker.terminate()
+
+    worker.reap()
+    assert worker.free == {"_cores": 3, "mem_mb": 1000}
+    assert os.listdir(worker.workerdir) == []
+    # killed jobs are reported as failed
+    assert os.path.exists(os.path.join(queue, "0.jobfailed"))
+    assert os.path.exists(os.path.join(queue, "2.jobfailed"))
+
+
+def test_unstarted_worker_warning(tmp_path, mocker):
+    from snakemake.executors.worker_pool import WorkerPoolExecutor
+    from snakemake.pool_worker import Heartbeat
+
+    executor = WorkerPoolExecutor.__new__(WorkerPoolExecutor)
+    executor.start_timeout = 0
+    executor.unstarted_warned = set()
+    executor.workers = {"0": Heartbeat(str(tmp_path / "heartbeat"))}
+    warning = mocker.patch("snakemake.executors.worker_pool.logger.warning")
+
+    executor.check_workers()
+    executor.check_workers()
+    # warned once, but the worker is still waited for
+    assert warning.call_count == 1
+    assert "0" in executor.workers
+
+
+def test_worker_runs_payload_in_process(tmp_path, mocker):
+    queue = str(tmp_path)
+    os.makedirs(os.path.join(queue, "pending"))
+    with open(os.path.join(queue, "pending", "0.json"), "w") as f:
+        json.dump(
+            {
+                "payload": os.path.join(queue, "0.payload.json"),
+                "latency_wait": 0,
+                "jobfinished": os.path.join(queue, "0.jobfinished"),
+                "jobfailed": os.path.join(queue, "0.jobfailed"),
+                "resources": {"_cores": 1},
+            },
+            f,
+        )
+    run_job_payload = mocker.patch(
+        "snakemake.job_payload.run_job_payload", return_value=True
+    )
+    popen = mocker.patch("snakemake.pool_worker.subprocess.Popen")
+
+    worker = Worker(queue, "a", {"_cores": 1})
+    os.makedirs(worker.workerdir)
+    worker.claim()
+    for process, _ in worker.running.values():
+        process.join()
+    worker.reap()
+
+    run_job_payload.assert_called_once_with(
+        os.path.join(queue, "0.payload.json"), latency_wait=0
+    )
+    # no process is started for the job
+    popen.assert_not_called()
+    assert os.path.exists(os.path.join(queue, "0.jobfinished"))
+    assert worker.free == {"_cores": 1}
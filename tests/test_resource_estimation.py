@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from snakemake.exceptions import WorkflowError
+from snakemake.history import JobHistory
+from snakemake.resource_estimation import Model, ResourceEstimator
+
+
+class FakeJob:
+    def __init__(self, rule, benchmark=None, inputsize=0):
+        self.rule = SimpleNamespace(name=rule)
+        self.wildcards_dict = dict()
+        self.benchmark = benchmark
+        self.inputsize = inputsize
+        self.input = []
+
+    def is_group(self):
+        return False
+
+
+class FakeInput:
+    def __init__(self, size_mb):
+        self._size_mb = size_mb
+
+    @property
+    def size_mb(self):
+        if self._size_mb is None:
+            raise FileNotFoundError("missing input")
+        return self._size_mb
+
+
+def test_model():
+    # max_rss grows with the input size
+    model = Model([(10, 110), (20, 230), (30, 310)])
+    assert model.maximum == 310
+    # line through the samples, shifted up by the largest deviation above it
+    assert model.predict(40) == pytest.approx(430)
+    assert model.predict() == 310
+
+    # no correlation
+    model = Model([(10, 300), (20, 100), (30, 300)])
+    assert model.fit is None
+    assert model.predict(40) == 300
+
+    # unknown input sizes
+    model = Model([(10, 100), (None, 200), (30, 300)])
+    assert model.predict(40) == 300
+
+
+def test_resource_estimator(tmpdir):
+    history = JobHistory(str(tmpdir.join("history.sqlite")))
+    for i, (size, rss) in enumerate([(10, 110), (20, 230), (30, 310)]):
+        benchmark = tmpdir.join("bench{}.tsv".format(i))
+        benchmark.write(
+            "s\th:m:s\tmax_rss\tmax_vms\tmax_uss\tmax_pss\tio_in\tio_out\t"
+            "mean_load\tcpu_time\n"
+            "{}\t0:00:00\t{}\t-\t-\t-\t0.00\t0.00\t0.00\t0.00\n".format(60 * i, rss)
+        )
+        history.record(FakeJob("map", str(benchmark), size * 1024**2), 0, 1)
+    history.record(FakeJob("sort"), 0, 600)
+
+    estimator = ResourceEstimator(history, margin=1.5)
+    rule = SimpleNamespace(name="map")
+    # runtime (0, 1 and 2 minutes) grows with the input size as well
+    assert estimator.estimate(rule, FakeInput(40)) == {"mem_mb": 645, "runtime": 5}
+    # without input size, fall back to the largest observation
+    assert estimator.estimate(rule, FakeInput(None)) == {
+        "mem_mb": 465,
+        "runtime": 3,
+    }
+    # not enough samples
+    assert estimator.estimate(SimpleNamespace(name="sort"), FakeInput(1)) == {}
+
+    with pytest.raises(WorkflowError):
+        ResourceEstimator(history, margin=0.5)
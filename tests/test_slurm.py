@@ -56,3 +56,156 @@ def test_slurm_complex():
             ["slurm_account=runner", "slurm_partition=debug", "tasks=1", "mem_mb=0", "disk_mb=max(2*input.size_mb, 200)"]
         ),
     )
+
+
+@skip_on_windows
+def test_slurm_sacct_job_stati(monkeypatch, tmp_path):
+    import asyncio
+    from snakemake.executors.slurm.slurm_submit import SlurmExecutor
+    from snakemake.scheduler import DummyRateLimiter
+
+    monkeypatch.setenv("PATH", dpath("test_slurm_sacct"), prepend=os.pathsep)
+    sacct_log = tmp_path / "sacct.log"
+    monkeypatch.setenv("SACCT_LOG", str(sacct_log))
+
+    executor = SlurmExecutor.__new__(SlurmExecutor)
+    executor.status_rate_limiter = DummyRateLimiter()
+    executor.sacct_chunk_size = 3
+
+    stati = asyncio.run(executor.job_stati(["100", "101", "102", "103", "104"]))
+    assert stati == {
+        "100": "COMPLETED",
+        "101": "FAILED",
+        "102": "CANCELLED",
+        "103": "RUNNING",
+        # not known to sacct, obtained via scontrol
+        "104": "PENDING",
+    }
+    # a single sacct call per chunk of job ids
+    assert len(sacct_log.read_text().splitlines()) == 2
+
+
+@skip_on_windows
+def test_slurm_job_stati_retry(monkeypatch, tmp_path):
+    import asyncio
+    from snakemake.exceptions import WorkflowError
+    from snakemake.executors.slurm.slurm_submit import SlurmExecutor
+    from snakemake.scheduler import DummyRateLimiter
+
+    monkeypatch.setenv("PATH", dpath("test_slurm_status_retry"), prepend=os.pathsep)
+    scontrol_log = tmp_path / "scontrol.log"
+    monkeypatch.setenv("SCONTROL_LOG", str(scontrol_log))
+
+    executor = SlurmExecutor.__new__(SlurmExecutor)
+    executor.status_rate_limiter = DummyRateLimiter()
+    executor.status_retry_delay = 0
+    executor.status_attempts = 3
+
+    # transient scontrol errors are retried
+    monkeypatch.setenv("SCONTROL_FAILURES", "2")
+    assert asyncio.run(executor.job_stati(["100"])) == {"100": "RUNNING"}
+    assert len(scontrol_log.read_text().splitlines()) == 3
+
+    # persistent errors are reported once all attempts are exhausted
+    scontrol_log.write_text("")
+    monkeypatch.setenv("SCONTROL_FAILURES", "3")
+    with pytest.raises(WorkflowError, match="Socket timed out"):
+        asyncio.run(executor.job_stati(["100"]))
+    assert len(scontrol_log.read_text().splitlines()) == 3
+
+
+class FakeSlurmJob:
+    def __init__(self, jobid, rule, **resources):
+        from types import SimpleNamespace
+        from snakemake.io import Resources
+
+        self.jobid = jobid
+        self.name = rule
+        self.rule = SimpleNamespace(name=rule)
+        self.threads = 1
+        self.resources = Resources(
+            fromdict=dict(
+                slurm_account="runner",
+                slurm_partition="debug",
+                runtime=10,
+                **resources,
+            )
+        )
+
+    def is_group(self):
+        return False
+
+
+@skip_on_windows
+def test_slurm_job_arrays(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+    from snakemake.executors import ClusterExecutor
+    from snakemake.executors.slurm.slurm_submit import SlurmExecutor
+
+    monkeypatch.setenv("PATH", dpath("test_slurm_array"), prepend=os.pathsep)
+    sbatch_log = tmp_path / "sbatch.log"
+    monkeypatch.setenv("SBATCH_LOG", str(sbatch_log))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ClusterExecutor, "_run", lambda self, job: None)
+
+    executor = SlurmExecutor.__new__(SlurmExecutor)
+    executor.workflow = SimpleNamespace(workdir_init=str(tmp_path))
+    executor._tmpdir = str(tmp_path)
+    executor._tested_accounts = {"runner"}
+    executor._array_ids = iter(range(10))
+    executor.active_jobs = []
+    executor.job_arrays = True
+    executor.max_array_size = 2
+    executor.get_jobname = lambda job: f"snakejob_{job.name}_{job.jobid}"
+    executor.format_job_exec = lambda job: f"echo {job.jobid}"
+
+    jobs = [
+        FakeSlurmJob(1, "a", mem_mb=1000),
+        FakeSlurmJob(2, "b", mem_mb=1000),
+        FakeSlurmJob(3, "a", mem_mb=1000),
+        FakeSlurmJob(4, "a", mem_mb=2000),
+        FakeSlurmJob(5, "a", mem_mb=1000),
+    ]
+    executor.run_jobs(jobs)
+
+    # jobs 1, 3 and 5 are bundled, but an array has at most 2 tasks
+    calls = sbatch_log.read_text().splitlines()
+    assert len(calls) == 4
+    assert sum("--array=0-1" in call for call in calls) == 1
+    assert {j.job.jobid: j.jobid for j in executor.active_jobs} == {
+        1: "4242_0",
+        3: "4242_1",
+        5: "4242",
+        2: "4242",
+        4: "4242",
+    }
+    assert (tmp_path / "array0_1.sh").read_text() == "#!/bin/sh\necho 3\n"
+    array_call = next(call for call in calls if "--array" in call)
+    assert array_call.endswith(
+        f"--wrap=sh {tmp_path}/array0_${{SLURM_ARRAY_TASK_ID}}.sh"
+    )
+
+
+@skip_on_windows
+def test_slurm_sacct_array_job_stati(monkeypatch, tmp_path):
+    import asyncio
+    from snakemake.executors.slurm.slurm_submit import SlurmExecutor
+    from snakemake.scheduler import DummyRateLimiter
+
+    monkeypatch.setenv("PATH", dpath("test_slurm_array"), prepend=os.pathsep)
+    sacct_log = tmp_path / "sacct.log"
+    monkeypatch.setenv("SACCT_LOG", str(sacct_log))
+
+    executor = SlurmExecutor.__new__(SlurmExecutor)
+    executor.status_rate_limiter = DummyRateLimiter()
+    executor.sacct_chunk_size = 1000
+
+    stati = asyncio.run(executor.job_stati(["4242_0", "4242_1", "4242_2", "4242_3"]))
+    assert stati == {
+        "4242_0": "COMPLETED",
+        "4242_1": "FAILED",
+        "4242_2": "PENDING",
+        "4242_3": "PENDING",
+    }
+    # the tasks are queried via their array job
+    assert sacct_log.read_text().split() == ["-P", "-b", "-n", "-j", "4242"]
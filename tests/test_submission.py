@@ -0,0 +1,81 @@
+import subprocess
+import threading
+
+import pytest
+
+from snakemake.executors.submission import SubmissionPool, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(2, clock=clock, sleep=clock.sleep)
+    for _ in range(10):
+        bucket.acquire()
+    # a burst of 2, then one acquisition every half second
+    assert clock.now == pytest.approx(4.0)
+
+
+def test_token_bucket_fractional_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(0.5, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.now == pytest.approx(4.0)
+
+
+def test_submission_retries_with_backoff():
+    pool = SubmissionPool(retries=2, backoff=0.01)
+    calls = []
+
+    def submit():
+        calls.append(None)
+        if len(calls) < 3:
+            raise subprocess.CalledProcessError(1, "qsub")
+        return "4711"
+
+    assert pool.call(submit) == "4711"
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(subprocess.CalledProcessError):
+        SubmissionPool(retries=1, backoff=0.01).call(submit)
+    assert len(calls) == 2
+
+
+def test_submission_concurrency():
+    pool = SubmissionPool(concurrency=4)
+    barrier = threading.Barrier(4, timeout=10)
+    passed = []
+
+    def task(i):
+        # only passes if all four tasks run at the same time
+        barrier.wait()
+        passed.append(i)
+
+    for i in range(4):
+        pool.submit(task, i)
+    pool.shutdown()
+    assert sorted(passed) == [0, 1, 2, 3]
+
+
+def test_submission_errors_are_reported():
+    errors = []
+    pool = SubmissionPool(error_handler=errors.append)
+
+    def task():
+        raise ValueError("broken")
+
+    pool.submit(task)
+    pool.shutdown()
+    assert len(errors) == 1 and isinstance(errors[0], ValueError)
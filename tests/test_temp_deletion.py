@@ -0,0 +1,32 @@
+import os
+
+from snakemake.io import _IOFile
+from snakemake.temp_deletion import TempDeletion
+
+
+def test_temp_deletion(tmpdir):
+    files = []
+    for i in range(10):
+        path = tmpdir.join(f"f{i}")
+        path.write("")
+        files.append(_IOFile(str(path)))
+    tmpdir.join("dir", "sub", "f").write("", ensure=True)
+    files.append(_IOFile(str(tmpdir.join("dir"))))
+
+    class Unremovable(str):
+        def remove(self, remove_non_empty_dir=False):
+            raise PermissionError("permission denied")
+
+    # a failing removal must not affect the other removals
+    files.insert(5, Unremovable("unremovable"))
+
+    deletion = TempDeletion(max_workers=2)
+    for f in files:
+        deletion.submit(f)
+    deletion.shutdown()
+
+    assert deletion.pending == 0
+    assert deletion.done == deletion.submitted == len(files)
+    assert not os.listdir(str(tmpdir))
+    # nothing submitted, nothing to wait for
+    deletion.shutdown()
@@ -109,6 +109,19 @@ def test14():
     run(dpath("test14"), snakefile="Snakefile.nonstandard", cluster="./qsub")
 
 
+@skip_on_windows
+def test_cluster_submit_concurrency():
+    os.environ["TESTVAR"] = "test"
+    os.environ["TESTVAR2"] = "test"
+    run(
+        dpath("test14"),
+        snakefile="Snakefile.nonstandard",
+        cluster="./qsub",
+        cluster_submit_concurrency=4,
+        max_jobs_per_second=100,
+    )
+
+
 @skip_on_windows
 def test_cluster_statusscript():
     os.environ["TESTVAR"] = "test"
@@ -120,6 +133,22 @@ def test_cluster_statusscript():
     )
 
 
+@skip_on_windows
+def test_cluster_statusscript_batch():
+    tmpdir = run(
+        dpath("test_cluster_statusscript_batch"),
+        cluster="./qsub",
+        cluster_status="./status.sh",
+        cluster_status_nargs=0,
+        cleanup=False,
+    )
+    # the status script logs the number of job ids of each call
+    with open(os.path.join(tmpdir, "status.log")) as f:
+        nargs = [int(line) for line in f]
+    shutil.rmtree(tmpdir)
+    assert max(nargs) > 1
+
+
 @skip_on_windows
 def test_cluster_cancelscript():
     outdir = run(
@@ -195,6 +224,50 @@ def test_coin_solver():
     run(dpath("test_solver"), scheduler_ilp_solver="COIN_CMD")
 
 
+def test_scheduler_ilp_window():
+    run(dpath("test_scheduler_ilp_window"), scheduler="ilp", scheduler_ilp_window=2)
+
+
+def test_max_temp_disk():
+    run(dpath("test_max_temp_disk"), cores=4, max_temp_disk=15)
+
+
+def test_critical_path():
+    run(
+        dpath("test_critical_path"),
+        cores=1,
+        critical_path_priority=True,
+        dump_critical_path="critical-path.tsv",
+    )
+
+
+def test_critical_path_ilp():
+    # a higher critical path score outweighs a higher core load
+    run(
+        dpath("test_critical_path_ilp"),
+        cores=2,
+        scheduler="ilp",
+        critical_path_priority=True,
+    )
+
+
+def test_job_history():
+    from snakemake.history import JobHistory
+
+    kwargs = dict(cores=2, scheduler="ilp", critical_path_priority=True, cleanup=False)
+    tmpdir = run(dpath("test_critical_path_ilp"), job_history=True, **kwargs)
+    history = JobHistory(os.path.join(tmpdir, ".snakemake", "history.sqlite"))
+    rules = sorted(record.rule for record in history.jobs())
+    history.close()
+    shutil.rmtree(tmpdir)
+    assert rules == ["all", "long1", "long2", "wide"]
+
+    # without job_history, nothing is recorded
+    tmpdir = run(dpath("test_critical_path_ilp"), **kwargs)
+    assert not os.path.exists(os.path.join(tmpdir, ".snakemake", "history.sqlite"))
+    shutil.rmtree(tmpdir)
+
+
 def test_directory():
     run(
         dpath("test_directory"),
@@ -355,6 +428,11 @@ def test_benchmark():
     run(dpath("test_benchmark"), check_md5=False)
 
 
+def test_temp_checkpoint_consumer():
+    # a temp file consumed by a checkpoint is kept for its other consumers
+    run(dpath("test_temp_checkpoint_consumer"))
+
+
 def test_temp_expand():
     run(dpath("test_temp_expand"))
 
@@ -394,6 +472,110 @@ def test_cluster_sync():
     run(dpath("test14"), snakefile="Snakefile.nonstandard", cluster_sync="./qsub")
 
 
+@skip_on_windows
+def test_cluster_job_payloads():
+    tmpdir = run(
+        dpath("test_job_payloads"),
+        cluster_sync="./qsub",
+        job_payloads=True,
+        cleanup=False,
+    )
+    with open(os.path.join(tmpdir, "qsub.log")) as f:
+        calls = sorted(f.read().splitlines())
+    # missing log files are created like for any other job
+    flag_log = os.path.exists(os.path.join(tmpdir, "logs", "flag.log"))
+    shutil.rmtree(tmpdir)
+    # the run directive still needs the Snakefile
+    assert calls == ["-m snakemake --snakefile"] + ["job_runner.py"] * 6
+    assert flag_log
+
+
+def test_job_payload_latency(tmp_path):
+    import threading
+    from snakemake.job_payload import run_job_payload
+
+    payload = tmp_path / "job.payload.json"
+    # a missing payload is reported instead of raising
+    assert not run_job_payload(str(payload), latency_wait=0)
+
+    # a payload that appears late (e.g. due to filesystem latency) is read
+    writer = threading.Timer(1, payload.write_text, args=['{"version": 0}'])
+    writer.start()
+    try:
+        assert not run_job_payload(str(payload), latency_wait=5)
+    finally:
+        writer.join()
+
+
+def test_job_payload_missing_output(tmp_path):
+    import json
+    from snakemake.job_payload import PAYLOAD_VERSION, run_job_payload
+
+    payload = {
+        "version": PAYLOAD_VERSION,
+        "rule": "a",
+        "jobid": 0,
+        "shellcmd": "true",
+        "script": None,
+        "shell": {
+            "executable": "bash",
+            "prefix": "",
+            "suffix": "",
+            "conda_block_conflicting_envvars": True,
+        },
+        "threads": 1,
+        "resources": {},
+        "system_tmpdir": False,
+        "output": [str(tmp_path / "a.txt")],
+        "touch_output": [],
+        "log": [],
+        "benchmark": None,
+        "benchmark_repeats": 1,
+        "wait_for_files": [],
+        "latency_wait": 0,
+        "conda_env": None,
+        "conda_base_path": None,
+        "container_img": None,
+        "singularity_args": "",
+        "env_modules": None,
+    }
+    path = tmp_path / "job.payload.json"
+    path.write_text(json.dumps(payload))
+    # the command succeeds, but does not create its output
+    assert not run_job_payload(str(path), latency_wait=0)
+
+    payload["shellcmd"] = "touch {}".format(tmp_path / "a.txt")
+    path.write_text(json.dumps(payload))
+    assert run_job_payload(str(path), latency_wait=0)
+
+
+def test_worker_pool():
+    run(
+        dpath("test_worker_pool"),
+        worker_pool=2,
+        worker_pool_cores=2,
+        worker_pool_resources={"mem_mb": 1000},
+        nodes=6,
+    )
+
+
+def test_worker_pool_submit():
+    tmpdir = run(
+        dpath("test_worker_pool"),
+        worker_pool=2,
+        worker_pool_submit="./submit -c {cores} -m {mem_mb}",
+        worker_pool_cores=2,
+        worker_pool_resources={"mem_mb": 1000},
+        nodes=6,
+        cleanup=False,
+    )
+    with open(os.path.join(tmpdir, "submit.log")) as f:
+        calls = f.read().splitlines()
+    shutil.rmtree(tmpdir)
+    assert len(calls) == 2
+    assert all(call.startswith("-c 2 -m 1000 ") for call in calls)
+
+
 @pytest.mark.skip(reason="This does not work reliably in CircleCI.")
 def test_symlink_temp():
     run(dpath("test_symlink_temp"), shouldfail=True)
@@ -712,6 +894,16 @@ def test_restartable_job_qsub_exit_1():
     )
 
 
+def test_cluster_submit_retries():
+    # the failing submission is retried without restarting the job
+    run(
+        dpath("test_restartable_job_qsub_exit_1"),
+        cluster="./qsub",
+        restart_times=0,
+        cluster_submit_retries=1,
+    )
+
+
 def test_threads():
     run(dpath("test_threads"), cores=20)
 
@@ -1312,6 +1504,14 @@ def test_checkpoints():
     run(dpath("test_checkpoints"))
 
 
+def test_checkpoints_compact_dag():
+    run(dpath("test_checkpoints"), compact_dag=True)
+
+
+def test_pipes_compact_dag():
+    run(dpath("test_pipes"), compact_dag=True)
+
+
 def test_checkpoints_dir():
     run(dpath("test_checkpoints_dir"))
 
@@ -1351,6 +1551,10 @@ def test_expand_flag():
     run(dpath("test_expand_flag"), shouldfail=True)
 
 
+def test_expand_lazy():
+    run(dpath("test_expand_lazy"))
+
+
 @skip_on_windows
 def test_default_resources():
     from snakemake.resources import DefaultResources
@@ -1476,13 +1680,41 @@ def test_github_issue1062():
     run(dpath("test_github_issue1062"), dryrun=True)
 
 
-def test_output_file_cache():
+def test_output_file_cache(mocker):
+    from snakemake.caching.hash import ProvenanceHashMap
+
     test_path = dpath("test_output_file_cache")
     os.environ["SNAKEMAKE_OUTPUT_CACHE"] = "cache"
+    save = mocker.spy(ProvenanceHashMap, "save")
     run(test_path, cache=["a", "b"])
+    # input file digests are stored once per run
+    assert save.call_count == 1
     run(test_path, cache=["invalid_multi"], targets="invalid1.txt", shouldfail=True)
 
 
+def test_file_hash_cache(tmp_path, mocker):
+    from snakemake.caching import hash
+
+    f = tmp_path / "input.txt"
+    f.write_text("test")
+    expected = hash.hash_file(f)
+    path = str(tmp_path / ".snakemake" / "file_hashes.json")
+
+    cache = hash.FileHashCache(path)
+    assert cache.get(f) == expected
+    cache.save()
+
+    spy = mocker.spy(hash, "hash_file")
+    cache = hash.FileHashCache(path)
+    assert cache.get(f) == expected
+    # unchanged file is not read again
+    assert spy.call_count == 0
+
+    f.write_text("changed")
+    os.utime(f, ns=(0, 0))
+    assert cache.get(f) == hash.hash_file(f) != expected
+
+
 @skip_on_windows
 @pytest.mark.xfail(
     reason="moto currently fails with \"'_patch' object has no attribute 'is_local'\""
@@ -1970,6 +2202,18 @@ def test_ensure_success():
     run(dpath("test_ensure"), targets=["b", "c"])
 
 
+def test_content_checksum_fresh_metadata(tmp_path, monkeypatch):
+    from snakemake.persistence import Persistence
+
+    monkeypatch.chdir(tmp_path)
+    persistence = Persistence(nolock=True, dag=None)
+    (tmp_path / "x.txt").write_text("test")
+    # the first checksum is recorded without any earlier metadata writes
+    checksum = persistence.content_checksum("x.txt")
+    assert checksum is not None
+    assert persistence.content_checksum("x.txt") == checksum
+
+
 def test_ensure_checksum_fail():
     run(dpath("test_ensure"), targets=["d"], shouldfail=True)
 
@@ -2039,3 +2283,71 @@ def test_github_issue1882():
         run(tmpdir, forceall=True)
     finally:
         shutil.rmtree(tmpdir)
+
+
+def test_dag_cache():
+    try:
+        tmpdir = run(dpath("test_dag_cache"), dag_cache=True, cleanup=False)
+        assert len(os.listdir(os.path.join(tmpdir, ".snakemake", "dag_cache"))) == 1
+        messages = []
+        run(
+            tmpdir,
+            no_tmpdir=True,
+            dag_cache=True,
+            forceall=True,
+            log_handler=[lambda msg: messages.append(msg.get("msg"))],
+        )
+        assert "Restored DAG of 5 jobs from cache." in messages
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+@skip_on_windows
+def test_rerun_checksum():
+    from snakemake import RERUN_TRIGGERS
+
+    try:
+        tmpdir = run(
+            dpath("test_rerun_checksum"),
+            rerun_triggers=RERUN_TRIGGERS + ["checksum"],
+            cleanup=False,
+        )
+        out = os.path.join(tmpdir, "out.txt")
+        mtime = os.stat(out).st_mtime_ns
+        # touch the (large) input file without changing its content
+        t = time.time() + 10
+        os.utime(os.path.join(tmpdir, "data.txt"), (t, t))
+        run(
+            tmpdir,
+            no_tmpdir=True,
+            rerun_triggers=RERUN_TRIGGERS + ["checksum"],
+        )
+        assert os.stat(out).st_mtime_ns == mtime
+        # without the checksum trigger, the job is rerun
+        run(tmpdir, no_tmpdir=True)
+        assert os.stat(out).st_mtime_ns != mtime
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_metadata_sqlite():
+    run(dpath("test_metadata_sqlite"), metadata_backend="sqlite")
+
+
+def test_metadata_sqlite_migration():
+    import json
+    import sqlite3
+
+    try:
+        tmpdir = run(dpath("test_metadata_sqlite"), cleanup=False)
+        run(tmpdir, no_tmpdir=True, metadata_backend="sqlite", migrate_metadata=True)
+        with sqlite3.connect(
+            os.path.join(tmpdir, ".snakemake", "metadata.sqlite")
+        ) as db:
+            records = dict(
+                db.execute("SELECT id, value FROM records WHERE subject = 'metadata'")
+            )
+        assert sorted(records) == ["in/a.txt", "in/b.txt", "out/a.txt", "out/b.txt"]
+        assert json.loads(records["out/a.txt"])["rule"] == "copy"
+    finally:
+        shutil.rmtree(tmpdir)